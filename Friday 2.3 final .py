@@ -1,50 +1,68 @@
-import ollama
+import asyncio
 import speech_recognition as sr
-import pyttsx3
 import webbrowser
 import os
 import ctypes
-import json
+from conversation_store import ConversationLog, migrate_legacy_history
+from context_window import ContextWindow, summarize_with_ollama
+from assistant_core import AssistantCore, AssistantState
+from response_cache import ResponseCache, is_question, last_reply
+from history_index import HistoryIndex
+from semantic_memory import HashingEmbedder, SemanticMemory
+from model_registry import ModelRegistry, load_tts
+from tts_cache import TTSCache
+from tts_worker import TTSWorker
+from ollama_client import load_ollama
+from llm_scheduler import LLMScheduler, RequestCancelled, PRIORITY_INTERACTIVE, PRIORITY_SUMMARY
+from intent_router import Intent, IntentRouter
 from datetime import datetime
 
-# Initialize text-to-speech engine
-engine = pyttsx3.init()
-voices = engine.getProperty('voices')
-
-# List available voices
-for index, voice in enumerate(voices):
-    print(f"Voice {index}: {voice.name}")
-
-# Set to a specific voice (change index as needed)
-engine.setProperty('voice', voices[1].id)  # Example: Selecting the second voice
-engine.setProperty('rate', 210)
+models = ModelRegistry()
+models.register("llm", load_ollama, "llama3.2:3b", keep_alive="30m")  # Loads the model on the Ollama server at startup
+# Replies go ahead of summarization (and indexing) on the Ollama server; a new turn cancels a stale reply
+llm_scheduler = LLMScheduler(lambda: models.get("llm"), max_concurrent=1)
+chat_client = llm_scheduler.client(PRIORITY_INTERACTIVE, group="turn", supersede=True)
 
 # Constants for minimizing and restoring console window
 SW_MINIMIZE, SW_RESTORE = 6, 9
 kernel32, user32 = ctypes.windll.kernel32, ctypes.windll.user32
 
 # Global states and memory
-is_processing_command, has_minimized, is_conversation_paused = False, False, False
+state = AssistantState()  # Paused/minimized flags, owned by the event loop
 conversation_memory = []
-conversation_file = "conversation_history.json"
+conversation_file = "conversation_history.jsonl"
+conversation_log = ConversationLog(conversation_file)
+context_window = ContextWindow(summarize=lambda summary, turns: summarize_with_ollama(summary, turns, client=llm_scheduler.client(PRIORITY_SUMMARY)))
+stream_responses = True  # Speak replies sentence by sentence as they are generated
+response_cache = ResponseCache()  # Replies to repeated questions, kept between runs
+history_index = HistoryIndex()
+# Past turns recalled by similarity; SemanticMemory(OllamaEmbedder(client=llm_scheduler.client(PRIORITY_INDEXING)))
+# recalls by meaning rather than shared words
+semantic_memory = SemanticMemory(HashingEmbedder())
 
 # Load conversation history
 def load_conversation():
     global conversation_memory
+    migrate_legacy_history("conversation_history.json", conversation_file)
     if os.path.exists(conversation_file):
         try:
-            with open(conversation_file, "r") as file:
-                conversation_memory = json.load(file)
-                print("Previous conversation history loaded.")
+            conversation_memory = conversation_log.load()
+            response_cache.load()
+            history_index.load(conversation_memory, conversation_log.generation)
+            semantic_memory.sync(conversation_memory, conversation_log.generation)
+            print("Previous conversation history loaded.")
         except Exception as e:
             print(f"Error loading conversation history: {e}")
 
-# Save conversation history
+# Save conversation history (turns are appended as they happen, this only compacts the log)
 def save_conversation():
-    global conversation_memory
     try:
-        with open(conversation_file, "w") as file:
-            json.dump(conversation_memory, file, indent=4)
+        if conversation_log.needs_compaction():
+            conversation_log.compact()
+        response_cache.save()
+        print(response_cache.stats())
+        history_index.save()
+        semantic_memory.save()
     except Exception as e:
         print(f"Error saving conversation history: {e}")
 
@@ -60,121 +78,170 @@ def restore_console():
         user32.ShowWindow(hwnd, SW_RESTORE)
         user32.SetForegroundWindow(hwnd)
 
+# Fixed phrases are rendered once and then played from the cache instead of being synthesized again
+tts_cache = TTSCache()
+constant_phrases = [
+    "Voice assistant running. Say 'FRIDAY' to start.", "Yes, how can I assist you?", "Window minimized.",
+    "Provide search terms.", "I can search, minimize, or chat. Just ask!", "Conversation paused.",
+    "Conversation resumed.", "Goodbye!", "Error with conversation model.",
+    "Please specify a day to search for the topic.", "Please specify a topic and a day to search in history.",
+]
+
+# Initialize text-to-speech engine on its own thread, listing available voices; it is only ever used from that thread
+# Set to a specific voice (change index as needed)
+tts = TTSWorker(lambda: load_tts(voice_index=1, rate=210, list_voices=True), cache=tts_cache)  # Example: Selecting the second voice
+tts.start()
+tts.prerender(constant_phrases)
+
 # Speak text aloud
 def speak(text):
     print(text)
-    engine.say(text)
-    engine.runAndWait()
+    tts.say(text).wait()
 
-# Search history for a topic on a specific day
-def search_history_for_day(topic, day):
-    global conversation_memory
-    results = []
-    for entry in conversation_memory:
-        entry_date = datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-        if topic.lower() in entry["content"].lower() and day.lower() == entry_date.strftime("%A").lower():
-            results.append(entry)
+# Search history for a topic on a specific day or date range
+async def search_history_for_day(core, turn, topic, day):
+    results = history_index.search(conversation_memory, topic, day)
 
     if results:
-        speak(f"Here are the discussions about '{topic}' on {day}:")
+        await core.say(f"Here are the discussions about '{topic}' on {day}:", turn)
         for result in results:
-            speak(result["content"])
+            await core.say(result["content"], turn)
     else:
-        speak(f"No discussions found about '{topic}' on {day}.")
+        await core.say(f"No discussions found about '{topic}' on {day}.", turn)
+
+# Command table, compiled once into a single-pass matcher (earlier rows win, like the old if/elif chain)
+command_router = IntentRouter([
+    Intent("search_history", ["search history"], requires=["friday"]),
+    Intent("wake", ["friday"]),
+    Intent("exit", ["exit"]),
+    Intent("minimize", ["minimize", "minimise"]),
+    Intent("google", ["google"]),
+    Intent("help", ["help"]),
+    Intent("resume", ["unpause", "resume"]),
+    Intent("pause", ["pause", "stop"]),
+])
+
+# Process user commands (runs on the routing task; replies go to the TTS and LLM tasks)
+async def process_command(core, turn):
+    command = turn.text
+    match = command_router.route(command)
+    query = match.query
 
-# Process user commands
-def process_command(command):
-    global is_processing_command, has_minimized, is_conversation_paused
+    if state.paused:
+        if match.intent == "resume":
+            await resume_conversation(core, turn)
 
-    if "friday" in command:
+    elif match.intent == "search_history":
         restore_console()
-        query = command.replace("friday", "").strip()
-        if "search history" in query:
-            query_parts = query.replace("search history", "").strip().split(" on ")
-            topic = query_parts[0].strip() if len(query_parts) > 0 else ""
-            day = query_parts[1].strip() if len(query_parts) > 1 else ""
-            if topic and day:
-                search_history_for_day(topic, day)
-            elif topic:
-                speak("Please specify a day to search for the topic.")
-            else:
-                speak("Please specify a topic and a day to search in history.")
+        query_parts = query.replace(" from ", " on ", 1).split(" on ")
+        topic = query_parts[0].strip() if len(query_parts) > 0 else ""
+        day = query_parts[1].strip() if len(query_parts) > 1 else ""
+        if topic and day:
+            await search_history_for_day(core, turn, topic, day)
+        elif topic:
+            await core.say("Please specify a day to search for the topic.", turn)
         else:
-            speak("Yes, how can I assist you?" if not query else f"Searching for: {query}")
-            if query: perform_google_search(query)
+            await core.say("Please specify a topic and a day to search in history.", turn)
 
-    elif "exit" in command:
-        speak("Goodbye!")
+    elif match.intent == "wake":
+        restore_console()
+        await core.say("Yes, how can I assist you?" if not query else f"Searching for: {query}", turn)
+        if query: perform_google_search(query)
+
+    elif match.intent == "exit":
+        await core.say("Goodbye!", turn)
+        await core.drain()
         save_conversation()
+        print(core.metrics.report())
+        print(llm_scheduler.report())
+        print(tts_cache.report())
         os._exit(0)
 
-    elif ("minimize" in command or "minimise" in command) and not has_minimized:
-        has_minimized = True
+    elif match.intent == "minimize" and not state.minimized:
+        state.minimized = True
         minimize_console()
-        speak("Window minimized.")
+        await core.say("Window minimized.", turn)
 
-    elif "google" in command:
-        query = command.replace("google", "").strip()
-        speak("Provide search terms." if not query else f"Searching Google for: {query}")
+    elif match.intent == "google":
+        await core.say("Provide search terms." if not query else f"Searching Google for: {query}", turn)
         if query: perform_google_search(query)
 
-    elif "help" in command:
-        speak("I can search, minimize, or chat. Just ask!")
+    elif match.intent == "help":
+        await core.say("I can search, minimize, or chat. Just ask!", turn)
 
-    elif "pause" in command or "stop" in command:
-        is_conversation_paused = True
-        speak("Conversation paused.")
+    elif match.intent == "pause":
+        state.paused = True
+        await core.say("Conversation paused.", turn)
 
     else:
-        respond_to_conversation(command)
+        await core.submit(turn, respond_to_conversation)
 
-# Handle conversation responses
-def respond_to_conversation(command):
-    global conversation_memory
+# Handle conversation responses (runs on the LLM task, one reply at a time)
+async def respond_to_conversation(core, turn, use_cache=True):
+    command = turn.text
     try:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conversation_memory.append({"timestamp": timestamp, "role": "user", "content": command})
-        response = ollama.chat(model="llama3.2:3b", messages=conversation_memory)
-        conversation_memory.append({"timestamp": timestamp, "role": "assistant", "content": response.message.content})
-        speak(response.message.content)
-        save_conversation()
+        user_turn = {"timestamp": timestamp, "role": "user", "content": command}
+        # The turn only joins the history (and the position-keyed indexes) once it has a reply,
+        # so a failed or superseded one leaves no trace
+        history = conversation_memory + [user_turn]
+        # Recall related turns that have scrolled out of the context window
+        window_start = context_window.window_start(history)
+        recalled = [conversation_memory[entry_id] for entry_id, _ in semantic_memory.search(command, limit=window_start)]
+        messages = context_window.messages(history, recalled)
+        # Cached replies depend on the model, the summary of older turns and the reply being followed up
+        cache_context = ("llama3.2:3b", context_window.summary, last_reply(conversation_memory))
+        reply = response_cache.get(command, cache_context, use_cache)
+        if reply is not None:
+            await core.say(reply, turn)
+        elif stream_responses:
+            reply = await core.chat(turn, messages)
+        else:
+            reply = (await core.client.chat(model="llama3.2:3b", messages=messages)).message.content
+            await core.say(reply, turn)
+        if is_question(command):
+            response_cache.put(command, reply, cache_context, use_cache)
+        else:
+            response_cache.invalidate()  # A statement may have changed what the right answers are
+        assistant_turn = {"timestamp": timestamp, "role": "assistant", "content": reply}
+        conversation_memory.extend([user_turn, assistant_turn])
+        conversation_log.append(user_turn, assistant_turn)
+        history_index.sync(conversation_memory, conversation_log.generation)
+        semantic_memory.sync(conversation_memory, conversation_log.generation, save=False)
+    except RequestCancelled:
+        pass  # A newer turn superseded this reply
     except Exception as e:
-        speak("Error with conversation model.")
+        await core.say("Error with conversation model.", turn)
 
 # Perform a Google search
 def perform_google_search(query):
     webbrowser.open(f"https://www.google.com/search?q={query}")
 
 # Resume paused conversation
-def resume_conversation():
-    global is_conversation_paused
-    is_conversation_paused = False
-    speak("Conversation resumed.")
-    listen_for_commands()
+async def resume_conversation(core, turn):
+    state.paused = False
+    await core.say("Conversation resumed.", turn)
 
-# Listen for user commands
+# Listen for user commands: capture, recognition, routing, the LLM and TTS run as separate asyncio tasks
 def listen_for_commands():
-    global is_processing_command, is_conversation_paused
     recognizer = sr.Recognizer()
 
+    def recognize(audio):
+        try:
+            command = recognizer.recognize_google(audio).lower().strip()
+            print(f"Recognized: {command}")
+            return command
+        except sr.UnknownValueError:
+            print("Could not understand.")
+        except sr.RequestError:
+            print("Recognition service error.")
+
     with sr.Microphone() as source:
         print("Listening for commands...")
         recognizer.adjust_for_ambient_noise(source)
-
-        while True:
-            try:
-                command = recognizer.recognize_google(recognizer.listen(source)).lower().strip()
-                print(f"Recognized: {command}")
-                if not is_processing_command and not is_conversation_paused:
-                    is_processing_command = True
-                    process_command(command)
-                    is_processing_command = False
-                elif "unpause" in command or "resume" in command:
-                    resume_conversation()
-            except sr.UnknownValueError:
-                print("Could not understand.")
-            except sr.RequestError:
-                print("Recognition service error.")
+        core = AssistantCore(lambda: recognizer.listen(source), recognize, process_command, speak, state,
+                             client=chat_client.aio)
+        asyncio.run(core.run())
 
 # Main function
 def main():
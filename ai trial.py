@@ -1,55 +1,113 @@
-import ollama
-import vosk
-import pyttsx3
 import webbrowser
 import os
 import ctypes
-import json
-import queue
+from conversation_store import ConversationLog, migrate_legacy_history
+from context_window import ContextWindow, summarize_with_ollama
+from speech_output import stream_response
+from response_cache import ResponseCache, is_question, last_reply
+import time
 import sounddevice as sd
-import numpy as np
-import noisereduce as nr
+from audio_buffer import AudioBlockQueue, AudioRingBuffer, new_callback_stats, ring_buffer_callback
+from noise_reduction import NoiseReductionWorker
+from wake_word import WakeWordListener
+from model_registry import ModelRegistry, load_tts, load_vosk
+from ollama_client import load_ollama
+from llm_scheduler import LLMScheduler, RequestCancelled, PRIORITY_INTERACTIVE, PRIORITY_SUMMARY
+from tts_worker import TTSWorker, PRIORITY_NORMAL, PRIORITY_URGENT
+from tts_cache import TTSCache
+from vad import VoiceActivityGate
+from intent_router import Intent, IntentRouter
+from assistant_core import AssistantState
+from tracing import Tracer
+from speculative import SpeculativeResponder
+from process_pipeline import MultiProcessPipeline
 from datetime import datetime
 
-# Initialize text-to-speech engine
-engine = pyttsx3.init()
-voices = engine.getProperty('voices')
-engine.setProperty('voice', voices[1].id)  # Set to the second voice
-engine.setProperty('rate', 210)
+# Per-stage latency histograms (voice_metrics.prom) and per-turn span traces (voice_traces.jsonl)
+tracer = Tracer(trace_file="voice_traces.jsonl")
+metrics_port = None  # e.g. 9464 to serve the histograms to Prometheus on /metrics
+
+# Text-to-speech runs on its own thread (the engine is created there) so listening continues while speaking
+# Fixed phrases are rendered once (in the background, between replies) and then played from the cache
+tts_cache = TTSCache()
+tts = TTSWorker(lambda: load_tts(voice_index=1, rate=210), tracer=tracer, cache=tts_cache)  # Set to the second voice
+tts.start()
+tts.prerender([
+    "Voice assistant running. Say 'FRIDAY' to start.", "Yes, how can I assist you?", "Window minimized.",
+    "Provide search terms.", "I can search, minimize, or chat. Just ask!", "Conversation paused.",
+    "Conversation resumed.", "Goodbye! Saving conversation history.", "Error with conversation model.",
+    "I encountered an error.",
+])
+
+# Load the Vosk model in the background
+models = ModelRegistry()
 
 # Constants for minimizing and restoring console window
 SW_MINIMIZE, SW_RESTORE = 6, 9
 kernel32, user32 = ctypes.windll.kernel32, ctypes.windll.user32
 
 # Global states and memory
-is_processing_command, has_minimized, is_conversation_paused = False, False, False
+state = AssistantState()  # Paused/minimized flags, only touched by the recognition loop that runs process_command
+turn_started_at = None  # When the user's last command was recognized, for turn latency
+current_trace = None  # Span trace of the turn being handled
+current_speculation = None  # Reply started from the partial transcript of the command being handled
 conversation_memory = []
-conversation_file = "conversation_history.json"
+conversation_file = "conversation_history.jsonl"
+conversation_log = ConversationLog(conversation_file)
+context_window = ContextWindow(summarize=lambda summary, turns: summarize_with_ollama(summary, turns, client=llm_scheduler.client(PRIORITY_SUMMARY)))
+stream_responses = True  # Speak replies sentence by sentence as they are generated
+response_cache = ResponseCache()  # Replies to repeated questions, kept between runs
+
+# Replies go ahead of background summarization on the Ollama server; a new turn cancels a stale reply
+llm_scheduler = LLMScheduler(lambda: models.get("llm"), max_concurrent=1)
+chat_client = llm_scheduler.client(PRIORITY_INTERACTIVE, group="turn", supersede=True)
+# Start the reply once the partial transcript has settled; it is used if the final transcript matches
+speculate = True
+speculator = SpeculativeResponder(
+    llm_scheduler.client(PRIORITY_INTERACTIVE, group="speculation", supersede=True),
+    build_messages=lambda text: context_window.messages(conversation_memory + [{"role": "user", "content": text}]),
+    should_speculate=lambda text: stream_responses and command_router.route(text).intent == "conversation",
+    cancel=lambda: llm_scheduler.cancel("speculation"))
 
 # Load Vosk Model
-model_path = "vosk-model-en-in-0.5"  # Change this to your actual Vosk model path
+model_path = os.environ.get("VOSK_MODEL_PATH", "vosk-model-en-in-0.5")  # Change this to your actual Vosk model path
 if not os.path.exists(model_path):
     raise FileNotFoundError(f"Please download the Vosk model and place it in the '{model_path}' folder.")
-model = vosk.Model(model_path)
-recognizer_queue = queue.Queue()
+# "processes" runs noise reduction and Vosk in worker processes on other cores (shared-memory ring buffers)
+audio_mode = "threads"
+if audio_mode == "threads":
+    models.register("vosk", load_vosk, model_path)  # In "processes" mode the ASR worker loads its own copy
+models.register("llm", load_ollama, "llama3.2:3b", keep_alive="30m")  # Loads the model on the Ollama server at startup
+# At most ~2 s of audio waits for the recognizer; older audio is dropped so stale speech is not acted on.
+# drop_while_speaking=True also drops what the microphone hears while the assistant talks (this disables barge-in)
+drop_while_speaking = False
+recognizer_queue = AudioBlockQueue(max_blocks=64, block_size=512, policy="drop_oldest",
+                                   drop_while_speaking=drop_while_speaking, is_speaking=tts.is_speaking)
+
+# Raw audio from the callback goes through a ring buffer to the noise reduction worker
+audio_ring = AudioRingBuffer(16000 * 4)
+noise_worker = NoiseReductionWorker(audio_ring, output=recognizer_queue.put, tracer=tracer)
+callback_stats = new_callback_stats()
 
 # Load conversation history
 def load_conversation():
     global conversation_memory
+    migrate_legacy_history("conversation_history.json", conversation_file)
     if os.path.exists(conversation_file):
         try:
-            with open(conversation_file, "r") as file:
-                conversation_memory = json.load(file)
-                print("Previous conversation history loaded.")
+            conversation_memory = conversation_log.load()
+            response_cache.load()
+            print("Previous conversation history loaded.")
         except Exception as e:
             print(f"Error loading conversation history: {e}")
 
-# Save conversation history
+# Save conversation history (turns are appended as they happen, this only compacts the log)
 def save_conversation():
-    global conversation_memory
     try:
-        with open(conversation_file, "w") as file:
-            json.dump(conversation_memory, file, indent=4)
+        if conversation_log.needs_compaction():
+            conversation_log.compact()
+        response_cache.save()
+        print(response_cache.stats())
     except Exception as e:
         print(f"Error saving conversation history: {e}")
 
@@ -65,22 +123,45 @@ def restore_console():
         user32.ShowWindow(hwnd, SW_RESTORE)
         user32.SetForegroundWindow(hwnd)
 
-# Speak text aloud
-def speak(text):
+# Speak text aloud without blocking (pass wait=True to block until it has been said)
+def speak(text, priority=PRIORITY_NORMAL, wait=False):
+    global turn_started_at
     print(f"[Assistant]: {text}")
-    engine.say(text)
-    engine.runAndWait()
+    utterance = tts.say(text, priority, interruptible=priority != PRIORITY_URGENT, turn_started_at=turn_started_at,
+                        trace=current_trace)
+    turn_started_at = None  # Only the first reply of a turn counts towards its latency
+    if wait:
+        utterance.wait()
 
 # Handle conversation responses
-def respond_to_conversation(command):
+def respond_to_conversation(command, use_cache=True):
     global conversation_memory
     try:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conversation_memory.append({"timestamp": timestamp, "role": "user", "content": command})
-        response = ollama.chat(model="llama3.2:3b", messages=conversation_memory)
-        conversation_memory.append({"timestamp": timestamp, "role": "assistant", "content": response.message.content})
-        speak(response.message.content)
-        save_conversation()
+        user_turn = {"timestamp": timestamp, "role": "user", "content": command}
+        # The turn only joins the history once it has a reply, so a failed or superseded one leaves no trace
+        messages = context_window.messages(conversation_memory + [user_turn])
+        # Cached replies depend on the model, the summary of older turns and the reply being followed up
+        cache_context = ("llama3.2:3b", context_window.summary, last_reply(conversation_memory))
+        reply = response_cache.get(command, cache_context, use_cache)
+        if reply is not None:
+            speak(reply)
+        elif stream_responses:
+            with tracer.span("ollama.chat", current_trace):
+                reply = stream_response(messages, speak, client=current_speculation or chat_client)
+        else:
+            with tracer.span("ollama.chat", current_trace):
+                reply = chat_client.chat(model="llama3.2:3b", messages=messages).message.content
+            speak(reply)
+        if is_question(command):
+            response_cache.put(command, reply, cache_context, use_cache)
+        else:
+            response_cache.invalidate()  # A statement may have changed what the right answers are
+        assistant_turn = {"timestamp": timestamp, "role": "assistant", "content": reply}
+        conversation_memory.extend([user_turn, assistant_turn])
+        conversation_log.append(user_turn, assistant_turn)
+    except RequestCancelled:
+        pass  # A newer turn superseded this reply
     except Exception as e:
         speak("Error with conversation model.")
 
@@ -90,45 +171,63 @@ def perform_google_search(query):
 
 # Resume paused conversation
 def resume_conversation():
-    global is_conversation_paused
-    is_conversation_paused = False
+    state.paused = False
     speak("Conversation resumed.")
 
+# Command table, compiled once into a single-pass matcher (earlier rows win, like the old if/elif chain)
+command_router = IntentRouter([
+    Intent("exit", ["exit", "quit", "goodbye"]),
+    Intent("wake", ["friday"]),
+    Intent("minimize", ["minimize", "minimise"]),
+    Intent("google", ["google"]),
+    Intent("help", ["help"]),
+    Intent("pause", ["pause", "stop"]),
+    Intent("resume", ["unpause", "resume"]),
+])
+
 # Process user commands
 def process_command(command):
-    global is_processing_command, has_minimized, is_conversation_paused
     try:
-        if "exit" in command or "quit" in command or "goodbye" in command:
-            speak("Goodbye! Saving conversation history.")
+        with tracer.span("routing", current_trace):
+            match = command_router.route(command)
+        query = match.query
+
+        if match.intent == "exit":
+            speak("Goodbye! Saving conversation history.", PRIORITY_URGENT, wait=True)
             save_conversation()
+            report_audio_stats()
+            print(tts.latency_report())
+            print(tts_cache.report())
+            print(tracer.summary())
+            print(llm_scheduler.report())
+            print(speculator.report())
+            tracer.write()
             os._exit(0)
 
-        elif "friday" in command:
+        elif match.intent == "wake":
             restore_console()
-            query = command.replace("friday", "").strip()
             speak("Yes, how can I assist you?" if not query else f"Searching for: {query}")
             if query:
                 perform_google_search(query)
 
-        elif ("minimize" in command or "minimise" in command) and not has_minimized:
-            has_minimized = True
+        elif match.intent == "minimize" and not state.minimized:
+            state.minimized = True
             minimize_console()
             speak("Window minimized.")
 
-        elif "google" in command:
-            query = command.replace("google", "").strip()
+        elif match.intent == "google":
             speak("Provide search terms." if not query else f"Searching Google for: {query}")
             if query:
                 perform_google_search(query)
 
-        elif "help" in command:
+        elif match.intent == "help":
             speak("I can search, minimize, or chat. Just ask!")
 
-        elif "pause" in command or "stop" in command:
-            is_conversation_paused = True
+        elif match.intent == "pause":
+            state.paused = True
             speak("Conversation paused.")
 
-        elif "unpause" in command or "resume" in command:
+        elif match.intent == "resume":
             resume_conversation()
 
         else:
@@ -138,39 +237,78 @@ def process_command(command):
         print(f"Error processing command: {e}")
         speak("I encountered an error.")
 
-# Apply noise reduction to the incoming audio stream
-def reduce_noise(indata):
-    try:
-        # Apply noise reduction only if the input is valid (ensure no NaN or infinity)
-        indata = np.nan_to_num(indata)  # Replace NaN or infinite values with 0
-        reduced_noise = nr.reduce_noise(y=indata, sr=16000)
-        return reduced_noise
-    except Exception as e:
-        print(f"Error in noise reduction: {e}")
-        return indata  # Return original if error occurs
+# Report how long the audio callback takes and how often audio was dropped
+def report_audio_stats():
+    calls = max(callback_stats["calls"], 1)
+    print(f"Audio callback: {callback_stats['calls']} calls, "
+          f"mean {callback_stats['total_time'] / calls * 1000:.3f} ms, max {callback_stats['max_time'] * 1000:.3f} ms, "
+          f"input overflows {callback_stats['input_overflows']}, ring buffer overflows {audio_ring.overflows}")
+    print(recognizer_queue.stats())
+
+# Vosk audio callback for live recognition, only copies raw frames (noise reduction runs on the worker)
+vosk_callback = tracer.timed_callback("capture", ring_buffer_callback(audio_ring, callback_stats))
 
-# Vosk audio callback for live recognition
-def vosk_callback(indata, frames, time, status):
-    if status:
-        print(f"Stream status: {status}")  # If there's an issue with the stream, print status
-    # Process the input data, applying noise reduction
-    reduced_noise = reduce_noise(indata)
-    recognizer_queue.put(bytes(reduced_noise))  # Add reduced noise data to the queue
+# Wake word listener behind the VAD gate (waits for the model to finish loading)
+def create_listener():
+    # Stop talking when the user starts; the gate is deaf to anything quieter than a voice while we speak
+    gate = VoiceActivityGate(16000, on_speech_start=tts.barge_in, is_speaking=tts.is_speaking)
+    return WakeWordListener(models.get("vosk"), gate=gate,  # Spots "friday" cheaply, then runs full recognition on speech only
+                            on_partial=speculator.on_partial if speculate else None)
+
+# Decode one block of audio from the queue and process the commands it completed (returned)
+def handle_audio(listener, data):
+    global turn_started_at, current_trace, current_speculation
+    start = time.perf_counter()
+    texts = listener.accept(data)  # Process recognized audio
+    if texts:
+        current_trace = tracer.begin_turn(start)  # The turn starts with the final recognition pass
+    tracer.record("asr", time.perf_counter() - start, current_trace if texts else None, start)
+    for text in texts:
+        turn_started_at = time.perf_counter()
+        print(f"Recognized: {text}")
+        current_speculation = speculator.resolve(text)
+        try:
+            process_command(text)  # Process the command
+        finally:
+            speculator.finish(current_speculation)  # Wasted if unused, e.g. the reply came from the cache
+            current_speculation = None
+    return texts
 
 # Listen for commands using Vosk
 def listen_for_commands():
-    rec = vosk.KaldiRecognizer(model, 16000)  # Initialize recognizer for the model
+    tracer.start_exporter("voice_metrics.prom")
+    if metrics_port:
+        tracer.serve(metrics_port)
+    if audio_mode == "processes":
+        listen_with_worker_processes()
+        return
+    noise_worker.start()
     with sd.InputStream(samplerate=16000, channels=1, dtype="int16", blocksize=512, callback=vosk_callback):
+        listener = create_listener()  # Audio is already being captured and queued while the model finishes loading
         print("Listening for commands...")
         while True:
             try:
                 data = recognizer_queue.get()  # Get audio data from the queue
-                if rec.AcceptWaveform(data):  # Process recognized audio
-                    result = json.loads(rec.Result())  # Parse the recognized result
-                    text = result.get("text", "").strip()  # Extract text from result
-                    if text:
-                        print(f"Recognized: {text}")
-                        process_command(text)  # Process the command
+                handle_audio(listener, data)
+            except Exception as e:
+                print(f"Error in processing audio: {e}")
+
+# Same loop with noise reduction and Vosk (wake word + VAD) in worker processes; only recognized text comes back
+def listen_with_worker_processes():
+    global turn_started_at, current_trace
+    pipeline = MultiProcessPipeline(model_path, recognizer="wake_word", on_speech_start=tts.barge_in,
+                                    is_speaking=tts.is_speaking)
+    pipeline.start()
+    with sd.InputStream(samplerate=16000, channels=1, dtype="int16", blocksize=512,
+                        callback=tracer.timed_callback("capture", pipeline.callback)):
+        print("Listening for commands...")
+        while True:
+            try:
+                text = pipeline.get()
+                turn_started_at = time.perf_counter()
+                current_trace = tracer.begin_turn(turn_started_at)
+                print(f"Recognized: {text}")
+                process_command(text)
             except Exception as e:
                 print(f"Error in processing audio: {e}")
 
@@ -182,7 +320,7 @@ def main():
         listen_for_commands()
     except Exception as e:
         print(f"Error in main function: {e}")
-        speak(f"Error: {e}")
+        speak(f"Error: {e}", PRIORITY_URGENT, wait=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,223 @@
+import collections
+import json
+import time
+import wave
+import speech_recognition as sr
+
+# All backends take 16 kHz, 16-bit mono PCM
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+class GoogleBackend:
+    """Online recognition through speech_recognition's Google Web Speech API."""
+
+    name = "google"
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, data):
+        try:
+            return self.recognizer.recognize_google(sr.AudioData(data, SAMPLE_RATE, SAMPLE_WIDTH))
+        except sr.UnknownValueError:
+            return ""  # Nothing intelligible is an answer, not a backend failure
+
+
+class VoskBackend:
+    """Offline recognition with a Vosk model (get_model may block until the model is loaded).
+
+    The router can stream an utterance in with accept() while the user is
+    still talking, so recognize() only has to collect the text; a phrase that
+    was not streamed (e.g. one handed over after another backend failed) is
+    decoded whole. Either way the audio goes through a WakeWordListener: only
+    the wake-word grammar is decoded until one of wake_words is heard, and
+    only what is said from then on (and during the follow-up window) is
+    returned. wake_words=None decodes everything.
+    """
+
+    name = "vosk"
+
+    def __init__(self, get_model, wake_words=("friday",)):
+        self.get_model = get_model
+        self.wake_words = wake_words
+        self.rec = None
+        self.listener = None
+        self.results = []
+        self.streamed = False
+
+    def accept(self, blocks, utterance_ended):
+        """Decode the next gated blocks of the current utterance."""
+        self.streamed = True
+        if self.wake_words:
+            if self.listener is None:
+                from wake_word import WakeWordListener
+                self.listener = WakeWordListener(self.get_model(), self.wake_words, SAMPLE_RATE)
+            self.results.extend(self.listener.accept_speech(blocks, utterance_ended))
+            return
+        if self.rec is None:
+            import vosk
+            self.rec = vosk.KaldiRecognizer(self.get_model(), SAMPLE_RATE)
+        for block in blocks:
+            if self.rec.AcceptWaveform(block):
+                self.results.append(json.loads(self.rec.Result()).get("text", ""))
+        if utterance_ended:
+            self.results.append(json.loads(self.rec.FinalResult()).get("text", ""))
+            self.rec.Reset()
+
+    def discard(self):
+        """Forget what was streamed since the last recognize() (the phrase went elsewhere or streaming failed)."""
+        self.streamed = False
+        self.results = []
+        if self.rec is not None:
+            self.rec.Reset()
+        if self.listener is not None and self.listener.in_utterance:
+            self.listener = None  # Cut off mid-utterance, start over (back to wake word spotting)
+
+    def recognize(self, data):
+        if not self.streamed:
+            self.accept([data], True)
+        text = " ".join(result for result in self.results if result)
+        self.streamed = False
+        self.results = []
+        return text
+
+
+class MicrophoneSource:
+    """Captures one phrase at a time from the default microphone."""
+
+    def __init__(self, phrase_time_limit=10):
+        self.recognizer = sr.Recognizer()
+        self.phrase_time_limit = phrase_time_limit
+        self.calibrated = False
+
+    def capture(self):
+        with sr.Microphone() as source:
+            if not self.calibrated:
+                self.recognizer.adjust_for_ambient_noise(source)
+                self.calibrated = True
+            audio = self.recognizer.listen(source, phrase_time_limit=self.phrase_time_limit)
+        return audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=SAMPLE_WIDTH)
+
+
+class WavReplaySource:
+    """Replays 16 kHz mono 16-bit WAV files in place of the microphone (for tests and benchmarks)."""
+
+    def __init__(self, paths):
+        self.paths = collections.deque(paths)
+
+    def capture(self):
+        if not self.paths:
+            raise EOFError("No more WAV files to replay.")
+        with wave.open(self.paths.popleft(), "rb") as file:
+            if file.getframerate() != SAMPLE_RATE or file.getnchannels() != 1 or file.getsampwidth() != SAMPLE_WIDTH:
+                raise ValueError(f"{file} must be 16 kHz mono 16-bit PCM")
+            return file.readframes(file.getnframes())
+
+
+class BackendHealth:
+    """Success/failure counts and recent latencies for one backend."""
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.slow = 0
+        self.consecutive_failures = 0
+        self.disabled_until = 0.0
+        self.latencies = collections.deque(maxlen=200)
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+class ASRRouter:
+    """Sends each captured phrase to the first healthy backend, failing over at runtime.
+
+    Backends are tried in preference order. An exception, or a result slower
+    than latency_budget, counts against a backend; after max_failures in a row
+    it is skipped for cooldown seconds and the next backend takes over. A
+    failed backend's phrase is retried on the next backend, so the user does
+    not have to repeat themselves. Nothing is probed at startup.
+
+    With a source that reports speech as it is captured (CaptureService's
+    on_speech), each utterance is streamed to the preferred backend while the
+    user talks if that backend can decode incrementally (has accept()).
+    """
+
+    def __init__(self, backends, source, latency_budget=4.0, max_failures=2, cooldown=60.0):
+        self.backends = backends
+        self.source = source
+        self.latency_budget = latency_budget
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.health = {backend.name: BackendHealth() for backend in backends}
+        self.streaming = None  # Backend fed the current utterance, False if the preferred one cannot stream
+        if hasattr(source, "on_speech"):
+            source.on_speech = self.accept_speech
+
+    def available_backends(self):
+        now = time.monotonic()
+        healthy = [backend for backend in self.backends if self.health[backend.name].disabled_until <= now]
+        return healthy or self.backends  # Everything is cooling down, try them all anyway
+
+    def record_failure(self, backend, health):
+        health.consecutive_failures += 1
+        if health.consecutive_failures >= self.max_failures:
+            health.disabled_until = time.monotonic() + self.cooldown
+            health.consecutive_failures = 0
+            print(f"Speech recognition backend '{backend.name}' disabled for {self.cooldown:.0f}s, failing over.")
+
+    def accept_speech(self, blocks, utterance_ended):
+        if self.streaming is None:
+            backend = self.available_backends()[0]
+            self.streaming = backend if hasattr(backend, "accept") else False
+        if not self.streaming:
+            return
+        try:
+            self.streaming.accept(blocks, utterance_ended)
+        except Exception as e:
+            print(f"Speech recognition backend '{self.streaming.name}' failed while streaming: {e}")
+            self.streaming.discard()
+            self.streaming = False  # recognize() decodes the whole phrase instead
+
+    def recognize(self, data):
+        streaming, self.streaming = self.streaming, None
+        try:
+            for backend in self.available_backends():
+                health = self.health[backend.name]
+                start = time.perf_counter()
+                try:
+                    text = backend.recognize(data)
+                except Exception as e:
+                    health.failures += 1
+                    print(f"Speech recognition backend '{backend.name}' failed: {e}")
+                    self.record_failure(backend, health)
+                    continue
+                elapsed = time.perf_counter() - start
+                health.latencies.append(elapsed)
+                health.successes += 1
+                if elapsed > self.latency_budget:
+                    health.slow += 1
+                    self.record_failure(backend, health)
+                else:
+                    health.consecutive_failures = 0
+                return text
+            raise RuntimeError("No speech recognition backend is available.")
+        finally:
+            if streaming:
+                streaming.discard()  # Nothing left once recognize() collected it; stale if another backend answered
+
+    def listen(self):
+        """Capture one phrase from the source and return its lowercase transcript."""
+        data = self.source.capture()
+        return self.recognize(data).lower().strip() if data else ""
+
+    def report(self):
+        lines = []
+        for name, health in self.health.items():
+            lines.append(f"{name}: {health.successes} ok, {health.failures} errors, {health.slow} over budget, "
+                         f"p50 {health.percentile(0.5) * 1000:.0f} ms, p95 {health.percentile(0.95) * 1000:.0f} ms")
+        return "\n".join(lines)
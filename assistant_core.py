@@ -0,0 +1,292 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import ollama
+from speech_output import split_sentences
+
+STAGES = ("capture", "asr", "route", "llm", "tts")
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else None
+
+
+class AssistantState:
+    """State shared by the pipeline tasks (replaces the module-level flags).
+
+    Only touched from the event loop thread, so it needs no locking; scripts
+    not running on AssistantCore use it from their one command-handling thread.
+    """
+
+    def __init__(self):
+        self.paused = False
+        self.minimized = False
+        self.turns_in_flight = 0
+
+
+class Turn:
+    """One utterance on its way through the pipeline, with the time of each stage event."""
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.text = ""
+        self.times = {"captured": time.perf_counter()}
+        self.pending = 1  # Work still to do for this turn: routing, queued LLM jobs, queued sentences
+
+    def mark(self, event):
+        self.times.setdefault(event, time.perf_counter())
+
+
+class StageMetrics:
+    """Busy intervals per stage and per-turn latencies, to show how much the stages overlap."""
+
+    def __init__(self):
+        self.intervals = {stage: [] for stage in STAGES}
+        self.turns = []
+        self.started_at = time.perf_counter()
+
+    def record(self, stage, start, end):
+        self.intervals[stage].append((start, end))
+
+    def busy(self, stage):
+        return sum(end - start for start, end in self.intervals[stage])
+
+    def overlap(self, first, second):
+        """Seconds during which both stages were busy at the same time."""
+        total = 0.0
+        for first_start, first_end in self.intervals[first]:
+            for second_start, second_end in self.intervals[second]:
+                total += max(0.0, min(first_end, second_end) - max(first_start, second_start))
+        return total
+
+    def report(self):
+        wall = time.perf_counter() - self.started_at
+        lines = [f"{stage:8s} busy {self.busy(stage):7.2f}s over {len(self.intervals[stage])} runs" for stage in STAGES]
+        lines.append(f"Concurrency {sum(self.busy(stage) for stage in STAGES) / max(wall, 1e-9):.2f} "
+                     f"(sum of busy time / {wall:.1f}s wall clock; above 1 means stages overlapped)")
+        for first, second in (("llm", "tts"), ("capture", "llm"), ("capture", "tts"), ("asr", "llm")):
+            lines.append(f"{first}/{second} overlap {self.overlap(first, second):.2f}s")
+        for label, start, end in (("capture -> recognized", "captured", "recognized"),
+                                  ("recognized -> first token", "recognized", "first_token"),
+                                  ("recognized -> first audio", "recognized", "first_audio"),
+                                  ("recognized -> done", "recognized", "done")):
+            values = [turn.times[end] - turn.times[start] for turn in self.turns if start in turn.times and end in turn.times]
+            if values:
+                lines.append(f"{label:26s} p50 {percentile(values, 0.5) * 1000:7.0f} ms, "
+                             f"p95 {percentile(values, 0.95) * 1000:7.0f} ms ({len(values)} turns)")
+        return "\n".join(lines)
+
+
+class AssistantCore:
+    """Runs capture, recognition, routing, the LLM and TTS as asyncio tasks joined by bounded queues.
+
+    capture() and recognize(audio) are blocking callables run in worker
+    threads, speak(text) runs on a dedicated TTS thread, and handle(core, turn)
+    is a coroutine doing the intent dispatch: it speaks through say() and hands
+    conversation replies to submit(), whose jobs run one at a time on the LLM
+    task and stream through chat(). Every queue is bounded, so a slow stage
+    makes the stages before it wait instead of piling up work.
+
+    Unless listen_while_speaking is set (e.g. on headphones), capture waits
+    until the previous turn has been fully handled and spoken, so the
+    assistant does not hear itself; the LLM and TTS still overlap.
+    """
+
+    def __init__(self, capture, recognize, handle, speak, state=None, model="llama3.2:3b", client=None,
+                 queue_size=2, speech_queue_size=8, listen_while_speaking=False):
+        self.capture = capture
+        self.recognize = recognize
+        self.handle = handle
+        self.speak = speak
+        self.state = state or AssistantState()
+        self.model = model
+        self.client = client
+        self.queue_size = queue_size
+        self.speech_queue_size = speech_queue_size
+        self.listen_while_speaking = listen_while_speaking
+        self.speech_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self.metrics = StageMetrics()
+
+    async def run(self):
+        """Run the pipeline until stop() is called."""
+        if self.client is None:
+            self.client = ollama.AsyncClient()
+        self.audio_queue = asyncio.Queue(self.queue_size)
+        self.text_queue = asyncio.Queue(self.queue_size)
+        self.llm_queue = asyncio.Queue(self.queue_size)
+        self.speech_queue = asyncio.Queue(self.speech_queue_size)
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.stopped = asyncio.Event()
+        tasks = [asyncio.create_task(loop()) for loop in
+                 (self.capture_loop, self.asr_loop, self.route_loop, self.llm_loop, self.tts_loop)]
+        try:
+            await self.stopped.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        self.stopped.set()
+
+    def begin(self, turn):
+        self.state.turns_in_flight += 1
+        self.idle.clear()
+
+    def release(self, turn):
+        """Finish one piece of work for turn; the turn is done when none is left."""
+        turn.pending -= 1
+        if turn.pending:
+            return
+        turn.mark("done")
+        self.metrics.turns.append(turn)
+        self.state.turns_in_flight -= 1
+        if not self.state.turns_in_flight:
+            self.idle.set()
+
+    async def say(self, text, turn=None):
+        """Queue text for the TTS task (waits while the speech queue is full)."""
+        if turn is not None:
+            turn.pending += 1
+        await self.speech_queue.put((turn, text))
+
+    async def submit(self, turn, job):
+        """Queue job(core, turn) for the LLM task."""
+        turn.pending += 1
+        await self.llm_queue.put((turn, job))
+
+    async def drain(self):
+        """Wait until everything queued for TTS has been spoken."""
+        await self.speech_queue.join()
+
+    async def chat(self, turn, messages):
+        """Stream a reply from the async client, handing each finished sentence to TTS as it arrives."""
+        start = time.perf_counter()
+        full_text = ""
+        buffer = ""
+        try:
+            async for chunk in await self.client.chat(model=self.model, messages=messages, stream=True):
+                turn.mark("first_token")
+                text = chunk["message"]["content"]
+                full_text += text
+                sentences, buffer = split_sentences(buffer + text)
+                for sentence in sentences:
+                    await self.say(sentence, turn)
+            if buffer.strip():
+                await self.say(buffer.strip(), turn)
+        finally:
+            self.metrics.record("llm", start, time.perf_counter())
+        return full_text.strip()
+
+    async def capture_loop(self):
+        while True:
+            if not self.listen_while_speaking:
+                await self.idle.wait()
+            start = time.perf_counter()
+            audio = await asyncio.to_thread(self.capture)
+            self.metrics.record("capture", start, time.perf_counter())
+            if audio is not None:
+                turn = Turn(audio)
+                self.begin(turn)
+                await self.audio_queue.put(turn)
+
+    async def asr_loop(self):
+        while True:
+            turn = await self.audio_queue.get()
+            start = time.perf_counter()
+            try:
+                turn.text = await asyncio.to_thread(self.recognize, turn.audio)
+            except Exception as e:
+                print(f"Recognition error: {e}")
+                turn.text = None
+            self.metrics.record("asr", start, time.perf_counter())
+            turn.audio = None
+            if turn.text:
+                turn.mark("recognized")
+                await self.text_queue.put(turn)
+            else:
+                self.release(turn)
+
+    async def route_loop(self):
+        while True:
+            turn = await self.text_queue.get()
+            start = time.perf_counter()
+            try:
+                await self.handle(self, turn)
+            except Exception as e:
+                print(f"Error handling command: {e}")
+            self.metrics.record("route", start, time.perf_counter())
+            self.release(turn)
+
+    async def llm_loop(self):
+        while True:
+            turn, job = await self.llm_queue.get()
+            try:
+                await job(self, turn)
+            except Exception as e:
+                print(f"Error with conversation model: {e}")
+            self.release(turn)
+
+    async def tts_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            turn, text = await self.speech_queue.get()
+            start = time.perf_counter()
+            if turn is not None:
+                turn.mark("first_audio")
+            try:
+                await loop.run_in_executor(self.speech_executor, self.speak, text)
+            except Exception as e:
+                print(f"Error speaking: {e}")
+            self.metrics.record("tts", start, time.perf_counter())
+            self.speech_queue.task_done()
+            if turn is not None:
+                self.release(turn)
+
+
+# Simulated session: shows the stages overlapping without a microphone, speaker or Ollama
+def benchmark(turns=5, listen_while_speaking=True):
+    class StubClient:
+        async def chat(self, model, messages, stream):
+            async def chunks():
+                for word in ("Sure. " * 3 + "Here is a longer answer that takes a while to generate.").split(" "):
+                    await asyncio.sleep(0.04)  # ~25 tokens/s
+                    yield {"message": {"content": word + " "}}
+            return chunks()
+
+    captured = iter(range(turns))
+
+    def capture():
+        time.sleep(0.5)  # The user speaking
+        return next(captured, None)
+
+    def recognize(audio):
+        time.sleep(0.15)
+        return f"tell me something {audio}"
+
+    async def respond(core, turn):
+        await core.chat(turn, [{"role": "user", "content": turn.text}])
+
+    async def handle(core, turn):
+        await core.submit(turn, respond)
+
+    async def session():
+        core = AssistantCore(capture, recognize, handle, lambda text: time.sleep(0.3), client=StubClient(),
+                             listen_while_speaking=listen_while_speaking)
+        runner = asyncio.create_task(core.run())
+        while len(core.metrics.turns) < turns:
+            await asyncio.sleep(0.05)
+        core.stop()
+        await runner
+        return core
+
+    core = asyncio.run(session())
+    print(core.metrics.report())
+
+
+if __name__ == "__main__":
+    for listen_while_speaking in (False, True):
+        print(f"\nlisten_while_speaking={listen_while_speaking}")
+        benchmark(listen_while_speaking=listen_while_speaking)
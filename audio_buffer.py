@@ -0,0 +1,155 @@
+import queue
+import threading
+import time
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Single-producer, single-consumer ring buffer of int16 samples.
+
+    The audio callback only copies frames in with write(); a worker thread drains
+    them with read(). Each side only moves its own index, so no lock is taken
+    in the callback. When the consumer falls behind, the incoming block is
+    dropped and counted in overflows instead of blocking the audio thread.
+    """
+
+    def __init__(self, capacity=16000 * 4):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.int16)
+        self.write_index = 0  # Total samples ever written
+        self.read_index = 0  # Total samples ever read
+        self.overflows = 0
+
+    def available(self):
+        return self.write_index - self.read_index
+
+    def write(self, samples):
+        """Copy samples in; returns False if there was no room."""
+        count = len(samples)
+        if count > self.capacity - self.available():
+            self.overflows += 1
+            return False
+        start = self.write_index % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        if first < count:
+            self.buffer[:count - first] = samples[first:]
+        self.write_index += count
+        return True
+
+    def read(self, count):
+        """Copy out up to count samples (fewer if not enough are buffered)."""
+        count = min(count, self.available())
+        start = self.read_index % self.capacity
+        first = min(count, self.capacity - start)
+        samples = np.empty(count, dtype=np.int16)
+        samples[:first] = self.buffer[start:start + first]
+        if first < count:
+            samples[first:] = self.buffer[:count - first]
+        self.read_index += count
+        return samples
+
+
+class AudioBlockQueue:
+    """Bounded FIFO of int16 audio blocks for the recognizer, in preallocated NumPy storage.
+
+    A drop-in for the queue.Queue of bytes between the audio side and the
+    recognizer loop (put, get, qsize, empty). put() copies samples into the
+    next slot without allocating; get() returns the block as bytes, ready for
+    AcceptWaveform. When the recognizer falls behind (e.g. process_command is
+    waiting on the LLM), the overflow policy decides what is lost:
+    "drop_oldest" discards the stalest block, so what is eventually heard is
+    recent speech, "drop_newest" rejects the incoming one. With
+    drop_while_speaking, blocks arriving while is_speaking() returns True are
+    discarded, so the assistant does not queue up its own voice.
+    """
+
+    def __init__(self, max_blocks=64, block_size=512, policy="drop_oldest", drop_while_speaking=False, is_speaking=None):
+        if policy not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_blocks = max_blocks
+        self.block_size = block_size
+        self.policy = policy
+        self.drop_while_speaking = drop_while_speaking
+        self.is_speaking = is_speaking
+        self.slots = np.zeros((max_blocks, block_size), dtype=np.int16)
+        self.lengths = [0] * max_blocks
+        self.head = 0  # Total blocks ever taken out (or dropped from the front)
+        self.tail = 0  # Total blocks ever stored
+        self.condition = threading.Condition()
+        self.blocks_in = 0
+        self.max_depth = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.dropped_while_speaking = 0
+
+    def put(self, samples):
+        """Store int16 samples (an array or bytes), split into blocks of block_size."""
+        if not isinstance(samples, np.ndarray):
+            samples = np.frombuffer(samples, dtype=np.int16)
+        samples = samples.reshape(-1)
+        if self.drop_while_speaking and self.is_speaking is not None and self.is_speaking():
+            self.dropped_while_speaking += 1
+            return
+        with self.condition:
+            for offset in range(0, len(samples), self.block_size):
+                chunk = samples[offset:offset + self.block_size]
+                self.blocks_in += 1
+                if self.tail - self.head == self.max_blocks:
+                    if self.policy == "drop_newest":
+                        self.dropped_newest += 1
+                        continue
+                    self.head += 1
+                    self.dropped_oldest += 1
+                slot = self.tail % self.max_blocks
+                self.slots[slot, :len(chunk)] = chunk
+                self.lengths[slot] = len(chunk)
+                self.tail += 1
+            self.max_depth = max(self.max_depth, self.tail - self.head)
+            self.condition.notify()
+
+    def get(self, block=True, timeout=None):
+        """Return the oldest block as bytes; raises queue.Empty like queue.Queue.get."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.tail > self.head, timeout if block else 0):
+                raise queue.Empty
+            slot = self.head % self.max_blocks
+            data = self.slots[slot, :self.lengths[slot]].tobytes()
+            self.head += 1
+            return data
+
+    def qsize(self):
+        return self.tail - self.head
+
+    def empty(self):
+        return self.tail == self.head
+
+    def full(self):
+        return self.tail - self.head == self.max_blocks
+
+    def stats(self):
+        dropped = self.dropped_oldest + self.dropped_newest
+        return (f"Recognizer queue: depth {self.qsize()}/{self.max_blocks} (max {self.max_depth}), "
+                f"{self.blocks_in} blocks in, dropped {dropped} on overflow ({self.policy}), "
+                f"{self.dropped_while_speaking} while speaking")
+
+
+# Build a sounddevice callback that only copies frames into ring, recording its own cost
+def ring_buffer_callback(ring, stats):
+    """stats is a dict with calls, total_time, max_time and input_overflows counters."""
+    def callback(indata, frames, time_info, status):
+        start = time.perf_counter()
+        if status:
+            if status.input_overflow:
+                stats["input_overflows"] += 1
+            print(f"Stream status: {status}")  # If there's an issue with the stream, print status
+        ring.write(indata[:, 0])
+        elapsed = time.perf_counter() - start
+        stats["calls"] += 1
+        stats["total_time"] += elapsed
+        stats["max_time"] = max(stats["max_time"], elapsed)
+    return callback
+
+
+def new_callback_stats():
+    return {"calls": 0, "total_time": 0.0, "max_time": 0.0, "input_overflows": 0}
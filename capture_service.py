@@ -0,0 +1,125 @@
+import asyncio
+import queue
+import time
+import sounddevice as sd
+from vad import VoiceActivityGate
+
+
+class CaptureService:
+    """Keeps one input stream open for the whole session and yields complete utterances.
+
+    The callback only queues raw blocks; utterances() runs them through the VAD
+    gate and yields the PCM of each utterance as soon as the hangover after it
+    has passed. Small blocks (blocksize, in samples) keep the buffering delay
+    low, and because the stream never closes no audio is lost between turns.
+    Implements capture(), so it can be used as an ASRRouter source.
+
+    While is_speaking() is true (e.g. TTSWorker.is_speaking) the callback
+    drops the microphone audio, so the assistant does not transcribe its own
+    voice. on_speech, if set, is called as on_speech(blocks, utterance_ended)
+    with the gate's output for every block of an utterance, so a recognizer
+    can decode while the user is still talking (ASRRouter sets it).
+    """
+
+    def __init__(self, sample_rate=16000, blocksize=480, gate=None, max_utterance_seconds=15, is_speaking=None):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.gate = gate if gate is not None else VoiceActivityGate(sample_rate)
+        self.max_utterance_samples = max_utterance_seconds * sample_rate
+        self.is_speaking = is_speaking
+        self.on_speech = None
+        self.blocks = queue.Queue()
+        self.stream = None
+        self.iterator = None
+        self.status_errors = 0
+        self.dropped_blocks = 0
+        self.last_utterance_ended_at = None
+
+    def callback(self, indata, frames, time_info, status):
+        if status:
+            self.status_errors += 1
+        if self.is_speaking is not None and self.is_speaking():
+            self.dropped_blocks += 1
+            return
+        self.blocks.put(bytes(indata))
+
+    def start(self):
+        if self.stream is None:
+            self.stream = sd.RawInputStream(samplerate=self.sample_rate, blocksize=self.blocksize, dtype="int16",
+                                            channels=1, callback=self.callback)
+            self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def utterances(self):
+        """Generator of utterances (int16 PCM bytes), starting the stream if needed."""
+        self.start()
+        parts = []
+        length = 0
+        while True:
+            blocks, utterance_ended = self.gate.process(self.blocks.get())
+            parts.extend(blocks)
+            length += sum(len(block) for block in blocks) // 2
+            if not utterance_ended and length >= self.max_utterance_samples:
+                self.gate.end_utterance()  # Otherwise the next block would carry on the cut utterance
+                utterance_ended = True
+            if self.on_speech is not None and (blocks or utterance_ended):
+                self.on_speech(blocks, utterance_ended)
+            if utterance_ended:
+                self.last_utterance_ended_at = time.perf_counter()
+                yield b"".join(parts)
+                parts = []
+                length = 0
+
+    def capture(self):
+        """Block until the next utterance and return it."""
+        if self.iterator is None:
+            self.iterator = self.utterances()
+        return next(self.iterator)
+
+    async def async_utterances(self):
+        """Async iterator over utterances, waiting for audio on a worker thread."""
+        loop = asyncio.get_running_loop()
+        while True:
+            yield await loop.run_in_executor(None, self.capture)
+
+
+# Benchmark: per-utterance latency of reopening an 8000-sample stream per command versus the persistent service
+def benchmark(model_path, utterance_seconds=2.0, runs=5):
+    import json
+    import numpy as np
+    import vosk
+    model = vosk.Model(model_path)
+
+    open_times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        stream = sd.RawInputStream(samplerate=16000, blocksize=8000, dtype="int16", channels=1)
+        stream.start()
+        stream.stop()
+        stream.close()
+        open_times.append(time.perf_counter() - start)
+    device_open = sum(open_times) / runs
+
+    rng = np.random.default_rng(0)
+    audio = (rng.normal(0, 2000, int(utterance_seconds * 16000))).astype(np.int16).tobytes()
+    for blocksize, per_turn_open in ((8000, device_open), (480, 0.0)):
+        rec = vosk.KaldiRecognizer(model, 16000)
+        start = time.perf_counter()
+        for offset in range(0, len(audio), blocksize * 2):
+            rec.AcceptWaveform(audio[offset:offset + blocksize * 2])
+        json.loads(rec.FinalResult())
+        decode = time.perf_counter() - start
+        buffering = blocksize / 16000  # The last block is only delivered once it is full
+        total = per_turn_open + buffering + decode
+        print(f"blocksize {blocksize:5d} | device open/close {per_turn_open * 1000:6.1f} ms | "
+              f"buffering {buffering * 1000:6.1f} ms | decode {decode * 1000:6.1f} ms | total {total * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "vosk-model-small-en-us-0.15")
@@ -0,0 +1,137 @@
+import threading
+import time
+import ollama
+
+# Fields ollama.chat understands; anything else (e.g. timestamp) is stripped
+MESSAGE_FIELDS = ("role", "content")
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def strip_message(entry):
+    """Keep only the fields the chat API expects."""
+    return {field: entry[field] for field in MESSAGE_FIELDS if field in entry}
+
+
+# Summarize older turns with the local model
+def summarize_with_ollama(summary, turns, model="llama3.2:3b", client=ollama):
+    transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+    prompt = (
+        "Update the running summary of a conversation between a user and a voice assistant. "
+        "Keep names, preferences and facts the user shared. Reply with the summary only.\n\n"
+        f"Current summary:\n{summary or '(empty)'}\n\nNew turns:\n{transcript}"
+    )
+    response = client.chat(model=model, messages=[{"role": "user", "content": prompt}])
+    return response.message.content.strip()
+
+
+class ContextWindow:
+    """Token-budgeted sliding window over the conversation with a rolling summary.
+
+    messages() returns the most recent turns that fit in token_budget, preceded
+    by a system message holding the summary of everything older. Turns that fall
+    out of the window are folded into the summary on a background thread, so a
+    reply never waits for summarization; until a fold finishes, those turns are
+    simply left out of the prompt.
+    """
+
+    def __init__(self, token_budget=1500, fold_budget=1500, max_backlog_turns=200, summarize=summarize_with_ollama):
+        self.token_budget = token_budget
+        self.fold_budget = fold_budget
+        self.max_backlog_turns = max_backlog_turns
+        self.summarize = summarize
+        self.summary = ""
+        self.summarized_upto = None
+        self.summary_thread = None
+        self.lock = threading.Lock()
+
+    def window_start(self, history):
+        """Index of the oldest turn that still fits in the token budget."""
+        used = 0
+        start = len(history)
+        while start > 0:
+            cost = estimate_tokens(history[start - 1].get("content", ""))
+            if used + cost > self.token_budget and start < len(history):
+                break
+            used += cost
+            start -= 1
+        return start
+
+    def messages(self, history, recalled=()):
+        """Build the message list to send to ollama.chat.
+
+        recalled are older turns retrieved for the current question (e.g. by
+        SemanticMemory); they are passed to the model as a system message.
+        """
+        start = self.window_start(history)
+        with self.lock:
+            if self.summarized_upto is None:
+                # Older history is left to the history search rather than summarized on first run
+                self.summarized_upto = max(0, start - self.max_backlog_turns)
+            if self.summarized_upto < start:
+                self.schedule_fold(history, start)
+            summary = self.summary
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        if recalled:
+            turns = "\n".join(f"{entry['role']}: {entry['content']}" for entry in recalled)
+            messages.append({"role": "system", "content": f"Relevant turns from earlier conversations:\n{turns}"})
+        messages.extend(strip_message(entry) for entry in history[start:])
+        return messages
+
+    def schedule_fold(self, history, start):
+        """Fold turns between the summary and the window into the summary (lock held)."""
+        if self.summary_thread is not None and self.summary_thread.is_alive():
+            return
+        end = self.summarized_upto
+        used = 0
+        while end < start and used < self.fold_budget:
+            used += estimate_tokens(history[end].get("content", ""))
+            end += 1
+        turns = [strip_message(entry) for entry in history[self.summarized_upto:end]]
+        self.summary_thread = threading.Thread(target=self.fold, args=(turns, end), daemon=True)
+        self.summary_thread.start()
+
+    def fold(self, turns, end):
+        try:
+            summary = self.summarize(self.summary, turns)
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+            return
+        with self.lock:
+            self.summary = summary
+            self.summarized_upto = end
+
+    def wait_for_summary(self, timeout=None):
+        """Block until the running fold (if any) has finished."""
+        thread = self.summary_thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+# Benchmark: time-to-first-token for the full history versus the bounded window
+def benchmark(model="llama3.2:3b", sizes=(10, 100, 500, 2000)):
+    def first_token_time(messages):
+        start = time.perf_counter()
+        for _ in ollama.chat(model=model, messages=messages, stream=True):
+            return time.perf_counter() - start
+
+    for size in sizes:
+        window = ContextWindow(summarize=lambda summary, turns: summary or "The user is testing the assistant.")
+        history = []
+        for i in range(size):
+            history.append({"timestamp": "2024-12-21 19:31:11", "role": "user", "content": f"Tell me fact number {i} about the ocean."})
+            history.append({"timestamp": "2024-12-21 19:31:11", "role": "assistant", "content": f"Ocean fact {i}: the ocean covers most of the planet and holds most of its water."})
+        history.append({"role": "user", "content": "What is my name?"})
+        full = first_token_time([strip_message(entry) for entry in history])
+        bounded = first_token_time(window.messages(history))
+        window.wait_for_summary()
+        print(f"{len(history):6d} turns | full history TTFT {full:6.2f}s | bounded window TTFT {bounded:6.2f}s")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+
+# Default locations of the conversation history
+conversation_log_file = "conversation_history.jsonl"
+legacy_conversation_file = "conversation_history.json"
+
+
+class ConversationLog:
+    """Append-only JSON Lines store for conversation turns.
+
+    Every turn is written as one line and fsync'd, so a reply costs a single
+    small write instead of re-serializing the whole history. A torn final line
+    left by a crash is skipped on load and dropped at the next compaction.
+
+    Every compaction bumps generation, which is kept in a {"log_generation": n}
+    header line of the rewritten file. Indexes keyed on entry positions store
+    the generation they were built from and rebuild when it changes, since
+    the positions no longer line up after a trim even if the log has grown
+    back past its old length.
+    """
+
+    def __init__(self, path=conversation_log_file, compact_every=500, max_entries=None):
+        self.path = path
+        self.compact_every = compact_every
+        self.max_entries = max_entries
+        self.appends_since_compaction = 0
+        self.corrupt_lines = 0
+        self.entry_count = 0
+        self.torn_tail = False
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def iter_entries(self):
+        """Stream entries back from disk one line at a time."""
+        self.corrupt_lines = 0
+        self.entry_count = 0
+        self.torn_tail = False
+        self.generation = 0
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                self.torn_tail = not line.endswith("\n")
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    self.corrupt_lines += 1
+                    continue
+                if isinstance(entry, dict) and entry.keys() == {"log_generation"}:
+                    self.generation = entry["log_generation"]
+                    continue
+                self.entry_count += 1
+                yield entry
+
+    def load(self):
+        """Load the whole log into a list."""
+        return list(self.iter_entries())
+
+    def append(self, *entries):
+        """Append one or more entries and flush them to disk."""
+        if not entries:
+            return
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        with self.lock:
+            if self.torn_tail:
+                data = "\n" + data  # Keep the first new entry off a half-written line
+                self.torn_tail = False
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            self.entry_count += len(entries)
+            self.appends_since_compaction += len(entries)
+            if self.appends_since_compaction >= self.compact_every and self.needs_compaction():
+                self._compact_locked()
+
+    def needs_compaction(self):
+        """Only rewrite the log when there is something to drop."""
+        if self.corrupt_lines:
+            return True
+        return self.max_entries is not None and self.entry_count > self.max_entries
+
+    def compact(self):
+        """Rewrite the log without corrupt lines, trimmed to max_entries."""
+        with self.lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        entries = list(self.iter_entries())
+        if self.max_entries is not None:
+            entries = entries[-self.max_entries:]
+        generation = self.generation + 1
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(json.dumps({"log_generation": generation}) + "\n")
+            for entry in entries:
+                file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)  # Atomic swap, the old log stays valid until here
+        self.generation = generation
+        self.entry_count = len(entries)
+        self.corrupt_lines = 0
+        self.torn_tail = False
+        self.appends_since_compaction = 0
+
+
+# One-time migration from the old indented JSON array format
+def migrate_legacy_history(legacy_path=legacy_conversation_file, log_path=conversation_log_file):
+    """Convert conversation_history.json into the JSON Lines log if needed."""
+    if os.path.exists(log_path) or not os.path.exists(legacy_path):
+        return False
+    try:
+        with open(legacy_path, "r", encoding="utf-8") as file:
+            entries = json.load(file)
+    except Exception as e:
+        print(f"Error reading legacy conversation history: {e}")
+        return False
+    temp_path = log_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        for entry in entries:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, log_path)
+    print(f"Migrated {len(entries)} entries from {legacy_path} to {log_path}.")
+    return True
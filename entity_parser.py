@@ -0,0 +1,97 @@
+import collections
+import threading
+import time
+
+# Components of en_core_web_sm that entity extraction does not use
+NON_NER_COMPONENTS = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter", "morphologizer"]
+
+
+def load_ner_pipeline(name="en_core_web_sm"):
+    """Load only what doc.ents needs; tok2vec is dropped too when ner has its own embedding layer."""
+    import spacy
+    nlp = spacy.load(name, exclude=NON_NER_COMPONENTS)
+    if "tok2vec" in nlp.pipe_names and not nlp.get_pipe("tok2vec").listening_components:
+        nlp.remove_pipe("tok2vec")
+    return nlp
+
+
+class EntityParser:
+    """Named entity extraction with a cache of recent commands.
+
+    Voice commands repeat a lot ("google the weather"), so results are kept in
+    an LRU keyed on the normalized command. pipe() runs batches through
+    nlp.pipe for re-processing stored history.
+    """
+
+    def __init__(self, nlp, cache_size=512):
+        self.nlp = nlp
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def entities(self, text):
+        key = " ".join(text.split())
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+            self.misses += 1
+        entities = [ent.text for ent in self.nlp(text).ents]
+        with self.lock:
+            self.cache[key] = entities
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return entities
+
+    def pipe(self, texts, batch_size=256, n_process=1):
+        """Yield the entities of each text, batched through nlp.pipe."""
+        for doc in self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+            yield [ent.text for ent in doc.ents]
+
+
+# Benchmark: full pipeline versus the NER-only pipeline (load time, memory, per-command latency)
+def benchmark(name="en_core_web_sm", history_file="conversation_history.jsonl"):
+    import tracemalloc
+    import spacy
+    from conversation_store import ConversationLog
+    commands = ["google flights to delhi on friday", "search for the weather in mumbai tomorrow",
+                "google barack obama", "search history pizza on monday", "what is my name"]
+    history = [entry["content"] for entry in ConversationLog(history_file).iter_entries()]
+
+    for label, loader in (("full pipeline", lambda: spacy.load(name)), ("ner only", lambda: load_ner_pipeline(name))):
+        tracemalloc.start()
+        start = time.perf_counter()
+        nlp = loader()
+        load_time = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        for _ in range(20):
+            for command in commands:
+                [ent.text for ent in nlp(command).ents]
+        per_command = (time.perf_counter() - start) / (20 * len(commands))
+        parser = EntityParser(nlp)
+        start = time.perf_counter()
+        for _ in range(20):
+            for command in commands:
+                parser.entities(command)
+        cached = (time.perf_counter() - start) / (20 * len(commands))
+        line = (f"{label:14s} load {load_time:5.2f}s | Python heap {memory / 1e6:6.1f} MB | {', '.join(nlp.pipe_names)}\n"
+                f"{'':14s} per command {per_command * 1000:6.2f} ms | with cache {cached * 1000:6.3f} ms")
+        if history:
+            start = time.perf_counter()
+            for text in history:
+                nlp(text)
+            one_by_one = time.perf_counter() - start
+            start = time.perf_counter()
+            list(parser.pipe(history))
+            batched = time.perf_counter() - start
+            line += f" | {len(history)} history turns: one by one {one_by_one:.2f}s, nlp.pipe {batched:.2f}s"
+        print(line)
+
+
+if __name__ == "__main__":
+    benchmark()
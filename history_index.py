@@ -0,0 +1,172 @@
+import bisect
+import json
+import os
+import re
+from datetime import date, timedelta
+
+# Default location of the persisted index, next to the conversation log
+history_index_file = "conversation_history.index.json"
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    """Split text into lowercase search words."""
+    return WORD_PATTERN.findall(text.lower())
+
+
+class HistoryIndex:
+    """Inverted word index plus by-date and by-weekday indexes over the history.
+
+    Entries are referenced by their position in the conversation list, so the
+    index is updated with add() as turns are appended and only persisted on
+    save(). On load, any turns newer than the saved index are indexed from the
+    conversation list, which keeps startup cheap without rewriting the index
+    after every turn. The index records the ConversationLog generation it was
+    built from and is rebuilt when sync() is given a different one, i.e. the
+    log has been compacted since.
+    """
+
+    def __init__(self, path=history_index_file):
+        self.path = path
+        self.words = {}
+        self.dates = {}
+        self.weekdays = {}
+        self.sorted_dates = []
+        self.entry_count = 0
+        self.generation = 0
+
+    def add(self, entry):
+        """Index the next entry of the conversation list."""
+        entry_id = self.entry_count
+        self.entry_count += 1
+        for word in set(tokenize(entry.get("content", ""))):
+            self.words.setdefault(word, []).append(entry_id)
+        day = entry.get("timestamp", "")[:10]
+        if not day:
+            return
+        if day not in self.dates:
+            bisect.insort(self.sorted_dates, day)
+            self.dates[day] = []
+        self.dates[day].append(entry_id)
+        try:
+            weekday = WEEKDAYS[date.fromisoformat(day).weekday()]
+        except ValueError:
+            return
+        self.weekdays.setdefault(weekday, []).append(entry_id)
+
+    def sync(self, entries, generation=0):
+        """Bring the index up to date with the conversation list, loaded from that log generation."""
+        if generation != self.generation or self.entry_count > len(entries):
+            self.clear()  # The log was compacted or trimmed, positions no longer line up
+            self.generation = generation
+        for entry in entries[self.entry_count:]:
+            self.add(entry)
+
+    def clear(self):
+        self.words, self.dates, self.weekdays = {}, {}, {}
+        self.sorted_dates = []
+        self.entry_count = 0
+
+    def load(self, entries, generation=0):
+        """Load the persisted index and index any turns it is missing."""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                self.words = data["words"]
+                self.dates = data["dates"]
+                self.weekdays = data["weekdays"]
+                self.sorted_dates = sorted(self.dates)
+                self.entry_count = data["entry_count"]
+                self.generation = data.get("generation", 0)
+            except Exception as e:
+                print(f"Error loading history index, rebuilding: {e}")
+                self.clear()
+        self.sync(entries, generation)
+
+    def save(self):
+        """Persist the index atomically."""
+        data = {"entry_count": self.entry_count, "generation": self.generation, "words": self.words,
+                "dates": self.dates, "weekdays": self.weekdays}
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def ids_for_dates(self, start, end):
+        """Entry ids whose date falls in [start, end] (ISO date strings)."""
+        low = bisect.bisect_left(self.sorted_dates, start)
+        high = bisect.bisect_right(self.sorted_dates, end)
+        ids = set()
+        for day in self.sorted_dates[low:high]:
+            ids.update(self.dates[day])
+        return ids
+
+    def search(self, entries, topic, day=None, today=None):
+        """Return entries mentioning every word of topic, optionally limited to a day or range."""
+        words = tokenize(topic)
+        if not words:
+            return []
+        candidates = None
+        for word in sorted(words, key=lambda w: len(self.words.get(w, ()))):
+            postings = self.words.get(word)
+            if not postings:
+                return []
+            candidates = set(postings) if candidates is None else candidates.intersection(postings)
+            if not candidates:
+                return []
+        if day:
+            selected = self.ids_for_day(day, today)
+            if selected is None:
+                return []
+            candidates &= selected
+        phrase = " ".join(words)
+        results = []
+        for entry_id in sorted(candidates):
+            entry = entries[entry_id]
+            if len(words) == 1 or phrase in " ".join(tokenize(entry["content"])):
+                results.append(entry)
+        return results
+
+    def ids_for_day(self, day, today=None):
+        """Resolve a spoken day or range to the matching entry ids, None if not understood."""
+        resolved = parse_day_range(day, today)
+        if resolved is None:
+            return None
+        if isinstance(resolved, str):
+            return set(self.weekdays.get(resolved, ()))
+        start, end = resolved
+        return self.ids_for_dates(start.isoformat(), end.isoformat())
+
+
+# Parse phrases like "monday", "yesterday", "2024-12-21", "last week" or "2024-12-01 to 2024-12-21"
+def parse_day_range(day, today=None):
+    """Return a weekday name, a (start, end) date tuple, or None."""
+    today = today or date.today()
+    day = day.lower().strip()
+    for separator in (" to ", " until ", " and "):
+        if separator in day:
+            first, last = day.split(separator, 1)
+            start, end = parse_day_range(first, today), parse_day_range(last, today)
+            if isinstance(start, tuple) and isinstance(end, tuple):
+                return start[0], end[1]
+            return None
+    if day in WEEKDAYS:
+        return day
+    if day == "today":
+        return today, today
+    if day == "yesterday":
+        yesterday = today - timedelta(days=1)
+        return yesterday, yesterday
+    if day == "this week":
+        return today - timedelta(days=today.weekday()), today
+    if day == "last week":
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=6)
+    try:
+        parsed = date.fromisoformat(day)
+        return parsed, parsed
+    except ValueError:
+        return None
@@ -0,0 +1,194 @@
+import re
+import time
+from collections import deque
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+class Intent:
+    """One row of an intent table.
+
+    phrases are the keywords (single or multi-word) that trigger the intent;
+    requires are phrases that must also be present. With entities=True the
+    router's entity extractor (e.g. spaCy) is run to fill the entities slot.
+    """
+
+    def __init__(self, name, phrases, requires=(), entities=False):
+        self.name = name
+        self.phrases = phrases
+        self.requires = requires
+        self.entities = entities
+
+
+class Match:
+    """The routed intent with its slots: query is the (lowercased) command minus the matched keywords.
+
+    The query is cut out of the command text rather than rebuilt from words,
+    so punctuation inside it survives ("2024-12-21", "don't", "3.5").
+    """
+
+    def __init__(self, intent, query, keywords, entities=None):
+        self.intent = intent
+        self.query = query
+        self.keywords = keywords
+        self.entities = entities or []
+
+    def __repr__(self):
+        return f"Match({self.intent!r}, query={self.query!r}, entities={self.entities!r})"
+
+
+class IntentRouter:
+    """Resolves a command against an intent table in a single pass over its words.
+
+    All phrases of the table are compiled into one Aho-Corasick automaton over
+    word tokens, so routing costs one scan of the command no matter how many
+    intents there are. The first intent in table order whose phrase (and
+    required phrases) matched wins, mirroring the old if/elif chains; when
+    nothing matches the fallback intent is returned with the whole command as
+    the query.
+    """
+
+    def __init__(self, intents, fallback="conversation", entity_extractor=None):
+        self.intents = intents
+        self.fallback = fallback
+        self.entity_extractor = entity_extractor
+        self.phrase_ids = {}
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.compiled = []
+        for intent in intents:
+            phrases = [(phrase, self.add_phrase(tuple(phrase.split()))) for phrase in intent.phrases]
+            requires = [self.add_phrase(tuple(phrase.split())) for phrase in intent.requires]
+            self.compiled.append((intent, phrases, requires))
+        self.build_failure_links()
+
+    def add_phrase(self, words):
+        if words in self.phrase_ids:
+            return self.phrase_ids[words]
+        phrase_id = len(self.phrase_ids)
+        self.phrase_ids[words] = phrase_id
+        state = 0
+        for word in words:
+            if word not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][word] = len(self.goto) - 1
+            state = self.goto[state][word]
+        self.output[state].append((phrase_id, len(words)))
+        return phrase_id
+
+    def build_failure_links(self):
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for word, child in self.goto[state].items():
+                pending.append(child)
+                if state:
+                    fallback = self.fail[state]
+                    while fallback and word not in self.goto[fallback]:
+                        fallback = self.fail[fallback]
+                    self.fail[child] = self.goto[fallback].get(word, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def scan(self, words):
+        """Return {phrase_id: [(start, end), ...]} for every phrase found in words."""
+        found = {}
+        state = 0
+        for position, word in enumerate(words):
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            for phrase_id, length in self.output[state]:
+                found.setdefault(phrase_id, []).append((position + 1 - length, position + 1))
+        return found
+
+    def route(self, command):
+        text = command.lower()
+        spans = [(token.start(), token.end()) for token in WORD_PATTERN.finditer(text)]
+        words = [text[start:end] for start, end in spans]
+        found = self.scan(words)
+        for intent, phrases, requires in self.compiled:
+            matched = [(phrase, phrase_id) for phrase, phrase_id in phrases if phrase_id in found]
+            if not matched or any(phrase_id not in found for phrase_id in requires):
+                continue
+            removed = set()
+            for phrase_id in [phrase_id for _, phrase_id in matched] + requires:
+                for start, end in found[phrase_id]:
+                    removed.update(range(start, end))
+            query = self.query(text, spans, removed)
+            entities = self.entity_extractor(command) if intent.entities and self.entity_extractor else []
+            return Match(intent.name, query, [phrase for phrase, _ in matched], entities)
+        return Match(self.fallback, self.query(text, spans, set()), [])
+
+    def query(self, text, spans, removed):
+        """The text of each run of words not in removed, sliced from text and joined with spaces."""
+        runs = []
+        run_start = None
+        for position, (start, end) in enumerate(spans):
+            if position in removed:
+                if run_start is not None:
+                    runs.append(text[run_start:spans[position - 1][1]])
+                    run_start = None
+            elif run_start is None:
+                run_start = start
+        if run_start is not None:
+            runs.append(text[run_start:spans[-1][1]])
+        return " ".join(runs)
+
+
+# Microbenchmark: the old substring if/elif chain versus the compiled router
+def benchmark(repeat=20000):
+    def legacy_route(command):
+        if "exit" in command or "quit" in command or "goodbye" in command:
+            return "exit", ""
+        elif "friday" in command:
+            return "wake", command.replace("friday", "").strip()
+        elif "minimize" in command or "minimise" in command:
+            return "minimize", ""
+        elif "google" in command:
+            return "google", command.replace("google", "").strip()
+        elif "help" in command:
+            return "help", ""
+        elif "unpause" in command or "resume" in command:
+            return "resume", ""
+        elif "pause" in command or "stop" in command:
+            return "pause", ""
+        return "conversation", command
+
+    router = IntentRouter([
+        Intent("exit", ["exit", "quit", "goodbye"]),
+        Intent("wake", ["friday"]),
+        Intent("minimize", ["minimize", "minimise"]),
+        Intent("google", ["google"]),
+        Intent("help", ["help", "what can you do"]),
+        Intent("resume", ["unpause", "resume"]),
+        Intent("pause", ["pause", "stop"]),
+    ])
+    corpus = [
+        "friday", "friday search history pizza on monday", "google weather in mumbai", "exit", "please minimise the window",
+        "what can you do", "pause", "resume", "tell me a joke about computers", "what is my name",
+        "how far away is the moon from the earth in kilometres", "friday open google maps", "stop talking",
+    ]
+    routes = [("if/elif substring chain", legacy_route), ("compiled intent router", router.route)]
+    try:
+        import spacy
+        nlp = spacy.load("en_core_web_sm")
+        routes.append(("spaCy on every command", lambda command: (nlp(command), legacy_route(command))))
+    except Exception as e:
+        print(f"Skipping the spaCy comparison: {e}")
+    for name, route in routes:
+        if name.startswith("spaCy"):
+            repeat = max(1, repeat // 100)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for command in corpus:
+                route(command)
+        elapsed = time.perf_counter() - start
+        count = repeat * len(corpus)
+        print(f"{name:24s} {count / elapsed:12,.0f} commands/s ({elapsed / count * 1e6:.2f} us per command)")
+
+
+if __name__ == "__main__":
+    benchmark()
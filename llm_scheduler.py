@@ -0,0 +1,411 @@
+import asyncio
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+# Request priorities, lower is served first
+PRIORITY_INTERACTIVE, PRIORITY_SUMMARY, PRIORITY_INDEXING = 0, 1, 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_SUMMARY: "summary", PRIORITY_INDEXING: "indexing"}
+
+
+class RequestCancelled(Exception):
+    """The request was cancelled (superseded or cancel(group)) before its result was used."""
+
+
+class LLMRequest:
+    """One queued or running LLM call, shared by every caller that asked for the same thing."""
+
+    def __init__(self, priority, group, key):
+        self.priority = priority
+        self.group = group
+        self.key = key
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+        self.released = False
+        self.cancelled = False
+        self.waiters = 1
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class LLMScheduler:
+    """Admits LLM requests by priority, at most max_concurrent at a time.
+
+    Interactive turns go ahead of summarization, which goes ahead of indexing,
+    so background work only uses the server when no reply is waiting (it is
+    not preempted once running). A request identical to one already queued or
+    running (same method and arguments, not streamed) waits for that one's
+    result instead of being sent again; a queued request is moved up to the
+    priority of its most urgent duplicate, so an interactive turn never waits
+    behind summaries for a summary's result. Requests can be tagged with a
+    group: cancel(group) drops the group's queued requests and stops its
+    running streams at the next chunk, and a client made with supersede=True
+    does that to its group's older requests whenever it sends a new one,
+    because a reply the user has moved on from is no longer worth generating.
+
+    Callers run the request on their own thread (or task, through the aio
+    client), so streams are consumed as they arrive; a slot is held until the
+    stream is exhausted, closed or dropped. load_client is called on first use
+    and must return a ManagedOllama (or anything with the same methods and aio).
+    """
+
+    def __init__(self, load_client, max_concurrent=1):
+        self.load_client = load_client
+        self.max_concurrent = max_concurrent
+        self.llm = None
+        self.condition = threading.Condition()
+        self.waiting = []  # Heap of (priority, order, request)
+        self.order = itertools.count()
+        self.running = 0
+        self.live = {}  # Coalescing key -> queued or running request
+        self.groups = {}  # Group -> set of unfinished requests
+        self.counts = {priority: {"submitted": 0, "coalesced": 0, "cancelled": 0} for priority in PRIORITY_NAMES}
+        self.wait_times = {priority: deque(maxlen=10000) for priority in PRIORITY_NAMES}
+
+    def client(self, priority=PRIORITY_INTERACTIVE, group=None, supersede=False):
+        """An ollama.chat-compatible client whose requests go through this scheduler."""
+        return ScheduledClient(self, priority, group, supersede)
+
+    def get_client(self):
+        if self.llm is None:
+            self.llm = self.load_client()
+        return self.llm
+
+    def key(self, method, kwargs):
+        if kwargs.get("stream"):
+            return None  # Every caller consumes its own stream
+        return json.dumps([method, kwargs], sort_keys=True, default=str)
+
+    def enqueue(self, method, kwargs, priority, group, supersede):
+        """Return (request, leader); only the leader sends it, the others wait for its result."""
+        key = self.key(method, kwargs)
+        with self.condition:
+            if supersede and group is not None:
+                self.cancel_locked(group)
+            request = self.live.get(key) if key is not None else None
+            if request is not None:
+                request.waiters += 1
+                if priority < request.priority and request.started_at is None:
+                    self.raise_priority_locked(request, priority)
+                self.counts[request.priority]["coalesced"] += 1
+                return request, False
+            request = LLMRequest(priority, group, key)
+            heapq.heappush(self.waiting, (priority, next(self.order), request))
+            if key is not None:
+                self.live[key] = request
+            if group is not None:
+                self.groups.setdefault(group, set()).add(request)
+            self.counts[priority]["submitted"] += 1
+            return request, True
+
+    def raise_priority_locked(self, request, priority):
+        """Move a queued request up to priority, e.g. an interactive turn asked for a queued summary's result."""
+        request.priority = priority
+        self.waiting = [(priority if entry is request else entry_priority, order, entry)
+                        for entry_priority, order, entry in self.waiting]
+        heapq.heapify(self.waiting)
+        self.condition.notify_all()
+
+    def admit(self, request):
+        """Block until request may run (raises RequestCancelled if it is cancelled first)."""
+        with self.condition:
+            while True:
+                while self.waiting and self.waiting[0][2].cancelled:
+                    heapq.heappop(self.waiting)
+                if request.cancelled:
+                    raise RequestCancelled()
+                if self.running < self.max_concurrent and self.waiting[0][2] is request:
+                    break
+                self.condition.wait()
+            heapq.heappop(self.waiting)
+            self.running += 1
+            request.started_at = time.perf_counter()
+            self.wait_times[request.priority].append(request.started_at - request.queued_at)
+
+    def release(self, request, result=None, error=None):
+        """Give back the request's slot and hand its result to everyone waiting on it."""
+        with self.condition:
+            if request.started_at is not None and not request.released:
+                request.released = True
+                self.running -= 1
+            self.finish_locked(request, result, error)
+            self.condition.notify_all()
+
+    def abandon(self, request):
+        """The caller went away: cancel the request if it is still queued, free its slot if it was admitted."""
+        with self.condition:
+            if request.started_at is None:
+                request.cancelled = True
+                self.finish_locked(request, error=RequestCancelled())
+                self.condition.notify_all()
+        if request.started_at is not None:
+            self.release(request, error=RequestCancelled())
+
+    def finish_locked(self, request, result=None, error=None):
+        if request.done.is_set():
+            return
+        request.result = result
+        request.error = error
+        if self.live.get(request.key) is request:
+            del self.live[request.key]
+        if request.group is not None:
+            self.groups.get(request.group, set()).discard(request)
+        request.done.set()
+
+    def cancel(self, group):
+        """Cancel every unfinished request of group; returns how many were cancelled."""
+        with self.condition:
+            return self.cancel_locked(group)
+
+    def cancel_locked(self, group):
+        requests = self.groups.pop(group, set())
+        for request in requests:
+            request.cancelled = True
+            self.counts[request.priority]["cancelled"] += 1
+            self.finish_locked(request, error=RequestCancelled())
+        if requests:
+            self.condition.notify_all()
+        return len(requests)
+
+    def call(self, method, kwargs, priority=PRIORITY_INTERACTIVE, group=None, supersede=False):
+        request, leader = self.enqueue(method, kwargs, priority, group, supersede)
+        if not leader:
+            request.done.wait()
+            return request.outcome()
+        self.admit(request)
+        try:
+            result = getattr(self.get_client(), method)(**kwargs)
+        except BaseException as e:
+            self.release(request, error=e if isinstance(e, Exception) else RequestCancelled())
+            raise
+        if kwargs.get("stream"):
+            return ScheduledStream(self, request, result)
+        self.release(request, result)
+        return request.outcome()
+
+    def stream(self, request, chunks):
+        try:
+            for chunk in chunks:
+                if request.cancelled:
+                    raise RequestCancelled()
+                yield chunk
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self.release(request)
+
+    async def call_async(self, method, kwargs, priority=PRIORITY_INTERACTIVE, group=None, supersede=False):
+        request, leader = self.enqueue(method, kwargs, priority, group, supersede)
+        if not leader:
+            await asyncio.to_thread(request.done.wait)
+            return request.outcome()
+        try:
+            await asyncio.to_thread(self.admit, request)
+        except asyncio.CancelledError:
+            self.abandon(request)
+            raise
+        try:
+            result = await getattr(self.get_client().aio, method)(**kwargs)
+        except BaseException as e:
+            self.release(request, error=e if isinstance(e, Exception) else RequestCancelled())
+            raise
+        if kwargs.get("stream"):
+            return ScheduledAsyncStream(self, request, result)
+        self.release(request, result)
+        return request.outcome()
+
+    async def stream_async(self, request, chunks):
+        try:
+            async for chunk in chunks:
+                if request.cancelled:
+                    raise RequestCancelled()
+                yield chunk
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+            self.release(request)
+
+    def report(self):
+        """Requests, coalesced duplicates, cancellations and queue wait per priority."""
+        lines = []
+        for priority, name in PRIORITY_NAMES.items():
+            counts = self.counts[priority]
+            waits = sorted(self.wait_times[priority])
+            if not counts["submitted"] and not counts["coalesced"]:
+                continue
+            p50 = waits[len(waits) // 2] if waits else 0.0
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+            lines.append(f"{name:12s} {counts['submitted']:5d} sent, {counts['coalesced']:4d} coalesced, "
+                         f"{counts['cancelled']:4d} cancelled | queued p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms")
+        return "\n".join(lines) or "No LLM requests."
+
+
+class ScheduledStream:
+    """A streamed reply that holds its scheduler slot until it is exhausted, closed or dropped.
+
+    The slot cannot be left to the generator's finally alone: that never runs
+    if the caller drops the stream before asking for the first chunk.
+    """
+
+    def __init__(self, scheduler, request, chunks):
+        self.scheduler = scheduler
+        self.request = request
+        self.chunks = chunks
+        self.iterator = scheduler.stream(request, chunks)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.iterator)
+
+    def close(self):
+        self.iterator.close()
+        if hasattr(self.chunks, "close"):
+            self.chunks.close()
+        self.scheduler.release(self.request)
+
+    def __del__(self):
+        self.close()
+
+
+class ScheduledAsyncStream:
+    """ScheduledStream for the aio client's async streams."""
+
+    def __init__(self, scheduler, request, chunks):
+        self.scheduler = scheduler
+        self.request = request
+        self.chunks = chunks
+        self.iterator = scheduler.stream_async(request, chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.iterator.__anext__()
+
+    async def aclose(self):
+        await self.iterator.aclose()
+        if hasattr(self.chunks, "aclose"):
+            await self.chunks.aclose()
+        self.scheduler.release(self.request)
+
+    def __del__(self):
+        self.scheduler.release(self.request)  # aclose() cannot be awaited here, but the slot can be freed
+
+
+class ScheduledClient:
+    """Takes ollama.chat's arguments like ManagedOllama, but sends through an LLMScheduler at a fixed priority."""
+
+    def __init__(self, scheduler, priority, group, supersede):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.group = group
+        self.supersede = supersede
+        self.aio = ScheduledAsyncClient(self)
+
+    def request(self, method, kwargs):
+        return self.scheduler.call(method, kwargs, self.priority, self.group, self.supersede)
+
+    def chat(self, model=None, messages=None, **kwargs):
+        return self.request("chat", dict(kwargs, model=model, messages=messages))
+
+    def embed(self, model=None, input=None, **kwargs):
+        return self.request("embed", dict(kwargs, model=model, input=input))
+
+
+class ScheduledAsyncClient:
+    """ScheduledClient's asyncio side, for AssistantCore (uses the ManagedOllama's aio client)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def chat(self, model=None, messages=None, **kwargs):
+        client = self.client
+        return await client.scheduler.call_async("chat", dict(kwargs, model=model, messages=messages),
+                                                 client.priority, client.group, client.supersede)
+
+
+# Benchmark: interactive latency while summarization and indexing keep a one-slot stub server busy
+def benchmark(turns=40, turn_interval=0.25, reply_seconds=0.1, background_threads=4):
+    from ollama_client import ManagedOllama, start_stub_server
+
+    def percentile(values, fraction):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    for mode in ("direct", "scheduled"):
+        server, host = start_stub_server(load_seconds=0.0, reply_seconds=reply_seconds, parallel=1)
+        llm = ManagedOllama(host=host)
+        scheduler = LLMScheduler(lambda: llm, max_concurrent=1)
+        running = threading.Event()
+        running.set()
+        background_done = [0]
+
+        def background(index):
+            # Half the threads summarize the same turns (duplicates), the rest index different ones
+            priority = PRIORITY_SUMMARY if index % 2 == 0 else PRIORITY_INDEXING
+            client = llm if mode == "direct" else scheduler.client(priority)
+            count = 0
+            while running.is_set():
+                prompt = "Summarize the conversation." if priority == PRIORITY_SUMMARY else f"Index turn {index}-{count}."
+                client.chat(messages=[{"role": "user", "content": prompt}])
+                background_done[0] += 1
+                count += 1
+        threads = [threading.Thread(target=background, args=(index,), daemon=True) for index in range(background_threads)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        interactive = llm if mode == "direct" else scheduler.client(PRIORITY_INTERACTIVE, group="turn", supersede=True)
+        latencies = []
+        for turn in range(turns):
+            start = time.perf_counter()
+            interactive.chat(messages=[{"role": "user", "content": f"Question {turn}?"}])
+            latencies.append(time.perf_counter() - start)
+            time.sleep(turn_interval)
+        running.clear()
+        for thread in threads:
+            thread.join()
+        server.shutdown()
+        print(f"{mode:9s} interactive p50 {percentile(latencies, 0.5) * 1000:6.0f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:6.0f} ms | background requests done {background_done[0]}")
+        if mode == "scheduled":
+            print(scheduler.report())
+
+    # Stale requests: the user asks again before the first reply was admitted
+    server, host = start_stub_server(load_seconds=0.0, reply_seconds=reply_seconds, parallel=1)
+    llm = ManagedOllama(host=host)
+    scheduler = LLMScheduler(lambda: llm, max_concurrent=1)
+    busy = threading.Thread(target=scheduler.client(PRIORITY_SUMMARY).chat,
+                            kwargs={"messages": [{"role": "user", "content": "Summarize."}]})
+    busy.start()
+    time.sleep(0.02)
+    turn = scheduler.client(PRIORITY_INTERACTIVE, group="turn", supersede=True)
+    outcomes = []
+
+    def ask(question):
+        try:
+            outcomes.append((question, turn.chat(messages=[{"role": "user", "content": question}]).message.content))
+        except RequestCancelled:
+            outcomes.append((question, "cancelled"))
+    first = threading.Thread(target=ask, args=("What's the weather?",))
+    first.start()
+    time.sleep(0.02)
+    ask("Actually, what time is it?")
+    first.join()
+    busy.join()
+    server.shutdown()
+    print(f"Superseded turn: {outcomes}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,91 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ModelRegistry:
+    """Loads heavy models concurrently in background threads.
+
+    Each model is registered with a loader function and exposed as a future, so
+    a script can start its microphone loop right away and only block (with
+    get()) at the point where it actually needs the model. Load times are kept
+    in load_times for the startup benchmark.
+    """
+
+    def __init__(self, max_workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-loader")
+        self.futures = {}
+        self.load_times = {}
+
+    def register(self, name, loader, *args, **kwargs):
+        def timed_load():
+            start = time.perf_counter()
+            try:
+                return loader(*args, **kwargs)
+            finally:
+                self.load_times[name] = time.perf_counter() - start
+        self.futures[name] = self.executor.submit(timed_load)
+        return self.futures[name]
+
+    def future(self, name):
+        return self.futures[name]
+
+    def ready(self, name):
+        return self.futures[name].done()
+
+    def get(self, name, timeout=None):
+        """Wait for a model to finish loading and return it (re-raises loader errors)."""
+        return self.futures[name].result(timeout)
+
+
+# Loaders (imports are done here so importing the library itself also happens in the background)
+def load_vosk(model_path):
+    import vosk
+    return vosk.Model(model_path)
+
+
+def load_spacy(name="en_core_web_sm", **kwargs):
+    import spacy
+    return spacy.load(name, **kwargs)
+
+
+# Not for the registry: on Windows the SAPI5 engine is a COM object bound to the thread that created it,
+# so load it on the thread that drives it (TTSWorker does this) instead of on a model-loader thread
+def load_tts(voice_index=0, rate=210, list_voices=False):
+    import pyttsx3
+    engine = pyttsx3.init()
+    voices = engine.getProperty("voices")
+    if list_voices:
+        for index, voice in enumerate(voices):
+            print(f"Voice {index}: {voice.name}")
+    engine.setProperty("voice", voices[voice_index].id)
+    engine.setProperty("rate", rate)
+    return engine
+
+
+# Benchmark: sequential versus concurrent startup
+def benchmark(vosk_model_path):
+    loaders = [("vosk", load_vosk, (vosk_model_path,)), ("spacy", load_spacy, ())]
+
+    # Concurrent runs first, so it pays for the cold imports and disk reads
+    registry = ModelRegistry()
+    start = time.perf_counter()
+    for name, loader, args in loaders:
+        registry.register(name, loader, *args)
+    listening_after = time.perf_counter() - start
+    for name, _, _ in loaders:
+        registry.get(name)
+    concurrent = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name, loader, args in loaders:
+        loader(*args)
+    sequential = time.perf_counter() - start
+    print(f"Sequential load: {sequential:.2f}s | concurrent load: {concurrent:.2f}s | "
+          f"microphone loop can start after {listening_after * 1000:.1f} ms")
+    for name, seconds in registry.load_times.items():
+        print(f"  {name:6s} {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "vosk-model-en-in-0.5")
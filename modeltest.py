@@ -3,45 +3,64 @@ import json
 import queue
 import sounddevice as sd
 import os
+from audio_buffer import AudioBlockQueue
+from vad import VoiceActivityGate, accept_gated
+from model_registry import ModelRegistry, load_vosk
 
-# Ensure the Vosk model path is valid
-model_path = "D:\\AI dev\\vosk-model-en-in-0.5"
+# Ensure the Vosk model path is valid (VOSK_MODEL_PATH overrides it, e.g. for replay_harness.py)
+model_path = os.environ.get("VOSK_MODEL_PATH", "D:\\AI dev\\vosk-model-en-in-0.5")
 if not os.path.exists(model_path):
     raise FileNotFoundError(f"Model not found at {model_path}")
 
-# Load the Vosk model
-model = vosk.Model(model_path)
-recognizer_queue = queue.Queue()
+# Load the Vosk model in the background
+models = ModelRegistry()
+models.register("vosk", load_vosk, model_path)
+# Bounded to ~2 s of audio; if recognition falls behind, the oldest blocks are dropped
+recognizer_queue = AudioBlockQueue(max_blocks=64, block_size=512, policy="drop_oldest")
 
 # Audio callback function
 def vosk_callback(indata, frames, time, status):
     if status:
         print(f"Stream status warning: {status}")
     try:
-        # Convert numpy.ndarray to bytes and put into the queue
-        recognizer_queue.put(indata.tobytes())
+        # Copy the samples into the queue's preallocated blocks
+        recognizer_queue.put(indata[:, 0])
     except Exception as e:
         print(f"Error in callback: {e}")
 
+# Recognizer and VAD gate for the listening loop (waits for the model to finish loading)
+def create_recognizer():
+    gate = VoiceActivityGate(16000)  # Skip decoding while nobody is speaking
+    rec = vosk.KaldiRecognizer(models.get("vosk"), 16000)
+    return rec, gate
+
+# Decode one block of audio from the queue and return the commands it completed
+def handle_audio(rec, gate, data):
+    commands = []
+    results = accept_gated(rec, gate, data)
+    for raw_result in results:  # Process complete speech
+        result = json.loads(raw_result)
+        command = result.get("text", "").strip()
+        if command:
+            print(f"Recognized: {command}")
+            commands.append(command)
+        else:
+            print("No command recognized.")
+    if not results and gate.in_speech:
+        print(f"Partial recognition: {rec.PartialResult()}")
+    return commands
+
 # Function to listen for commands
 def listen_for_commands():
-    rec = vosk.KaldiRecognizer(model, 16000)  # Initialize the recognizer
     try:
-        with sd.InputStream(samplerate=16000, channels=1, dtype="int16", callback=vosk_callback):
+        with sd.InputStream(samplerate=16000, channels=1, dtype="int16", blocksize=512, callback=vosk_callback):
+            rec, gate = create_recognizer()  # Audio queues up while the model loads
             print("Listening for commands...")
             while True:
                 try:
                     # Get data from the queue
                     data = recognizer_queue.get(timeout=1)
-                    if rec.AcceptWaveform(data):  # Process complete speech
-                        result = json.loads(rec.Result())
-                        command = result.get("text", "").strip()
-                        if command:
-                            print(f"Recognized: {command}")
-                        else:
-                            print("No command recognized.")
-                    else:
-                        print(f"Partial recognition: {rec.PartialResult()}")
+                    handle_audio(rec, gate, data)
                 except queue.Empty:
                     pass  # Continue waiting for data
     except Exception as e:
@@ -0,0 +1,221 @@
+import contextlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import ollama
+
+
+class ManagedOllama:
+    """One Ollama client for the whole assistant that keeps the model loaded on the server.
+
+    Every request goes through the same Client (one persistent HTTP connection
+    pool) and carries keep_alive, so the server keeps the model in memory
+    between turns instead of unloading it after its default five minutes.
+    warm_up() loads the model before the first question, and while the
+    assistant is in use a background ping renews keep_alive, so the first
+    reply after a long pause does not pay the load time either. The ping stops
+    once nothing has been asked for idle_timeout seconds.
+
+    chat() takes the same arguments as ollama.chat, so the object can be passed
+    wherever the ollama module was used; aio offers the same for asyncio code.
+    """
+
+    def __init__(self, model="llama3.2:3b", host=None, keep_alive="30m", ping_interval=240.0, idle_timeout=3600.0):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.client = ollama.Client(host=host)
+        self.aio = AsyncChat(self, ollama.AsyncClient(host=host))
+        self.last_used = time.time()
+        self.warm_up_seconds = None
+        self.pings = 0
+        self.stopping = threading.Event()
+        self.ping_thread = None
+
+    def touch(self):
+        self.last_used = time.time()
+
+    def chat(self, model=None, messages=None, **kwargs):
+        self.touch()
+        kwargs.setdefault("keep_alive", self.keep_alive)
+        return self.client.chat(model=model or self.model, messages=messages, **kwargs)
+
+    def embed(self, model=None, input=None, **kwargs):
+        return self.client.embed(model=model or self.model, input=input, **kwargs)
+
+    def warm_up(self):
+        """Load the model on the server (an empty generate request) and return how long it took."""
+        start = time.perf_counter()
+        self.client.generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+        self.warm_up_seconds = time.perf_counter() - start
+        return self.warm_up_seconds
+
+    def start_keep_warm(self):
+        if self.ping_thread is None:
+            self.ping_thread = threading.Thread(target=self.keep_warm, daemon=True)
+            self.ping_thread.start()
+
+    def keep_warm(self):
+        while not self.stopping.wait(self.ping_interval):
+            if time.time() - self.last_used > self.idle_timeout:
+                continue  # Assistant idle: let the server unload the model
+            try:
+                self.client.generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+                self.pings += 1
+            except Exception as e:
+                print(f"Ollama keep-warm ping failed: {e}")
+
+    def stop(self):
+        self.stopping.set()
+
+
+class AsyncChat:
+    """ManagedOllama's asyncio side: chat() is a coroutine taking ollama.AsyncClient.chat's arguments."""
+
+    def __init__(self, managed, client):
+        self.managed = managed
+        self.client = client
+
+    async def chat(self, model=None, messages=None, **kwargs):
+        self.managed.touch()
+        kwargs.setdefault("keep_alive", self.managed.keep_alive)
+        return await self.client.chat(model=model or self.managed.model, messages=messages, **kwargs)
+
+
+def load_ollama(model="llama3.2:3b", **kwargs):
+    """ModelRegistry loader: create the client, load the model on the server and start the keep-warm ping."""
+    llm = ManagedOllama(model, **kwargs)
+    try:
+        llm.warm_up()
+    except Exception as e:
+        print(f"Could not warm up {model}: {e}")  # Ollama may start later; the first reply then loads it
+    llm.start_keep_warm()
+    return llm
+
+
+# Stub Ollama server: unloads the model after keep_alive and pays load_seconds to load it again
+def parse_keep_alive(value, default=300.0):
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value) if value >= 0 else float("inf")
+    match = re.fullmatch(r"(-?[\d.]+)(ms|s|m|h)?", value.strip())
+    if not match:
+        return default
+    number = float(match.group(1))
+    if number < 0:
+        return float("inf")
+    return number * {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}[match.group(2)]
+
+
+def start_stub_server(load_seconds=1.5, reply_seconds=0.05, reply="Hello there.", parallel=None):
+    """Serve /api/chat and /api/generate on a free localhost port; returns (server, host).
+
+    With parallel set, at most that many replies are generated at once (like OLLAMA_NUM_PARALLEL).
+    """
+    state = {"loaded_until": 0.0, "loads": 0}
+    lock = threading.Lock()
+    slots = threading.Semaphore(parallel) if parallel else contextlib.nullcontext()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with lock:  # One model instance: requests queue behind a load
+                if time.monotonic() > state["loaded_until"]:
+                    time.sleep(load_seconds)
+                    state["loads"] += 1
+                state["loaded_until"] = time.monotonic() + parse_keep_alive(request.get("keep_alive"))
+            created = datetime.now(timezone.utc).isoformat()
+            prompt = request.get("prompt", "x")
+            if self.path == "/api/generate":
+                body = {"model": request.get("model"), "created_at": created, "response": "", "done": True}
+                if prompt:
+                    with slots:
+                        time.sleep(reply_seconds)
+                    body["response"] = reply
+            else:
+                with slots:
+                    time.sleep(reply_seconds)
+                body = {"model": request.get("model"), "created_at": created, "done": True,
+                        "message": {"role": "assistant", "content": reply}}
+            if request.get("stream", True):
+                payload = (json.dumps(body) + "\n").encode("utf-8")
+                content_type = "application/x-ndjson"
+            else:
+                payload = json.dumps(body).encode("utf-8")
+                content_type = "application/json"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# Benchmark: first-response latency cold versus warm, against the stub server
+def benchmark(load_seconds=1.5, keep_alive="2s", idle_seconds=3.0):
+    messages = [{"role": "user", "content": "hello"}]
+
+    def first_reply(llm):
+        start = time.perf_counter()
+        llm.chat(messages=messages)
+        return time.perf_counter() - start
+
+    server, host = start_stub_server(load_seconds)
+    cold = first_reply(ManagedOllama(host=host, keep_alive=keep_alive))
+    server.shutdown()
+
+    server, host = start_stub_server(load_seconds)
+    llm = ManagedOllama(host=host, keep_alive=keep_alive)
+    warm_up = llm.warm_up()  # At startup, while the microphone and other models come up
+    warm = first_reply(llm)
+    time.sleep(idle_seconds)  # Longer than keep_alive, no ping
+    after_idle = first_reply(llm)
+    server.shutdown()
+
+    server, host = start_stub_server(load_seconds)
+    llm = ManagedOllama(host=host, keep_alive=keep_alive, ping_interval=parse_keep_alive(keep_alive) / 2)
+    llm.warm_up()
+    llm.start_keep_warm()
+    time.sleep(idle_seconds)
+    after_idle_pinged = first_reply(llm)
+    llm.stop()
+    server.shutdown()
+
+    server, host = start_stub_server(load_seconds)
+    llm = ManagedOllama(host=host)
+    llm.warm_up()
+    start = time.perf_counter()
+    for _ in range(20):
+        ollama.Client(host=host).chat(model=llm.model, messages=messages)
+    new_client = (time.perf_counter() - start) / 20
+    start = time.perf_counter()
+    for _ in range(20):
+        llm.chat(messages=messages)
+    shared_client = (time.perf_counter() - start) / 20
+    server.shutdown()
+
+    print(f"Stub server: {load_seconds:.1f}s model load, keep_alive {keep_alive}")
+    print(f"First reply, cold start:                  {cold * 1000:7.0f} ms")
+    print(f"First reply after warm-up:                {warm * 1000:7.0f} ms (warm-up took {warm_up * 1000:.0f} ms at startup)")
+    print(f"After {idle_seconds:.0f}s idle, no keep-warm ping:     {after_idle * 1000:7.0f} ms")
+    print(f"After {idle_seconds:.0f}s idle, with keep-warm ping:   {after_idle_pinged * 1000:7.0f} ms")
+    print(f"Warm reply, new Client per request:       {new_client * 1000:7.1f} ms | shared client {shared_client * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,420 @@
+"""Noise reduction and Vosk decoding in worker processes, off the main interpreter's GIL.
+
+The audio callback writes into a ring buffer in shared memory; a DSP process
+runs the NoiseReductionWorker on it and writes cleaned audio into a second
+shared ring buffer; an ASR process decodes that and sends back only the
+recognized text (and speech-start events for barge-in) as JSON lines on its
+stdout, and is told on its stdin when the assistant starts and stops
+talking. No audio is pickled or copied through pipes. InProcessPipeline runs
+the same stages on threads, and create_pipeline() switches between the two.
+
+Workers are started as plain subprocesses of this file rather than with
+multiprocessing.Process, so the calling script is not re-imported in each
+worker on Windows (spawn start method), where it would start its own TTS
+engine and model loads.
+
+    python process_pipeline.py --model vosk-model-small-en-us-0.15 --make-fixtures fixtures
+"""
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from audio_buffer import AudioBlockQueue, AudioRingBuffer, new_callback_stats, ring_buffer_callback
+from noise_reduction import NoiseReductionWorker
+from vad import VoiceActivityGate, accept_gated
+
+SAMPLE_RATE = 16000
+BLOCKSIZE = 512
+
+
+def attach_shared_memory(name):
+    """Open an existing segment without registering it with this process's resource tracker,
+    which would otherwise unlink it when the worker exits."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    memory = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+
+class SharedRingBuffer(AudioRingBuffer):
+    """AudioRingBuffer whose samples and indices live in multiprocessing.shared_memory.
+
+    The creating process passes no name; the other side attaches with the
+    creator's name. As with AudioRingBuffer, each side only moves its own
+    index (aligned 64-bit stores), so no lock is needed between the one
+    producer and the one consumer. The consumer also publishes processed, the
+    read index up to which it has finished with the samples, so the producer
+    can tell when the pipeline has drained.
+    """
+
+    HEADER_SLOTS = 4  # write_index, read_index, processed, reserved
+
+    def __init__(self, capacity=SAMPLE_RATE * 4, name=None):
+        header_bytes = self.HEADER_SLOTS * 8
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=header_bytes + capacity * 2)
+            self.owner = True
+        else:
+            self.memory = attach_shared_memory(name)
+            self.owner = False
+        self.capacity = capacity
+        self.header = np.ndarray(self.HEADER_SLOTS, dtype=np.int64, buffer=self.memory.buf)
+        self.buffer = np.ndarray(capacity, dtype=np.int16, buffer=self.memory.buf, offset=header_bytes)
+        if self.owner:
+            self.header[:] = 0
+        self.overflows = 0
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    @property
+    def write_index(self):
+        return int(self.header[0])
+
+    @write_index.setter
+    def write_index(self, value):
+        self.header[0] = value
+
+    @property
+    def read_index(self):
+        return int(self.header[1])
+
+    @read_index.setter
+    def read_index(self, value):
+        self.header[1] = value
+
+    @property
+    def processed(self):
+        return int(self.header[2])
+
+    @processed.setter
+    def processed(self, value):
+        self.header[2] = value
+
+    def drained(self, leftover=0):
+        """True when fewer than leftover + 1 samples wait and everything read has been processed."""
+        return self.available() <= leftover and self.processed == self.read_index
+
+    def close(self):
+        self.header = self.buffer = None  # Views must be released before the segment is closed
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def make_recognizer(model, kind="wake_word", on_speech_start=None, is_speaking=None):
+    """Return accept(data) -> [texts]: "wake_word" as in "ai trial.py", "vad" (gated KaldiRecognizer) as in modeltest.py."""
+    gate = VoiceActivityGate(SAMPLE_RATE, on_speech_start=on_speech_start, is_speaking=is_speaking)
+    if kind == "wake_word":
+        from wake_word import WakeWordListener
+        return WakeWordListener(model, gate=gate).accept
+    import vosk
+    rec = vosk.KaldiRecognizer(model, SAMPLE_RATE)
+
+    def accept(data):
+        texts = [json.loads(result).get("text", "") for result in accept_gated(rec, gate, data)]
+        return [text for text in texts if text]
+    return accept
+
+
+class InProcessPipeline:
+    """callback -> ring buffer -> noise reduction thread -> block queue -> ASR thread, all in this interpreter."""
+
+    name = "threads"
+
+    def __init__(self, model_path, recognizer="wake_word", capacity=SAMPLE_RATE * 4, on_speech_start=None, model=None,
+                 is_speaking=None):
+        self.model_path = model_path
+        self.model = model
+        self.recognizer = recognizer
+        self.on_speech_start = on_speech_start
+        self.is_speaking = is_speaking
+        self.ring = AudioRingBuffer(capacity)
+        self.blocks = AudioBlockQueue(max_blocks=capacity // BLOCKSIZE, block_size=BLOCKSIZE)
+        self.noise_worker = NoiseReductionWorker(self.ring, output=self.blocks.put)
+        self.callback_stats = new_callback_stats()
+        self.callback = ring_buffer_callback(self.ring, self.callback_stats)
+        self.results = queue.Queue()
+        self.running = False
+        self.thread = None
+        self.asr_time = 0.0
+        self.blocks_decoded = 0
+
+    def start(self):
+        if self.model is None:
+            import vosk
+            self.model = vosk.Model(self.model_path)
+        self.accept = make_recognizer(self.model, self.recognizer, self.on_speech_start, self.is_speaking)
+        self.running = True
+        self.noise_worker.start()
+        self.thread = threading.Thread(target=self.run_asr, daemon=True)
+        self.thread.start()
+
+    def run_asr(self):
+        while self.running:
+            try:
+                data = self.blocks.get(timeout=0.02)
+            except queue.Empty:
+                continue
+            start = time.thread_time()
+            for text in self.accept(data):
+                self.results.put(text)
+            self.asr_time += time.thread_time() - start
+            self.blocks_decoded += 1
+
+    def get(self, timeout=None):
+        """Next recognized command (raises queue.Empty on timeout)."""
+        return self.results.get(timeout=timeout)
+
+    def has_room(self, count):
+        """Room for count more samples without anything downstream overflowing."""
+        waiting = self.ring.available() + self.blocks.qsize() * BLOCKSIZE + BLOCKSIZE  # Plus the hop being filtered
+        return waiting + count <= self.blocks.max_blocks * BLOCKSIZE
+
+    def idle(self):
+        decoded_all = self.blocks_decoded == self.blocks.blocks_in - self.blocks.dropped_oldest - self.blocks.dropped_newest
+        return self.ring.available() < self.noise_worker.hop and decoded_all
+
+    def stop(self):
+        self.noise_worker.stop()
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def stage_times(self):
+        return {"callback": self.callback_stats["total_time"], "noise_reduction": self.noise_worker.processing_time,
+                "asr": self.asr_time}
+
+
+class MultiProcessPipeline:
+    """callback -> shared ring -> DSP process -> shared ring -> ASR process; only text comes back."""
+
+    name = "processes"
+
+    def __init__(self, model_path, recognizer="wake_word", capacity=SAMPLE_RATE * 4, on_speech_start=None,
+                 is_speaking=None):
+        self.model_path = model_path
+        self.recognizer = recognizer
+        self.capacity = capacity
+        self.on_speech_start = on_speech_start
+        self.is_speaking = is_speaking
+        self.speaking = False
+        self.input_ring = SharedRingBuffer(capacity)
+        self.clean_ring = SharedRingBuffer(capacity)
+        self.callback_stats = new_callback_stats()
+        self.write_callback = ring_buffer_callback(self.input_ring, self.callback_stats)
+        self.results = queue.Queue()
+        self.ready = {"dsp": threading.Event(), "asr": threading.Event()}
+        self.worker_stats = {}
+        self.processes = {}
+        self.readers = []
+
+    def callback(self, indata, frames, time_info, status):
+        self.write_callback(indata, frames, time_info, status)
+        if self.is_speaking is not None and self.is_speaking() != self.speaking:
+            self.speaking = not self.speaking
+            self.send_speaking()
+
+    def send_speaking(self):
+        """Tell the ASR worker whether the assistant is talking, so its gate ignores the echo."""
+        process = self.processes.get("asr")
+        try:
+            if process is not None and not process.stdin.closed:
+                process.stdin.write("speaking\n" if self.speaking else "quiet\n")
+                process.stdin.flush()
+        except (OSError, ValueError):
+            pass  # The worker is stopping
+
+    def spawn(self, stage, *args):
+        process = subprocess.Popen([sys.executable, "-u", os.path.abspath(__file__), "worker", stage, *map(str, args)],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        self.processes[stage] = process
+        reader = threading.Thread(target=self.read_events, args=(stage, process), daemon=True)
+        reader.start()
+        self.readers.append(reader)
+
+    def read_events(self, stage, process):
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                print(line, end="")
+                continue
+            if "text" in message:
+                self.results.put(message["text"])
+            elif message.get("event") == "speech_start" and self.on_speech_start is not None:
+                self.on_speech_start()
+            elif "ready" in message:
+                self.ready[stage].set()
+            elif "stats" in message:
+                self.worker_stats[stage] = message["stats"]
+
+    def start(self, timeout=120.0):
+        self.spawn("dsp", self.input_ring.name, self.clean_ring.name, self.capacity)
+        self.spawn("asr", self.clean_ring.name, self.capacity, self.model_path, self.recognizer)
+        deadline = time.monotonic() + timeout
+        for stage, ready in self.ready.items():
+            while not ready.wait(0.1):
+                if self.processes[stage].poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"The {stage} worker process failed to start")
+
+    def get(self, timeout=None):
+        """Next recognized command (raises queue.Empty on timeout)."""
+        return self.results.get(timeout=timeout)
+
+    def has_room(self, count):
+        waiting = self.input_ring.available() + self.clean_ring.available() + BLOCKSIZE  # Plus the hop being filtered
+        return waiting + count <= self.capacity
+
+    def idle(self):
+        return self.input_ring.drained(leftover=BLOCKSIZE - 1) and self.clean_ring.drained(leftover=BLOCKSIZE - 1)
+
+    def stop(self):
+        for process in self.processes.values():
+            if process.stdin and not process.stdin.closed:
+                process.stdin.close()  # Workers stop at end of input
+        for process in self.processes.values():
+            process.wait()
+        for reader in self.readers:
+            reader.join()
+        self.input_ring.close()
+        self.clean_ring.close()
+
+    def stage_times(self):
+        return {"callback": self.callback_stats["total_time"],
+                "noise_reduction": self.worker_stats.get("dsp", {}).get("busy", 0.0),
+                "asr": self.worker_stats.get("asr", {}).get("busy", 0.0)}
+
+
+def create_pipeline(mode, model_path, recognizer="wake_word", on_speech_start=None, is_speaking=None):
+    """mode is "threads" (everything in this interpreter) or "processes" (DSP and ASR in worker processes)."""
+    if mode == "processes":
+        return MultiProcessPipeline(model_path, recognizer, on_speech_start=on_speech_start, is_speaking=is_speaking)
+    return InProcessPipeline(model_path, recognizer, on_speech_start=on_speech_start, is_speaking=is_speaking)
+
+
+# Worker processes: report to the parent as JSON lines, stop when the parent closes stdin
+def emit(**message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def run_dsp_worker(input_name, output_name, capacity):
+    source = SharedRingBuffer(capacity, input_name)
+    sink = SharedRingBuffer(capacity, output_name)
+
+    def output(samples):
+        sink.write(samples)
+        source.processed = source.read_index
+    worker = NoiseReductionWorker(source, output=output)
+    worker.start()
+    emit(ready=0.0)
+    sys.stdin.read()
+    worker.stop()
+    emit(stats={"busy": worker.processing_time, "hops": worker.hops_processed, "cpu": time.process_time(),
+                "overflows": sink.overflows})
+    source.close()
+    sink.close()
+
+
+def run_asr_worker(input_name, capacity, model_path, recognizer):
+    import vosk
+    source = SharedRingBuffer(capacity, input_name)
+    start = time.perf_counter()
+    speaking = threading.Event()
+    accept = make_recognizer(vosk.Model(model_path), recognizer, on_speech_start=lambda: emit(event="speech_start"),
+                             is_speaking=speaking.is_set)
+    emit(ready=time.perf_counter() - start)
+    running = threading.Event()
+    running.set()
+
+    def wait_for_parent():
+        for line in sys.stdin:
+            if line.strip() == "speaking":
+                speaking.set()
+            else:
+                speaking.clear()
+        running.clear()
+    threading.Thread(target=wait_for_parent, daemon=True).start()
+    busy = 0.0
+    blocks = 0
+    while running.is_set():
+        if source.available() < BLOCKSIZE:
+            time.sleep(0.002)
+            continue
+        data = source.read(BLOCKSIZE).tobytes()
+        start = time.thread_time()
+        for text in accept(data):
+            emit(text=text)
+        busy += time.thread_time() - start
+        blocks += 1
+        source.processed = source.read_index
+    emit(stats={"busy": busy, "blocks": blocks, "cpu": time.process_time()})
+    source.close()
+
+
+# Benchmark: real-time factor of each mode, replaying WAV fixtures as fast as the pipeline takes them
+def run_fixture(pipeline, samples):
+    samples = np.concatenate([samples, np.zeros(SAMPLE_RATE, dtype=np.int16)])  # Trailing silence closes the last utterance
+    pipeline.start()
+    start = time.perf_counter()
+    for offset in range(0, len(samples) - BLOCKSIZE + 1, BLOCKSIZE):
+        while not pipeline.has_room(BLOCKSIZE):
+            time.sleep(0.0005)
+        pipeline.callback(samples[offset:offset + BLOCKSIZE].reshape(-1, 1), BLOCKSIZE, None, None)
+    while not pipeline.idle():
+        time.sleep(0.001)
+    wall = time.perf_counter() - start
+    time.sleep(0.05)  # Let the last results arrive
+    pipeline.stop()
+    transcripts = []
+    while not pipeline.results.empty():
+        transcripts.append(pipeline.results.get())
+    return wall, transcripts
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        if sys.argv[2] == "dsp":
+            run_dsp_worker(sys.argv[3], sys.argv[4], int(sys.argv[5]))
+        else:
+            run_asr_worker(sys.argv[3], int(sys.argv[4]), sys.argv[5], sys.argv[6])
+        return
+    from replay_harness import make_fixtures, read_wav
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", nargs="*", help="16 kHz mono WAV files to replay")
+    parser.add_argument("--model", required=True, help="path to the Vosk model")
+    parser.add_argument("--make-fixtures", metavar="DIR", help="write synthetic fixtures to DIR and replay them too")
+    parser.add_argument("--recognizer", choices=["wake_word", "vad"], default="vad")
+    parser.add_argument("--mode", choices=["threads", "processes", "both"], default="both")
+    args = parser.parse_args()
+
+    paths = list(args.fixtures)
+    if args.make_fixtures:
+        paths += [path for path in make_fixtures(args.make_fixtures) if path not in paths]
+    modes = ["threads", "processes"] if args.mode == "both" else [args.mode]
+    print(f"{os.cpu_count()} CPUs")
+    for path in paths:
+        samples = read_wav(path)
+        seconds = len(samples) / SAMPLE_RATE + 1
+        for mode in modes:
+            pipeline = create_pipeline(mode, args.model, args.recognizer)
+            wall, transcripts = run_fixture(pipeline, samples)
+            stages = ", ".join(f"{name} {busy:.3f}s" for name, busy in pipeline.stage_times().items())
+            print(f"{os.path.basename(path):20s} {mode:9s} RTF {wall / seconds:.3f} ({wall:.2f}s for {seconds:.1f}s of audio) | "
+                  f"{stages} | {transcripts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""Offline replay harness for the Vosk audio pipelines.
+
+Replays WAV fixtures through "ai trial.py" and modeltest.py themselves: each
+script is imported and its own audio callback, queue and per-block handler
+are driven (vosk_callback -> ring buffer -> noise reduction worker ->
+recognizer_queue -> handle_audio(), which runs the wake word listener and
+process_command, in "ai trial.py"; vosk_callback -> recognizer_queue ->
+handle_audio() in modeltest.py). It runs faster than real time and without
+a microphone, and reports real-time factor, recognition latency (including
+handling the command), queue depth and wall-clock time spent per stage.
+
+Nothing else is faked except the devices the scripts talk to: pyttsx3 speaks
+into a silent engine, sounddevice does nothing (the harness calls the audio
+callbacks itself), there is no console window to minimize, webbrowser.open
+only records the URL, and Ollama is the stub server from ollama_client. The
+scripts load the model given with --model (through VOSK_MODEL_PATH) and
+write their logs and caches to a temporary directory. The assistant's exit
+command (os._exit) only ends the replay of that fixture: it is reported as
+exited, and the remaining fixtures and the --max-rtf check still run.
+
+    python replay_harness.py --model vosk-model-small-en-us-0.15 fixtures/*.wav
+    python replay_harness.py --model ... --make-fixtures fixtures --max-rtf 0.5
+
+With --max-rtf the exit status is non-zero when any run is slower than the
+given real-time factor, so it can gate CI on headless Linux.
+"""
+import argparse
+import contextlib
+import ctypes
+import glob
+import importlib.util
+import io
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import types
+import wave
+import webbrowser
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def read_wav(path):
+    """Read a 16 kHz mono 16-bit WAV file into an int16 array."""
+    with wave.open(path, "rb") as file:
+        if file.getframerate() != SAMPLE_RATE or file.getnchannels() != 1 or file.getsampwidth() != 2:
+            raise ValueError(f"{path} must be 16 kHz mono 16-bit PCM")
+        return np.frombuffer(file.readframes(file.getnframes()), dtype=np.int16)
+
+
+def write_wav(path, samples):
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(SAMPLE_RATE)
+        file.writeframes(samples.astype(np.int16).tobytes())
+
+
+# Synthetic fixtures: room noise only, and tone bursts that open the VAD without containing words
+def make_fixtures(directory):
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(0)
+    noise = lambda seconds: rng.normal(0, 30, int(seconds * SAMPLE_RATE))
+    t = np.arange(2 * SAMPLE_RATE) / SAMPLE_RATE
+    tone = 3000 * (np.sin(2 * np.pi * 440 * t) + 0.5 * np.sin(2 * np.pi * 880 * t)) / 1.5
+    write_wav(os.path.join(directory, "silence.wav"), noise(10))
+    write_wav(os.path.join(directory, "tones.wav"), np.concatenate([noise(1), tone + noise(2), noise(2), tone + noise(2), noise(2)]))
+    return sorted(glob.glob(os.path.join(directory, "*.wav")))
+
+
+class Status:
+    """Stand-in for sounddevice's CallbackFlags."""
+    input_overflow = False
+
+    def __bool__(self):
+        return False
+
+
+class SilentEngine:
+    """Stand-in for a pyttsx3 engine: utterances finish at once, save_to_file() writes 0.1 s of silence."""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.properties = {"voices": [types.SimpleNamespace(id=f"silent-{index}", name=f"Silent {index}") for index in range(2)],
+                           "voice": "silent-0", "rate": 200}
+        self.pending = []
+        self.spoken = []
+
+    def connect(self, topic, callback):
+        self.callbacks[topic] = callback
+
+    def getProperty(self, name):
+        return self.properties[name]
+
+    def setProperty(self, name, value):
+        self.properties[name] = value
+
+    def say(self, text):
+        self.pending.append((text, None))
+
+    def save_to_file(self, text, path):
+        self.pending.append((text, path))
+
+    def runAndWait(self):
+        while self.pending:
+            self.iterate()
+
+    def startLoop(self, use_driver_loop=True):
+        pass
+
+    def endLoop(self):
+        pass
+
+    def stop(self):
+        self.pending = []
+
+    def iterate(self):
+        if not self.pending:
+            return
+        text, path = self.pending.pop(0)
+        if "started-utterance" in self.callbacks:
+            self.callbacks["started-utterance"](text)
+        if path is None:
+            self.spoken.append(text)
+        else:
+            write_wav(path, np.zeros(SAMPLE_RATE // 10))
+        if "finished-utterance" in self.callbacks:
+            self.callbacks["finished-utterance"](text, True)
+
+
+class InputStream:
+    """Stand-in for sounddevice's streams: the harness calls input callbacks itself, output goes nowhere."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class NoConsole:
+    """Stand-in for ctypes.windll.kernel32 / user32: there is no console window to find."""
+
+    def __getattr__(self, name):
+        return lambda *args: 0
+
+
+opened_urls = []
+
+
+class AssistantExited(BaseException):
+    """Raised in place of os._exit() (the "exit" command) so it ends the replay rather than the harness.
+
+    A BaseException, so the scripts' own except Exception handlers let it through.
+    """
+
+
+def exit_replay(status):
+    raise AssistantExited(status)
+
+
+def install_headless_devices(ollama_host):
+    """Swap the speaker, microphone, console window, browser and Ollama server for headless stand-ins."""
+    pyttsx3 = types.ModuleType("pyttsx3")
+    pyttsx3.init = lambda *args, **kwargs: SilentEngine()
+    sys.modules["pyttsx3"] = pyttsx3
+    sounddevice = types.ModuleType("sounddevice")
+    sounddevice.InputStream = sounddevice.RawInputStream = sounddevice.OutputStream = InputStream
+    sys.modules["sounddevice"] = sounddevice
+    if not hasattr(ctypes, "windll"):
+        ctypes.windll = types.SimpleNamespace(kernel32=NoConsole(), user32=NoConsole())
+    webbrowser.open = lambda url, *args, **kwargs: opened_urls.append(url) or True
+    os._exit = exit_replay
+    os.environ["OLLAMA_HOST"] = ollama_host
+
+
+def load_script(file_name, module_name):
+    """Import one of the assistant scripts (the file names are not valid module names) from this directory."""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module  # The model, TTS worker and history are shared by every replay
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class AiTrialPipeline:
+    """ai trial.py: vosk_callback -> ring buffer -> noise reduction worker -> recognizer_queue -> handle_audio()."""
+
+    name = "ai trial"
+    blocksize = 512
+
+    def __init__(self):
+        self.script = load_script("ai trial.py", "ai_trial")
+        self.recognizer_queue = self.script.recognizer_queue
+        self.callback = self.script.vosk_callback
+        self.listener = self.script.create_listener()
+        self.baseline = self.counters()
+
+    def counters(self):
+        script = self.script
+        return {"callback": script.callback_stats["total_time"], "noise_reduction": script.noise_worker.processing_time,
+                "overflows": (script.callback_stats["input_overflows"] + script.audio_ring.overflows
+                              + script.recognizer_queue.dropped_oldest + script.recognizer_queue.dropped_newest)}
+
+    def start(self):
+        self.script.noise_worker.start()
+
+    def stop(self):
+        self.script.noise_worker.stop()
+
+    def has_room(self, count):
+        ring = self.script.audio_ring
+        return ring.capacity - ring.available() >= count and not self.recognizer_queue.full()
+
+    def idle(self):
+        return self.script.audio_ring.available() < self.script.noise_worker.hop and self.recognizer_queue.empty()
+
+    def recognize(self, data):
+        return self.script.handle_audio(self.listener, data)
+
+    def stage_times(self):
+        counters = self.counters()
+        return {name: counters[name] - self.baseline[name] for name in ("callback", "noise_reduction")}
+
+    def overflows(self):
+        return self.counters()["overflows"] - self.baseline["overflows"]
+
+
+class ModeltestPipeline:
+    """modeltest.py: vosk_callback -> recognizer_queue -> handle_audio() (VAD gate -> KaldiRecognizer)."""
+
+    name = "modeltest"
+    blocksize = 512
+
+    def __init__(self):
+        self.script = load_script("modeltest.py", "modeltest")
+        self.recognizer_queue = self.script.recognizer_queue
+        self.rec, self.gate = self.script.create_recognizer()
+        self.callback_time = 0.0
+        self.baseline = self.recognizer_queue.dropped_oldest + self.recognizer_queue.dropped_newest
+
+    def callback(self, indata, frames, time_info, status):
+        start = time.perf_counter()
+        self.script.vosk_callback(indata, frames, time_info, status)
+        self.callback_time += time.perf_counter() - start
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def has_room(self, count):
+        return not self.recognizer_queue.full()
+
+    def idle(self):
+        return self.recognizer_queue.empty()
+
+    def recognize(self, data):
+        return self.script.handle_audio(self.rec, self.gate, data)
+
+    def stage_times(self):
+        return {"callback": self.callback_time}
+
+    def overflows(self):
+        return self.recognizer_queue.dropped_oldest + self.recognizer_queue.dropped_newest - self.baseline
+
+
+def replay(pipeline, samples, speed=10.0):
+    """Push samples through pipeline.callback at speed x real time (0 = as fast as the pipeline drains).
+
+    Every stage is timed with perf_counter. A result's latency runs from the
+    moment the newest block of audio it was decoded from was pushed: the
+    consumer counts the samples it has taken off the queue, which gives the
+    block.
+    """
+    blocksize = pipeline.blocksize
+    samples = np.concatenate([samples, np.zeros(SAMPLE_RATE, dtype=np.int16)])  # Trailing silence closes the last utterance
+    results = []
+    latencies = []
+    depths = []
+    pushed_at = []  # Block index -> time it was pushed
+    asr_time = [0.0]
+    running = threading.Event()
+    running.set()
+    exited = threading.Event()
+
+    def consume():
+        consumed = 0
+        while running.is_set() or not pipeline.recognizer_queue.empty():
+            try:
+                data = pipeline.recognizer_queue.get(timeout=0.02)
+            except queue.Empty:
+                continue
+            consumed += len(data) // 2  # int16 bytes
+            if exited.is_set():
+                continue  # The assistant has exited; just drain what is left
+            start = time.perf_counter()
+            try:
+                texts = pipeline.recognize(data)
+            except AssistantExited:
+                exited.set()
+                texts = []
+            finally:
+                asr_time[0] += time.perf_counter() - start
+            for text in texts:
+                now = time.perf_counter()
+                results.append(text)
+                block = min((consumed - 1) // blocksize, len(pushed_at) - 1)
+                latencies.append(now - pushed_at[block])
+
+    def sample_depth():
+        while running.is_set():
+            depths.append(pipeline.recognizer_queue.qsize())
+            time.sleep(0.01)
+
+    pipeline.start()
+    threads = [threading.Thread(target=consume, daemon=True), threading.Thread(target=sample_depth, daemon=True)]
+    for thread in threads:
+        thread.start()
+    block_seconds = blocksize / SAMPLE_RATE
+    status = Status()
+    start = time.perf_counter()
+    for index, offset in enumerate(range(0, len(samples) - blocksize + 1, blocksize)):
+        if exited.is_set():
+            break
+        if speed:
+            delay = start + index * block_seconds / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            while not pipeline.has_room(blocksize) and not exited.is_set():
+                time.sleep(0.001)
+        pushed_at.append(time.perf_counter())
+        pipeline.callback(samples[offset:offset + blocksize].reshape(-1, 1), blocksize, None, status)
+    while not pipeline.idle():
+        time.sleep(0.005)
+    time.sleep(0.05)
+    running.clear()
+    for thread in threads:
+        thread.join()
+    pipeline.stop()
+    wall = time.perf_counter() - start
+    duration = len(pushed_at) * block_seconds
+    stages = pipeline.stage_times()
+    stages["asr"] = asr_time[0]
+    return {
+        "pipeline": pipeline.name,
+        "audio_seconds": round(duration, 3),
+        "wall_seconds": round(wall, 3),
+        "real_time_factor": round(sum(stages.values()) / duration, 4) if duration else 0.0,
+        "final_result_latency_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+        "queue_depth_max": max(depths, default=0),
+        "queue_depth_mean": round(sum(depths) / len(depths), 2) if depths else 0,
+        "overflows": pipeline.overflows(),
+        "stage_seconds": {name: round(seconds, 4) for name, seconds in stages.items()},
+        "transcripts": results,
+        "exited": exited.is_set(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", nargs="*", help="16 kHz mono WAV files to replay")
+    parser.add_argument("--model", required=True, help="path to the Vosk model")
+    parser.add_argument("--make-fixtures", metavar="DIR", help="write synthetic fixtures to DIR and replay them too")
+    parser.add_argument("--pipeline", choices=["ai trial", "modeltest", "all"], default="all")
+    parser.add_argument("--speed", type=float, default=10.0, help="replay speed vs real time, 0 for as fast as possible")
+    parser.add_argument("--max-rtf", type=float, help="fail if any run's real-time factor is above this")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' own output")
+    args = parser.parse_args()
+
+    from ollama_client import start_stub_server
+    paths = [os.path.abspath(path) for path in args.fixtures]
+    if args.make_fixtures:
+        paths += [os.path.abspath(path) for path in make_fixtures(args.make_fixtures) if os.path.abspath(path) not in paths]
+    json_path = os.path.abspath(args.json) if args.json else None
+    os.environ["VOSK_MODEL_PATH"] = os.path.abspath(args.model)
+    server, host = start_stub_server(load_seconds=0.0)
+    install_headless_devices(host)
+    os.chdir(tempfile.mkdtemp(prefix="replay_harness_"))  # Conversation logs, caches and traces go here
+    pipelines = [AiTrialPipeline, ModeltestPipeline]
+    if args.pipeline != "all":
+        pipelines = [pipeline for pipeline in pipelines if pipeline.name == args.pipeline]
+
+    reports = []
+    for path in paths:
+        samples = read_wav(path)
+        for pipeline_class in pipelines:
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+                report = replay(pipeline_class(), samples, args.speed)
+            report["fixture"] = os.path.basename(path)
+            reports.append(report)
+            stages = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in report["stage_seconds"].items())
+            print(f"{report['fixture']:20s} {report['pipeline']:10s} RTF {report['real_time_factor']:.3f} | "
+                  f"latency {report['final_result_latency_ms']} ms | queue max {report['queue_depth_max']} "
+                  f"mean {report['queue_depth_mean']} | overflows {report['overflows']} | {stages} | {report['transcripts']}"
+                  + (" | exited" if report["exited"] else ""))
+    server.shutdown()
+    if json_path:
+        with open(json_path, "w") as file:
+            json.dump(reports, file, indent=4)
+    if args.max_rtf is not None and any(report["real_time_factor"] > args.max_rtf for report in reports):
+        print(f"Real-time factor above {args.max_rtf}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
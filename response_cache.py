@@ -0,0 +1,130 @@
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# Default location of the persisted cache
+response_cache_file = "response_cache.json"
+
+QUESTION_WORDS = ("what", "who", "whom", "whose", "when", "where", "why", "how", "which",
+                  "is", "are", "am", "was", "were", "do", "does", "did", "can", "could", "will", "would", "should", "tell")
+
+
+def normalize_prompt(prompt):
+    """Lowercase, drop punctuation and collapse whitespace, so trivial variations share an entry."""
+    return " ".join(re.findall(r"[a-z0-9']+", prompt.lower()))
+
+
+def is_question(prompt):
+    """Questions read the conversation state; anything else (e.g. "my name is ...") may change it."""
+    words = normalize_prompt(prompt).split()
+    return prompt.strip().endswith("?") or bool(words) and words[0] in QUESTION_WORDS
+
+
+def last_reply(history):
+    """The assistant's latest reply, for the context of a prompt: follow-ups like "why?" are about it."""
+    for entry in reversed(history):
+        if entry.get("role") == "assistant":
+            return entry.get("content", "")
+    return ""
+
+
+class ResponseCache:
+    """LRU + TTL cache of LLM replies, persisted to disk between runs.
+
+    Entries are keyed on the normalized prompt plus a fingerprint of the
+    context the reply depends on (model, conversation summary, ...). Call
+    invalidate() whenever the conversation state changes in a way the
+    fingerprint does not capture; every lookup can be skipped with
+    use_cache=False.
+    """
+
+    def __init__(self, path=response_cache_file, max_entries=256, ttl=24 * 3600, save_every=10):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.save_every = save_every
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def key(self, prompt, context=()):
+        fingerprint = hashlib.sha256(json.dumps(list(context), sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"{normalize_prompt(prompt)}|{fingerprint[:16]}"
+
+    def get(self, prompt, context=(), use_cache=True):
+        if not use_cache:
+            return None
+        key = self.key(prompt, context)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry["time"] > self.ttl:
+                del self.entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry["response"]
+
+    def put(self, prompt, response, context=(), use_cache=True):
+        if not use_cache or not response:
+            return
+        with self.lock:
+            self.entries[self.key(prompt, context)] = {"time": time.time(), "response": response}
+            self.entries.move_to_end(self.key(prompt, context))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.unsaved += 1
+            save_now = self.unsaved >= self.save_every
+        if save_now:
+            self.save()
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the user told the assistant something new."""
+        with self.lock:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.unsaved += 1
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                entries = json.load(file)
+        except Exception as e:
+            print(f"Error loading response cache: {e}")
+            return
+        now = time.time()
+        with self.lock:
+            self.entries = collections.OrderedDict(
+                (key, entry) for key, entry in entries.items() if now - entry["time"] <= self.ttl)
+
+    def save(self):
+        with self.lock:
+            data = dict(self.entries)
+            self.unsaved = 0
+        try:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Error saving response cache: {e}")
+
+    def stats(self):
+        lookups = max(self.hits + self.misses, 1)
+        return (f"Response cache: {self.hits} hits, {self.misses} misses ({self.hits / lookups:.0%} hit rate), "
+                f"{self.expired} expired, {self.invalidations} invalidations, {len(self.entries)} entries")
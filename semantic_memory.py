@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+
+# Default location of the vector store, next to the conversation log
+semantic_memory_file = "conversation_history.vectors"
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbedder:
+    """Local NumPy embedding: hashed word unigrams and bigrams, L2-normalized.
+
+    Needs no model and is fast enough to embed every turn, but only captures
+    word overlap; OllamaEmbedder gives real semantic similarity.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def bucket(self, feature):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = WORD_PATTERN.findall(text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                index, sign = self.bucket(feature)
+                vectors[row, index] += sign
+        return vectors
+
+
+class OllamaEmbedder:
+    """Embeddings from Ollama's embedding endpoint (e.g. nomic-embed-text)."""
+
+    def __init__(self, model="nomic-embed-text", client=None):
+        if client is None:
+            import ollama
+            client = ollama
+        self.client = client  # e.g. an LLMScheduler client at indexing priority
+        self.model = model
+        self.name = f"ollama-{model}"
+        self.dim = len(self.embed(["dimension probe"])[0])
+
+    def embed(self, texts):
+        response = self.client.embed(model=self.model, input=list(texts))
+        return np.asarray(response["embeddings"], dtype=np.float32)
+
+
+class SemanticMemory:
+    """Top-k cosine retrieval over past turns, backed by a memory-mapped float32 matrix.
+
+    Row i holds the normalized embedding of entry i of the conversation list,
+    so results line up with conversation_memory like the history index does;
+    sync() with the list after appending to it keeps the two in step.
+    The matrix file grows by doubling and only the used rows are searched;
+    a small JSON sidecar records the row count, the embedder and the
+    ConversationLog generation the rows were built from, and the store is
+    rebuilt if the embedder or the generation changes.
+    """
+
+    def __init__(self, embedder, path=semantic_memory_file, initial_capacity=1024):
+        self.embedder = embedder
+        self.path = path
+        self.meta_path = path + ".json"
+        self.initial_capacity = initial_capacity
+        self.count = 0
+        self.generation = 0
+        self.matrix = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+        if meta.get("embedder") != self.embedder.name or not os.path.exists(self.path):
+            meta = {"embedder": self.embedder.name, "count": 0, "generation": 0}
+            capacity = self.initial_capacity
+            with open(self.path, "wb") as file:
+                file.truncate(capacity * self.embedder.dim * 4)
+        else:
+            capacity = os.path.getsize(self.path) // (self.embedder.dim * 4)
+        self.count = meta["count"]
+        self.generation = meta.get("generation", 0)
+        self.matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.embedder.dim))
+
+    def grow(self, needed):
+        capacity = self.matrix.shape[0]
+        while capacity < needed:
+            capacity *= 2
+        self.matrix.flush()
+        del self.matrix
+        with open(self.path, "r+b") as file:
+            file.truncate(capacity * self.embedder.dim * 4)
+        self.matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.embedder.dim))
+
+    def save(self):
+        with self.lock:
+            if self.matrix is None:
+                return
+            self.matrix.flush()
+            temp_path = self.meta_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump({"embedder": self.embedder.name, "count": self.count, "generation": self.generation}, file)
+            os.replace(temp_path, self.meta_path)
+
+    def add(self, entries):
+        """Embed and append entries (the next ones of the conversation list)."""
+        if not entries:
+            return
+        vectors = self.embedder.embed([entry.get("content", "") for entry in entries])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.maximum(norms, 1e-9)
+        with self.lock:
+            if self.matrix is None:
+                self.open()
+            if self.count + len(vectors) > self.matrix.shape[0]:
+                self.grow(self.count + len(vectors))
+            self.matrix[self.count:self.count + len(vectors)] = vectors
+            self.count += len(vectors)
+
+    def sync(self, entries, generation=0, batch_size=256, save=True):
+        """Embed any entries the store does not have yet (rebuilding if the log was compacted since).
+
+        generation is the ConversationLog generation entries were loaded
+        from. With save=False the new rows are only written out by the next
+        save(), which is enough after every turn.
+        """
+        with self.lock:
+            if self.matrix is None:
+                self.open()
+            if generation != self.generation or self.count > len(entries):
+                self.count = 0
+                self.generation = generation
+        for start in range(self.count, len(entries), batch_size):
+            self.add(entries[start:start + batch_size])
+        if save:
+            self.save()
+
+    def search(self, text, k=4, limit=None, min_score=0.2):
+        """Return [(entry_id, score)] of the k most similar rows among the first limit rows."""
+        query = self.embedder.embed([text])[0]
+        query /= max(np.linalg.norm(query), 1e-9)
+        with self.lock:
+            if self.matrix is None or not self.count:
+                return []
+            rows = self.count if limit is None else min(limit, self.count)
+            if rows <= 0:
+                return []
+            scores = self.matrix[:rows] @ query
+        k = min(k, rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(index), float(scores[index])) for index in top if scores[index] >= min_score]
+
+
+# Benchmark: incremental adds and top-k search over 100k turns
+def benchmark(turns=100_000, path="semantic_memory_benchmark.vectors"):
+    rng = np.random.default_rng(0)
+    vocabulary = [f"word{i}" for i in range(5000)] + ["name", "chirag", "weather", "mumbai", "pizza", "music"]
+    entries = [{"role": "user", "content": " ".join(rng.choice(vocabulary, 12))} for _ in range(turns)]
+    for file_path in (path, path + ".json"):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    memory = SemanticMemory(HashingEmbedder(), path)
+    start = time.perf_counter()
+    memory.sync(entries, batch_size=1024)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for entry in entries[:1000]:
+        memory.add([entry])  # One turn at a time, as in the voice loop
+    incremental = (time.perf_counter() - start) / 1000
+    timings = []
+    for _ in range(200):
+        start = time.perf_counter()
+        memory.search("what is my name", k=4)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    memory.save()
+    print(f"{memory.count} turns | bulk build {build:.1f}s | add one turn {incremental * 1000:.2f} ms | "
+          f"search p50 {timings[100] * 1000:.2f} ms, p95 {timings[190] * 1000:.2f} ms | "
+          f"store {os.path.getsize(path) / 1e6:.0f} MB")
+    for file_path in (path, path + ".json"):
+        os.remove(file_path)
+
+
+if __name__ == "__main__":
+    benchmark()
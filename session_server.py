@@ -0,0 +1,356 @@
+"""Serve many voice sessions from one host: PCM over TCP in, recognized text and replies out.
+
+Each client opens a TCP connection, sends one JSON header line such as
+{"session": "alice"} and then streams raw 16 kHz mono int16 PCM. Closing its
+write side (half-close) ends the stream; the server then finishes the last
+utterance and any pending reply before closing. The server sends JSON lines
+back: {"type": "transcript", "text": ...} for every recognized utterance and
+{"type": "reply", "text": ..., "latency_ms": ..., "queue_ms": ..., "llm_ms": ...}
+for the assistant's answer to it.
+
+All sessions share one loaded vosk.Model; each has its own gated
+KaldiRecognizer, its own ConversationLog (data_dir/<session>.jsonl) and its
+own ContextWindow. Decoding runs on a thread pool (Vosk releases the GIL), and
+LLM requests from all sessions go through a FairScheduler, so a capped number
+of ollama.chat calls run at once and a session with many pending turns cannot
+starve the others. Context-window summaries go through it too, as background
+jobs that only run while no reply is waiting.
+
+    python session_server.py serve --model vosk-model-small-en-us-0.15
+    python session_server.py load --sessions 8 --make-fixtures fixtures
+    python session_server.py serve --model ... --stub-ollama 0.5   (load-test without an Ollama server)
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from context_window import ContextWindow, summarize_with_ollama
+from conversation_store import ConversationLog
+from process_pipeline import make_recognizer
+
+SAMPLE_RATE = 16000
+BLOCKSIZE = 512
+BLOCK_BYTES = BLOCKSIZE * 2
+
+
+class FairScheduler:
+    """Runs at most max_concurrent jobs at a time, taking turns between sessions.
+
+    Each session has its own FIFO of jobs; a free slot goes to the session
+    that was served longest ago, so a session with many pending requests only
+    gets its share while other sessions are waiting. Background jobs (e.g.
+    summaries) share the same slots but only get one when no session's job
+    is waiting.
+    """
+
+    def __init__(self, max_concurrent=2):
+        self.max_concurrent = max_concurrent
+        self.queues = collections.OrderedDict()  # session_id -> deque of (job, future), least recently served first
+        self.background = collections.deque()
+        self.running = 0
+        self.completed = 0
+
+    async def submit(self, session_id, job, background=False):
+        """Run job() (a coroutine function) when it is this session's turn, and return its result."""
+        future = asyncio.get_running_loop().create_future()
+        if background:
+            self.background.append((job, future))
+        else:
+            self.queues.setdefault(session_id, collections.deque()).append((job, future))
+        self.dispatch()
+        return await future
+
+    def pending(self):
+        return sum(len(jobs) for jobs in self.queues.values()) + len(self.background)
+
+    def dispatch(self):
+        while self.running < self.max_concurrent and (self.queues or self.background):
+            if self.queues:
+                session_id, jobs = next(iter(self.queues.items()))
+                job, future = jobs.popleft()
+                if jobs:
+                    self.queues.move_to_end(session_id)
+                else:
+                    del self.queues[session_id]
+            else:
+                job, future = self.background.popleft()
+            if future.cancelled():
+                continue
+            self.running += 1
+            asyncio.create_task(self.run(job, future))
+
+    async def run(self, job, future):
+        try:
+            result = await job()
+            if not future.done():
+                future.set_result(result)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.dispatch()
+
+
+class Session:
+    """Recognizer, conversation history and context window of one connected user."""
+
+    def __init__(self, session_id, model, data_dir, summarize):
+        self.session_id = session_id
+        self.accept = make_recognizer(model, "vad")
+        self.log = ConversationLog(os.path.join(data_dir, f"{session_id}.jsonl"))
+        self.history = self.log.load()
+        self.context_window = ContextWindow(summarize=summarize)
+        self.turn_lock = asyncio.Lock()  # Replies are generated in order, one at a time per session
+        self.audio_seconds = 0.0
+
+
+class SessionServer:
+    """asyncio TCP server running one Session per connection on a shared Vosk model and LLM client."""
+
+    def __init__(self, model, llm, llm_model="llama3.2:3b", data_dir="sessions", max_concurrent_llm=2, asr_threads=None):
+        self.model = model
+        self.llm = llm
+        self.llm_model = llm_model
+        self.data_dir = data_dir
+        self.scheduler = FairScheduler(max_concurrent_llm)
+        self.asr_executor = ThreadPoolExecutor(max_workers=asr_threads or os.cpu_count() or 1)
+        self.anonymous_ids = itertools.count(1)
+        self.active = {}
+        self.latencies = []  # (utterance end to reply, time queued for the LLM, LLM time) in seconds
+        self.server = None
+        os.makedirs(data_dir, exist_ok=True)
+
+    def session_id(self, requested):
+        session_id = re.sub(r"[^A-Za-z0-9_-]", "_", str(requested or ""))[:64]
+        return session_id or f"anonymous-{next(self.anonymous_ids)}"
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def handle(self, reader, writer):
+        replies = []
+        session = None
+        try:
+            header = json.loads(await reader.readline() or b"{}")
+            session_id = self.session_id(header.get("session"))
+            if session_id in self.active:
+                await self.send(writer, {"type": "error", "text": f"session {session_id} is already connected"})
+                return
+            loop = asyncio.get_running_loop()
+            summarize = lambda summary, turns: self.summarize(summary, turns, loop)
+            session = Session(session_id, self.model, self.data_dir, summarize)
+            self.active[session_id] = session
+            await self.send(writer, {"type": "ready", "session": session_id, "turns": len(session.history)})
+            while True:
+                try:
+                    data = await reader.readexactly(BLOCK_BYTES)
+                except asyncio.IncompleteReadError as e:
+                    data = e.partial[:len(e.partial) // 2 * 2]
+                    if not data:
+                        break
+                session.audio_seconds += len(data) / 2 / SAMPLE_RATE
+                texts = await loop.run_in_executor(self.asr_executor, session.accept, data)
+                replies += [asyncio.create_task(self.heard(session, text, writer)) for text in texts]
+            # Trailing silence closes an utterance the client did not finish with a pause
+            silence = bytes(BLOCK_BYTES)
+            for _ in range(SAMPLE_RATE // BLOCKSIZE):
+                texts = await loop.run_in_executor(self.asr_executor, session.accept, silence)
+                replies += [asyncio.create_task(self.heard(session, text, writer)) for text in texts]
+            await asyncio.gather(*replies)
+        except (ConnectionError, json.JSONDecodeError) as e:
+            print(f"Session {session.session_id if session else '?'} ended: {e}")
+        finally:
+            for task in replies:
+                task.cancel()
+            if session is not None:
+                self.active.pop(session.session_id, None)
+            writer.close()
+
+    def summarize(self, summary, turns, loop):
+        """Fold turns into the summary (called on a ContextWindow thread) as a background scheduler job."""
+        job = lambda: asyncio.to_thread(summarize_with_ollama, summary, turns, self.llm_model, client=self.llm)
+        return asyncio.run_coroutine_threadsafe(self.scheduler.submit(None, job, background=True), loop).result()
+
+    async def heard(self, session, text, writer):
+        heard_at = time.perf_counter()
+        await self.send(writer, {"type": "transcript", "text": text})
+        async with session.turn_lock:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            user_turn = {"timestamp": timestamp, "role": "user", "content": text}
+            messages = session.context_window.messages(session.history + [user_turn])
+            started = {}
+
+            async def ask():
+                started["at"] = time.perf_counter()
+                return await self.llm.aio.chat(model=self.llm_model, messages=messages)
+            try:
+                response = await self.scheduler.submit(session.session_id, ask)
+                reply = response.message.content
+            except Exception as e:
+                print(f"Error with conversation model for {session.session_id}: {e}")
+                reply = "Error with conversation model."  # Sent, but kept out of the history and log
+            else:
+                assistant_turn = {"timestamp": timestamp, "role": "assistant", "content": reply}
+                session.history.extend([user_turn, assistant_turn])
+                session.log.append(user_turn, assistant_turn)
+            done = time.perf_counter()
+            queued = started.get("at", done) - heard_at
+            self.latencies.append((done - heard_at, queued, done - started.get("at", done)))
+            await self.send(writer, {"type": "reply", "text": reply, "latency_ms": round((done - heard_at) * 1000, 1),
+                                     "queue_ms": round(queued * 1000, 1),
+                                     "llm_ms": round((done - started.get("at", done)) * 1000, 1)})
+
+    async def send(self, writer, message):
+        writer.write((json.dumps(message) + "\n").encode("utf-8"))
+        await writer.drain()
+
+    def report(self):
+        if not self.latencies:
+            return "No replies served."
+        lines = [f"{len(self.latencies)} replies, LLM jobs completed {self.scheduler.completed}"]
+        for index, name in enumerate(("latency", "queued", "llm")):
+            values = sorted(sample[index] for sample in self.latencies)
+            lines.append(f"{name:8s} p50 {percentile(values, 0.5) * 1000:7.1f} ms, p95 {percentile(values, 0.95) * 1000:7.1f} ms")
+        return "\n".join(lines)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.asr_executor.shutdown(wait=False)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+# Load generator: replay WAV fixtures over N concurrent sessions, paced like a live microphone
+async def replay_session(host, port, session_id, samples, speed=1.0):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((json.dumps({"session": session_id}) + "\n").encode("utf-8"))
+    events = []
+
+    async def receive():
+        async for line in reader:
+            events.append((time.perf_counter(), json.loads(line)))
+    receiver = asyncio.create_task(receive())
+    start = time.perf_counter()
+    for index, offset in enumerate(range(0, len(samples), BLOCKSIZE)):
+        if speed:
+            delay = start + index * BLOCKSIZE / SAMPLE_RATE / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        writer.write(samples[offset:offset + BLOCKSIZE].tobytes())
+        await writer.drain()
+    sent_at = time.perf_counter()
+    writer.write_eof()
+    await receiver
+    writer.close()
+    return {"session": session_id, "audio_seconds": len(samples) / SAMPLE_RATE, "sent_at": sent_at, "events": events}
+
+
+async def run_load(host, port, paths, sessions, speed=1.0):
+    from replay_harness import read_wav
+    fixtures = [read_wav(path) for path in paths]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(replay_session(host, port, f"load-{index}", fixtures[index % len(fixtures)], speed)
+                                     for index in range(sessions)))
+    wall = time.perf_counter() - start
+    audio_seconds = sum(result["audio_seconds"] for result in results)
+    replies = [message for result in results for _, message in result["events"] if message["type"] == "reply"]
+    transcripts = [message for result in results for _, message in result["events"] if message["type"] == "transcript"]
+    errors = [message for result in results for _, message in result["events"] if message["type"] == "error"]
+    # Client-side: transcript received to reply received, and end of audio sent to last reply received
+    turn_times = []
+    drain_times = []
+    for result in results:
+        heard = [at for at, message in result["events"] if message["type"] == "transcript"]
+        answered = [at for at, message in result["events"] if message["type"] == "reply"]
+        turn_times += [reply - transcript for transcript, reply in zip(heard, answered)]
+        if answered:
+            drain_times.append(max(answered[-1] - result["sent_at"], 0.0))
+    print(f"{sessions} sessions, {audio_seconds:.1f} s of audio in {wall:.2f} s: "
+          f"{audio_seconds / wall:.2f}x real time, {len(transcripts)} utterances, "
+          f"{len(replies) / wall:.2f} replies/s, {len(errors)} errors")
+    for name, values in (("server latency", [message["latency_ms"] / 1000 for message in replies]),
+                         ("queued for LLM", [message["queue_ms"] / 1000 for message in replies]),
+                         ("client turn", turn_times),
+                         ("end to last reply", drain_times)):
+        values = sorted(values)
+        print(f"{name:18s} p50 {percentile(values, 0.5) * 1000:7.1f} ms, p95 {percentile(values, 0.95) * 1000:7.1f} ms, "
+              f"max {(values[-1] if values else 0.0) * 1000:7.1f} ms")
+    return results
+
+
+async def serve(args):
+    import vosk
+    from ollama_client import ManagedOllama, start_stub_server
+    host = None
+    if args.stub_ollama is not None:
+        _, host = start_stub_server(load_seconds=0.0, reply_seconds=args.stub_ollama)
+    llm = ManagedOllama(args.llm, host=host or args.ollama_host)
+    try:
+        llm.warm_up()
+    except Exception as e:
+        print(f"Could not warm up {args.llm}: {e}")
+    llm.start_keep_warm()
+    server = SessionServer(vosk.Model(args.model), llm, args.llm, args.data_dir, args.llm_concurrency, args.asr_threads)
+    await server.start(args.host, args.port)
+    print(f"Serving voice sessions on {args.host}:{args.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(server.report())
+        await server.close()
+        llm.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the session server")
+    serve_parser.add_argument("--model", required=True, help="path to the Vosk model")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--llm", default="llama3.2:3b", help="Ollama model")
+    serve_parser.add_argument("--ollama-host", help="Ollama server URL")
+    serve_parser.add_argument("--llm-concurrency", type=int, default=2, help="ollama.chat calls in flight at once")
+    serve_parser.add_argument("--asr-threads", type=int, help="decoding threads (default: one per CPU)")
+    serve_parser.add_argument("--data-dir", default="sessions", help="where per-session conversation logs are kept")
+    serve_parser.add_argument("--stub-ollama", type=float, metavar="SECONDS",
+                              help="answer from a local stub taking SECONDS per reply instead of Ollama")
+    load_parser = commands.add_parser("load", help="replay WAV fixtures over concurrent sessions")
+    load_parser.add_argument("fixtures", nargs="*", help="16 kHz mono WAV files to replay")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=8765)
+    load_parser.add_argument("--sessions", type=int, default=4)
+    load_parser.add_argument("--speed", type=float, default=1.0, help="replay speed vs real time, 0 for as fast as possible")
+    load_parser.add_argument("--make-fixtures", metavar="DIR", help="write synthetic fixtures to DIR and replay them too")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return
+    from replay_harness import make_fixtures
+    paths = list(args.fixtures)
+    if args.make_fixtures:
+        paths += [path for path in make_fixtures(args.make_fixtures) if path not in paths]
+    if not paths:
+        parser.error("give WAV fixtures or --make-fixtures")
+    asyncio.run(run_load(args.host, args.port, paths, args.sessions, args.speed))
+
+
+if __name__ == "__main__":
+    main()
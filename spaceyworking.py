@@ -1,20 +1,23 @@
-import ollama
 import speech_recognition as sr
-import pyttsx3
 import webbrowser
 import os
 import ctypes
-import spacy
 import re
-
-# Initialize NLP model
-nlp = spacy.load("en_core_web_sm")
-
-# Initialize speech synthesizer
-engine = pyttsx3.init()
-voices = engine.getProperty('voices')
-engine.setProperty('voice', voices[0].id)
-engine.setProperty('rate', 210)
+from speech_output import stream_response
+from model_registry import ModelRegistry, load_spacy, load_tts
+from tts_worker import TTSWorker
+from ollama_client import load_ollama
+from intent_router import Intent, IntentRouter
+from entity_parser import EntityParser, load_ner_pipeline
+
+# Load the NLP model in the background and the speech synthesizer on its own thread
+# Only the entity recognizer is loaded unless the full pipeline is asked for
+spacy_ner_only = True
+models = ModelRegistry()
+models.register("spacy", load_ner_pipeline if spacy_ner_only else load_spacy, "en_core_web_sm")
+tts = TTSWorker(lambda: load_tts(voice_index=0, rate=210))
+tts.start()
+models.register("llm", load_ollama, "llama3.2:3b", keep_alive="30m")
 
 SW_MINIMIZE, SW_RESTORE = 6, 9
 kernel32, user32 = ctypes.windll.kernel32, ctypes.windll.user32
@@ -38,8 +41,7 @@ def restore_console():
 def speak(text):
     """Convert text to speech, ensuring it doesn't contain unwanted characters."""
     clean_text = sanitize_text(text)  # Clean the text before speaking
-    engine.say(clean_text)
-    engine.runAndWait()
+    tts.say(clean_text).wait()
 
 # Function to sanitize input (remove unwanted characters)
 def sanitize_text(text):
@@ -48,32 +50,36 @@ def sanitize_text(text):
     sanitized_text = re.sub(r"[^a-zA-Z0-9\s,.!?]", "", text)  # Keep letters, numbers, and basic punctuation
     return sanitized_text
 
+# Function to extract named entities (cached per command), only run for intents that need them
+entity_parser = None
+
+def extract_entities(command):
+    global entity_parser
+    if entity_parser is None:
+        entity_parser = EntityParser(models.get("spacy"))
+    return entity_parser.entities(command)
+
+# Intent table, compiled once into a single-pass matcher
+command_router = IntentRouter([
+    Intent("search", ["google", "search"], entities=True),
+    Intent("minimize", ["minimize", "minimise"]),
+    Intent("exit", ["exit"]),
+    Intent("help", ["help"]),
+], fallback="general", entity_extractor=extract_entities)
+
 # Function to parse the user's command
 def parse_command(command):
-    doc = nlp(command)
-    intent = "general"
-    entities = []
-
-    if "google" in command or "search" in command:
-        intent = "search"
-        entities = [ent.text for ent in doc.ents]
-    elif "minimize" in command or "minimise" in command:
-        intent = "minimize"
-    elif "exit" in command:
-        intent = "exit"
-    elif "help" in command:
-        intent = "help"
-
-    return intent, entities
+    match = command_router.route(command)
+    return match.intent, match.entities, match.query
 
 # Function to process a command
 def process_command(command):
     global is_processing_command, has_minimized
 
-    intent, entities = parse_command(command)
+    intent, entities, query = parse_command(command)
 
     if intent == "search":
-        query = " ".join(entities) if entities else command.replace("google", "").replace("search", "").strip()
+        query = " ".join(entities) if entities else query
         if query:
             perform_google_search(query)
         else:
@@ -98,10 +104,8 @@ def process_command(command):
 def respond_to_conversation(command):
     try:
         print("Processing user command:", command)  # Debug print
-        response = ollama.chat(model="llama3.2:3b", messages=[{"role": "user", "content": command}])
-        reply = response['message']['content']  # Fix to access the correct content in the response
+        reply = stream_response([{"role": "user", "content": command}], speak, client=models.get("llm"))  # Speaks each sentence as it arrives
         print("Response from Ollama:", reply)  # Debug print
-        speak(reply)
     except Exception as e:
         speak(f"Sorry, I encountered an issue: {e}")
 
@@ -0,0 +1,267 @@
+import queue
+import threading
+import time
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+class PartialStabilizer:
+    """Decides when a partial transcript has settled enough to act on.
+
+    A partial is stable once the same text (at least min_words words) has come
+    back for stable_updates consecutive blocks, e.g. during the VAD hangover
+    after the user stops talking, or a pause between phrases. Each stable text
+    is reported once.
+    """
+
+    def __init__(self, min_words=2, stable_updates=6):
+        self.min_words = min_words
+        self.stable_updates = stable_updates
+        self.reset()
+
+    def reset(self):
+        self.last = ""
+        self.count = 0
+
+    def update(self, partial):
+        """Feed the latest partial; returns its text when it has just become stable, else None."""
+        text = normalize(partial)
+        if text != self.last:
+            self.last = text
+            self.count = 1
+            return None
+        self.count += 1
+        if self.count == self.stable_updates and len(text.split()) >= self.min_words:
+            return text
+        return None
+
+
+class Speculation:
+    """A reply being generated on a background thread from a partial transcript.
+
+    The chunks are buffered until the final transcript decides: chat() hands
+    them over (buffered ones first, then the rest as they arrive), so the
+    Speculation can be passed as the client to stream_response; cancel()
+    stops generation at the next chunk. on_used, if given, is called with the
+    Speculation the first time chat() takes it over.
+    """
+
+    def __init__(self, text, messages, client, model, on_used=None):
+        self.text = text
+        self.messages = messages
+        self.on_used = on_used
+        self.started_at = time.perf_counter()
+        self.resolved_at = None
+        self.ended_at = None
+        self.generated = 0
+        self.used = False
+        self.error = None
+        self.cancelled = threading.Event()
+        self.chunks = queue.Queue()
+        self.thread = threading.Thread(target=self.run, args=(client, model), daemon=True)
+        self.thread.start()
+
+    def run(self, client, model):
+        stream = None
+        try:
+            stream = client.chat(model=model, messages=self.messages, stream=True)
+            for chunk in stream:
+                if self.cancelled.is_set():
+                    break
+                self.generated += 1
+                self.chunks.put(chunk)
+        except Exception as e:
+            if not self.cancelled.is_set():
+                self.error = e
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            self.ended_at = time.perf_counter()
+            self.chunks.put(None)
+
+    def chat(self, model=None, messages=None, stream=True, **kwargs):
+        """Take over the speculated stream (the arguments are ignored: the final transcript matched)."""
+        if not self.used:
+            self.used = True
+            if self.on_used is not None:
+                self.on_used(self)
+        return self.iter_chunks()
+
+    def iter_chunks(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield chunk
+
+    def cancel(self):
+        if not self.used:
+            self.cancelled.set()
+
+    def generation_seconds(self):
+        return (self.ended_at or time.perf_counter()) - self.started_at
+
+
+class SpeculativeResponder:
+    """Starts the LLM reply from a stable partial transcript, before the final result arrives.
+
+    Feed on_partial() every partial transcript (WakeWordListener(on_partial=...))
+    and call resolve() with each final one. If the final transcript is the
+    speculated text, resolve() returns the Speculation, whose reply has had a
+    head start; otherwise the speculation is cancelled and counted as wasted.
+    A speculation is also dropped when a different partial becomes stable,
+    e.g. the user paused mid-sentence and carried on. A hit is only counted
+    once the reply is actually taken over with chat(); pass the resolved
+    Speculation to finish() after the turn, so one that went unused (the
+    reply came from the cache, or the command was handled without the LLM)
+    is cancelled and counted as wasted too.
+
+    build_messages(text) returns the chat messages the reply would be
+    generated from; should_speculate(text) can rule out commands that will
+    not go to the LLM. cancel is called for each dropped speculation, e.g.
+    to cancel its LLMScheduler group so a queued request is not sent at all.
+    Even a missed speculation is not all lost: Ollama keeps the prompt's KV
+    cache, so the history it shares with the real request is already
+    prefilled.
+    """
+
+    def __init__(self, client, build_messages, model="llama3.2:3b", should_speculate=None, stabilizer=None, cancel=None):
+        self.client = client
+        self.build_messages = build_messages
+        self.model = model
+        self.should_speculate = should_speculate
+        self.stabilizer = stabilizer or PartialStabilizer()
+        self.cancel = cancel
+        self.current = None
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self.wasted_seconds = 0.0
+        self.wasted_chunks = 0
+        self.head_starts = []  # Seconds between starting a speculation and its final transcript
+
+    def on_partial(self, partial):
+        text = self.stabilizer.update(partial)
+        if text is None or (self.current is not None and self.current.text == text):
+            return
+        if self.should_speculate is not None and not self.should_speculate(text):
+            return
+        self.discard()
+        try:
+            messages = self.build_messages(text)
+        except Exception as e:
+            print(f"Error building speculative prompt: {e}")
+            return
+        self.current = Speculation(text, messages, self.client, self.model, on_used=self.hit)
+        self.started += 1
+
+    def resolve(self, final_text):
+        """Return the Speculation if it matches final_text, else cancel it and return None."""
+        self.stabilizer.reset()
+        speculation, self.current = self.current, None
+        if speculation is None:
+            return None
+        if speculation.text == normalize(final_text):
+            speculation.resolved_at = time.perf_counter()
+            return speculation
+        self.waste(speculation)
+        return None
+
+    def hit(self, speculation):
+        self.hits += 1
+        self.head_starts.append((speculation.resolved_at or time.perf_counter()) - speculation.started_at)
+
+    def finish(self, speculation):
+        """Call once the turn resolve() returned speculation for is over; an unused one is wasted."""
+        if speculation is not None and not speculation.used:
+            self.waste(speculation)
+
+    def discard(self):
+        if self.current is not None:
+            self.waste(self.current)
+            self.current = None
+
+    def waste(self, speculation):
+        speculation.cancel()
+        if self.cancel is not None:
+            self.cancel()
+        self.wasted += 1
+        self.wasted_seconds += speculation.generation_seconds()
+        self.wasted_chunks += speculation.generated
+
+    def report(self):
+        if not self.started:
+            return "No speculative replies."
+        head_start = sum(self.head_starts) / len(self.head_starts) * 1000 if self.head_starts else 0.0
+        return (f"Speculation: {self.started} started, {self.hits} hits ({self.hits / self.started:.0%}), "
+                f"{self.wasted} wasted ({self.wasted_seconds:.2f} s of generation, {self.wasted_chunks} chunks), "
+                f"mean head start {head_start:.0f} ms")
+
+
+# Benchmark: time from the final transcript to the first reply chunk, against a stub Ollama server.
+# Partials arrive every 32 ms block, a word every 5 blocks, and the VAD hangover repeats the last one for 12 blocks.
+def benchmark(reply_seconds=0.6, block_seconds=0.032, blocks_per_word=5, hangover_blocks=12):
+    from llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE
+    from ollama_client import ManagedOllama, start_stub_server
+
+    # (spoken words, final transcript); the final differs when Vosk revises the last word, and
+    # None marks a pause long enough to look stable mid-sentence
+    utterances = [
+        ("what is the weather like today", None),
+        ("tell me a joke", None),
+        ("what is the whether", "what is the weather"),
+        ("how far away is the moon", None),
+        ("remind me | to call my mother", None),
+        ("what time is it in tokyo", None),
+        ("play sum music", "play some music"),
+        ("who wrote hamlet", None),
+    ]
+    server, host = start_stub_server(load_seconds=0.0, reply_seconds=reply_seconds, parallel=1)
+    llm = ManagedOllama(host=host)
+    scheduler = LLMScheduler(lambda: llm, max_concurrent=1)
+    chat_client = scheduler.client(PRIORITY_INTERACTIVE, group="turn")
+    build_messages = lambda text: [{"role": "user", "content": text}]
+    for mode in ("final only", "speculative"):
+        speculator = SpeculativeResponder(scheduler.client(PRIORITY_INTERACTIVE, group="speculation", supersede=True),
+                                          build_messages, cancel=lambda: scheduler.cancel("speculation"))
+        latencies = []
+        for spoken, final in utterances:
+            words = []
+            for word in spoken.split():
+                if word == "|":
+                    repeats = hangover_blocks - 2  # A pause just short of ending the utterance
+                else:
+                    words.append(word)
+                    repeats = blocks_per_word
+                for _ in range(repeats):
+                    if mode == "speculative":
+                        speculator.on_partial(" ".join(words))
+                    time.sleep(block_seconds)
+            for _ in range(hangover_blocks):
+                if mode == "speculative":
+                    speculator.on_partial(" ".join(words))
+                time.sleep(block_seconds)
+            final = final or " ".join(words)
+            start = time.perf_counter()
+            speculation = speculator.resolve(final)
+            client = speculation or chat_client
+            chunks = iter(client.chat(model="llama3.2:3b", messages=build_messages(final), stream=True))
+            next(chunks)
+            latencies.append(time.perf_counter() - start)
+            for _ in chunks:
+                pass
+            time.sleep(0.2)
+        latencies.sort()
+        print(f"{mode:12s} final transcript to first chunk: p50 {latencies[len(latencies) // 2] * 1000:4.0f} ms, "
+              f"max {latencies[-1] * 1000:4.0f} ms")
+        if mode == "speculative":
+            print(speculator.report())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    benchmark()
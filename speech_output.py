@@ -0,0 +1,79 @@
+import queue
+import re
+import threading
+import ollama
+
+# A sentence ends at . ! or ? followed by whitespace, or at a line break
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(buffer):
+    """Split off the complete sentences in buffer, returning (sentences, remainder)."""
+    parts = SENTENCE_END.split(buffer)
+    remainder = parts.pop()
+    return [part.strip() for part in parts if part.strip()], remainder
+
+
+class SentenceSpeaker:
+    """Speaks queued sentences on a background thread while more text streams in.
+
+    The thread only lasts for one reply, so speak must not drive a pyttsx3
+    engine itself: hand the sentence to the long-lived thread that owns the
+    engine and wait for it, e.g. lambda text: tts.say(text).wait() with a
+    TTSWorker.
+    """
+
+    def __init__(self, speak):
+        self.speak = speak
+        self.sentences = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            sentence = self.sentences.get()
+            if sentence is None:
+                return
+            try:
+                self.speak(sentence)
+            except Exception as e:
+                print(f"Error speaking sentence: {e}")
+
+    def put(self, sentence):
+        self.sentences.put(sentence)
+
+    def finish(self):
+        """Wait until every queued sentence has been spoken."""
+        self.sentences.put(None)
+        self.thread.join()
+
+
+# Stream a reply from Ollama and speak it sentence by sentence as it arrives
+def stream_response(messages, speak, model="llama3.2:3b", max_sentences=None, client=ollama):
+    """Return the reply text; with max_sentences set, only that many sentences are spoken and kept.
+
+    client is anything with ollama.chat's signature, e.g. a ManagedOllama.
+    """
+    speaker = SentenceSpeaker(speak)
+    spoken = []
+    full_text = ""
+    buffer = ""
+    stream = client.chat(model=model, messages=messages, stream=True)
+    try:
+        for chunk in stream:
+            text = chunk["message"]["content"]
+            full_text += text
+            sentences, buffer = split_sentences(buffer + text)
+            for sentence in sentences:
+                speaker.put(sentence)
+                spoken.append(sentence)
+                if max_sentences and len(spoken) >= max_sentences:
+                    return " ".join(spoken)  # Stop generating once we have all we will say
+        if buffer.strip():
+            speaker.put(buffer.strip())
+            spoken.append(buffer.strip())
+        return full_text.strip()
+    finally:
+        if hasattr(stream, "close"):
+            stream.close()
+        speaker.finish()
@@ -1,22 +1,27 @@
-import ollama  # Import Ollama package for conversational model
 import speech_recognition as sr
-import pyttsx3
 import webbrowser
 import os
 import ctypes
-
-# Initialize speech synthesizer
-engine = pyttsx3.init()
-
-# Set voice properties (you can change the voice and properties)
-voices = engine.getProperty('voices')
-engine.setProperty('voice', voices[0].id)  # Change the index for different voices
-engine.setProperty('rate', 210)  # Set speech rate
+from speech_output import stream_response
+from intent_router import Intent, IntentRouter
+from ollama_client import load_ollama
+from model_registry import ModelRegistry, load_tts
+from tts_worker import TTSWorker
+
+# Initialize speech synthesizer on its own thread, which is the only one that drives the engine
+# Set voice properties (you can change the voice index and speech rate)
+tts = TTSWorker(lambda: load_tts(voice_index=0, rate=210))
+tts.start()
+models = ModelRegistry()
+models.register("llm", load_ollama, "llama3.2:3b", keep_alive="30m")  # Keeps the conversational model loaded in Ollama
 
 # Flag to prevent multiple command processing at once
 is_processing_command = False
 has_minimized = False
 
+# Number of sentences of each model reply to speak (None speaks the whole reply)
+response_max_sentences = 1
+
 # Constants for minimizing and bringing console window to front
 SW_MINIMIZE = 6
 SW_RESTORE = 9
@@ -37,40 +42,49 @@ def restore_console_window():
         user32.SetForegroundWindow(hwnd)
 
 def speak(text):
-    """Use pyttsx3 to speak the provided text."""
-    engine.say(text)
-    engine.runAndWait()
+    """Use pyttsx3 to speak the provided text (queued on the TTS thread; returns once spoken)."""
+    tts.say(text).wait()
+
+# Command table, compiled once into a single-pass matcher (earlier rows win, like the old if/elif chain)
+command_router = IntentRouter([
+    Intent("wake", ["friday"]),
+    Intent("exit", ["exit"]),
+    Intent("minimize", ["minimize", "minimise"]),
+    Intent("google", ["google"]),
+    Intent("help", ["what can you do", "help"]),
+])
 
 def process_command(command):
     """Process the recognized command with conversational awareness."""
     global is_processing_command, has_minimized
 
-    if "friday" in command:
+    match = command_router.route(command)
+    query = match.query
+
+    if match.intent == "wake":
         restore_console_window()  # Restore and bring the console to the front
-        query = command.replace("friday", "").strip()
 
         if not query:
             speak("Yes, how can I assist you?")
         else:
             perform_google_search(query)
 
-    elif "exit" in command:
+    elif match.intent == "exit":
         speak("Terminating the application. Goodbye!")
         os._exit(0)
 
-    elif ("minimize" in command or "minimise" in command) and not has_minimized:
+    elif match.intent == "minimize" and not has_minimized:
         has_minimized = True
         minimize_console_window()
         speak("The window has been minimized. Let me know if you need anything else.")
 
-    elif "google" in command:
-        query = command.replace("google", "").strip()  # Remove "google" from the command
+    elif match.intent == "google":
         if query:
             perform_google_search(query)
         else:
             speak("Please provide the search terms.")
 
-    elif "what can you do" in command or "help" in command:
+    elif match.intent == "help":
         speak("I can perform Google searches, minimize the window, or help with many other things. Just ask!")
 
     else:
@@ -80,25 +94,12 @@ def process_command(command):
 def respond_to_conversation(command):
     """Use Ollama's conversational model (Llama 3.2:3B) to respond to user input."""
     try:
-        # Use Ollama to get a response with the Llama 3.2:3B model
-        response = ollama.chat(model="llama3.2:3b", messages=[{"role": "user", "content": command}])
-
-        # Extract the response text from the response object
-        bot_response = response.message.content
-
-        # If the response is too long, return only the first meaningful sentence
-        if len(bot_response.split('.')) > 1:
-            bot_response = bot_response.split('.')[0] + "."
-
-        # Ensure the response is concise and stripped of extra whitespace
-        bot_response = bot_response.strip()
+        # Stream the reply from the Llama 3.2:3B model, speaking each sentence as soon as it is complete
+        bot_response = stream_response([{"role": "user", "content": command}], speak, max_sentences=response_max_sentences, client=models.get("llm"))
 
         # Print the response on the terminal
         print(f"Model Response: {bot_response}")
 
-        # Speak the response
-        speak(bot_response)
-
     except Exception as e:
         print(f"Error with Ollama response: {e}")
         speak("Sorry, there was an issue with the conversation model.")
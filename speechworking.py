@@ -1,40 +1,32 @@
-import ollama  # Import Ollama package for conversational model
-import speech_recognition as sr
-import pyttsx3
 import webbrowser
 import os
 import ctypes
-import sounddevice as sd
-import queue
-import json
-import vosk
-
-# Initialize speech synthesizer
-engine = pyttsx3.init()
-
-# Set voice properties
-voices = engine.getProperty("voices")
-engine.setProperty("voice", voices[0].id)  # Change the index for different voices
-engine.setProperty("rate", 210)  # Set speech rate
+from speech_output import stream_response
+from asr_backends import ASRRouter, GoogleBackend, VoskBackend
+from capture_service import CaptureService
+from intent_router import Intent, IntentRouter
+from ollama_client import load_ollama
+from model_registry import ModelRegistry, load_tts, load_vosk
+from tts_worker import TTSWorker
+
+# Initialize speech synthesizer on its own thread, which is the only one that drives the engine
+tts = TTSWorker(lambda: load_tts(voice_index=0, rate=210))  # Change the index for different voices
+tts.start()
+models = ModelRegistry()
+models.register("llm", load_ollama, "llama3.2:3b", keep_alive="30m")  # Keeps the conversational model loaded in Ollama
 
 # Flags and constants
 is_processing_command = False
 has_minimized = False
+response_max_sentences = 1  # Sentences of each model reply to speak, None for the whole reply
 SW_MINIMIZE = 6
 SW_RESTORE = 9
 kernel32 = ctypes.windll.kernel32
 user32 = ctypes.windll.user32
 
-# Audio queue for Vosk
-audio_queue = queue.Queue()
-
-# Globals for selected model
-speech_to_text_model = None
-vosk_model = None
-vosk_recognizer = None
-
-# Initialize Vosk model
+# Initialize Vosk model (preloaded in the background so the offline fallback is instant)
 VOSK_MODEL_PATH = "./vosk-model-small-en-us-0.15"  # Update to your Vosk model path
+models.register("vosk", load_vosk, VOSK_MODEL_PATH)
 
 # Function to minimize and restore console
 
@@ -52,37 +44,47 @@ def restore_console_window():
 # Speech functions
 
 def speak(text):
-    engine.say(text)
-    engine.runAndWait()
+    tts.say(text).wait()
+
+# Command table, compiled once into a single-pass matcher (earlier rows win, like the old if/elif chain)
+command_router = IntentRouter([
+    Intent("wake", ["friday"]),
+    Intent("exit", ["exit"]),
+    Intent("minimize", ["minimize", "minimise"]),
+    Intent("google", ["google"]),
+    Intent("help", ["what can you do", "help"]),
+])
 
 def process_command(command):
     global is_processing_command, has_minimized
 
-    if "friday" in command:
+    match = command_router.route(command)
+    query = match.query
+
+    if match.intent == "wake":
         restore_console_window()
-        query = command.replace("friday", "").strip()
         if not query:
             speak("Yes, how can I assist you?")
         else:
             perform_google_search(query)
 
-    elif "exit" in command:
+    elif match.intent == "exit":
         speak("Terminating the application. Goodbye!")
+        print(speech_to_text.report())
         os._exit(0)
 
-    elif ("minimize" in command or "minimise" in command) and not has_minimized:
+    elif match.intent == "minimize" and not has_minimized:
         has_minimized = True
         minimize_console_window()
         speak("The window has been minimized. Let me know if you need anything else.")
 
-    elif "google" in command:
-        query = command.replace("google", "").strip()
+    elif match.intent == "google":
         if query:
             perform_google_search(query)
         else:
             speak("Please provide the search terms.")
 
-    elif "what can you do" in command or "help" in command:
+    elif match.intent == "help":
         speak("I can perform Google searches, minimize the window, or help with many other things. Just ask!")
 
     else:
@@ -90,13 +92,8 @@ def process_command(command):
 
 def respond_to_conversation(command):
     try:
-        response = ollama.chat(model="llama3.2:3b", messages=[{"role": "user", "content": command}])
-        bot_response = response.message.content
-        if len(bot_response.split('.')) > 1:
-            bot_response = bot_response.split('.')[0] + "."
-        bot_response = bot_response.strip()
+        bot_response = stream_response([{"role": "user", "content": command}], speak, max_sentences=response_max_sentences, client=models.get("llm"))
         print(f"Model Response: {bot_response}")
-        speak(bot_response)
     except Exception as e:
         print(f"Error with Ollama response: {e}")
         speak("Sorry, there was an issue with the conversation model.")
@@ -109,67 +106,21 @@ def perform_google_search(query):
     else:
         speak("No search term provided. Please try again.")
 
-# Speech-to-text functions
-
-def initialize_speech_to_text():
-    global speech_to_text_model, vosk_model, vosk_recognizer
-
-    try:
-        # Test internet connectivity and SpeechRecognition
-        recognizer = sr.Recognizer()
-        with sr.Microphone() as source:
-            print("Testing online SpeechRecognition...")
-            recognizer.adjust_for_ambient_noise(source)
-            recognizer.listen(source, timeout=3)  # Timeout if no audio
-            speech_to_text_model = "speechrecognition"
-            print("Online SpeechRecognition is available.")
-            return
-    except Exception as e:
-        print(f"Online SpeechRecognition failed: {e}")
-
-    # Fallback to Vosk if offline
-    try:
-        print("Loading Vosk model...")
-        vosk_model = vosk.Model(VOSK_MODEL_PATH)
-        vosk_recognizer = vosk.KaldiRecognizer(vosk_model, 16000)
-        speech_to_text_model = "vosk"
-        print("Vosk is ready for offline speech recognition.")
-    except Exception as e:
-        print(f"Failed to load Vosk model: {e}")
-        speak("No speech recognition model is available. Exiting.")
-        os._exit(1)
-
-def listen_with_speechrecognition():
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("Listening with SpeechRecognition...")
-        audio = recognizer.listen(source)
-        command = recognizer.recognize_google(audio).lower().strip()
-        print(f"Recognized: {command}")
-        return command
-
-def listen_with_vosk():
-    with sd.RawInputStream(samplerate=16000, blocksize=8000, dtype="int16", channels=1, callback=lambda indata, frames, time, status: audio_queue.put(bytes(indata))):
-        print("Listening with Vosk...")
-        while True:
-            data = audio_queue.get()
-            if vosk_recognizer.AcceptWaveform(data):
-                result = json.loads(vosk_recognizer.Result())
-                command = result.get("text", "").lower().strip()
-                print(f"Recognized: {command}")
-                return command
+# Speech-to-text: Google first, Vosk as the offline fallback, switching at runtime when one fails or is too slow.
+# Vosk only decodes in full after the wake word "friday" (and for a few seconds of follow-ups).
+# One microphone stream stays open for the whole session and is cut into utterances by the VAD; it is muted
+# while the assistant speaks, and Vosk decodes each utterance as it is captured.
+speech_to_text = ASRRouter([GoogleBackend(), VoskBackend(lambda: models.get("vosk"))],
+                           CaptureService(blocksize=480, is_speaking=tts.is_speaking))
 
 def listen_for_commands():
     global is_processing_command
 
     while True:
         try:
-            if speech_to_text_model == "speechrecognition":
-                command = listen_with_speechrecognition()
-            elif speech_to_text_model == "vosk":
-                command = listen_with_vosk()
-            else:
-                raise Exception("No valid speech-to-text model selected.")
+            print("Listening...")
+            command = speech_to_text.listen()
+            print(f"Recognized: {command}")
 
             if command and not is_processing_command:
                 is_processing_command = True
@@ -183,8 +134,6 @@ def listen_for_commands():
 
 def main():
     try:
-        print("Initializing speech-to-text model...")
-        initialize_speech_to_text()
         print("Voice command application is running. Say 'FRIDAY' to start.")
         speak("Voice command application is running. Say 'FRIDAY' to start.")
         listen_for_commands()
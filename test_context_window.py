@@ -0,0 +1,95 @@
+import unittest
+from context_window import ContextWindow, estimate_tokens
+
+TIMEOUT = 5
+
+
+def turns(count, tokens=10):
+    """count turns of exactly tokens estimated tokens each, numbered in their content."""
+    history = []
+    for index in range(count):
+        content = f"{index:03d}".ljust((tokens - 1) * 4, "x")
+        history.append({"timestamp": "2024-12-21 10:00:00", "role": "user" if index % 2 == 0 else "assistant",
+                        "content": content})
+    return history
+
+
+class RecordingSummarizer:
+    """Records the turns each fold was given and summarizes them as their numbers."""
+
+    def __init__(self, fail=False):
+        self.folds = []
+        self.fail = fail
+
+    def __call__(self, summary, turns):
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        self.folds.append(turns)
+        numbers = [turn["content"][:3] for turn in turns]
+        return " ".join(filter(None, [summary] + numbers))
+
+
+class ContextWindowTest(unittest.TestCase):
+
+    def test_turn_helper_matches_the_estimate(self):
+        self.assertEqual(estimate_tokens(turns(1)[0]["content"]), 10)
+
+    def test_window_keeps_the_newest_turns_within_the_budget(self):
+        window = ContextWindow(token_budget=35, summarize=RecordingSummarizer())
+        history = turns(10)
+        self.assertEqual(window.window_start(history), 7)
+        messages = window.messages(history)
+        self.assertEqual([message["content"] for message in messages], [turn["content"] for turn in history[7:]])
+        self.assertEqual(set(messages[0]), {"role", "content"})  # Timestamps are stripped
+
+    def test_newest_turn_is_kept_even_over_budget(self):
+        window = ContextWindow(token_budget=5, summarize=RecordingSummarizer())
+        self.assertEqual(window.window_start(turns(3)), 2)
+
+    def test_turns_leaving_the_window_are_folded_into_the_summary(self):
+        summarizer = RecordingSummarizer()
+        window = ContextWindow(token_budget=30, fold_budget=20, summarize=summarizer)
+        history = turns(5)
+        window.messages(history)  # Window is turns 2-4, turns 0-1 are folded (20 tokens)
+        window.wait_for_summary(TIMEOUT)
+        self.assertEqual([turn["content"][:3] for turn in summarizer.folds[0]], ["000", "001"])
+        self.assertEqual(window.summarized_upto, 2)
+        history += turns(7)[5:]
+        messages = window.messages(history)
+        self.assertEqual(messages[0], {"role": "system", "content": "Summary of the earlier conversation: 000 001"})
+        window.wait_for_summary(TIMEOUT)
+        self.assertEqual([turn["content"][:3] for turn in summarizer.folds[1]], ["002", "003"])
+        self.assertEqual(window.summary, "000 001 002 003")
+
+    def test_fold_stops_at_the_fold_budget(self):
+        summarizer = RecordingSummarizer()
+        window = ContextWindow(token_budget=20, fold_budget=25, summarize=summarizer)
+        window.messages(turns(8))
+        window.wait_for_summary(TIMEOUT)
+        self.assertEqual(len(summarizer.folds[0]), 3)  # Stops once 25 tokens are reached
+        self.assertEqual(window.summarized_upto, 3)
+
+    def test_backlog_beyond_max_backlog_turns_is_not_summarized_on_first_run(self):
+        summarizer = RecordingSummarizer()
+        window = ContextWindow(token_budget=20, fold_budget=1000, max_backlog_turns=3, summarize=summarizer)
+        window.messages(turns(10))  # Window is turns 8-9
+        window.wait_for_summary(TIMEOUT)
+        self.assertEqual([turn["content"][:3] for turn in summarizer.folds[0]], ["005", "006", "007"])
+
+    def test_failed_fold_leaves_the_summary_unchanged(self):
+        window = ContextWindow(token_budget=20, summarize=RecordingSummarizer(fail=True))
+        window.messages(turns(5))
+        window.wait_for_summary(TIMEOUT)
+        self.assertEqual(window.summary, "")
+        self.assertEqual(window.summarized_upto, 0)
+
+    def test_recalled_turns_are_a_system_message(self):
+        window = ContextWindow(summarize=RecordingSummarizer())
+        recalled = [{"role": "user", "content": "my name is chirag"}]
+        messages = window.messages(turns(1), recalled)
+        self.assertEqual(messages[0], {"role": "system",
+                                       "content": "Relevant turns from earlier conversations:\nuser: my name is chirag"})
+
+
+if __name__ == "__main__":
+    unittest.main()
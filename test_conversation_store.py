@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+from conversation_store import ConversationLog, migrate_legacy_history
+
+
+def turn(index):
+    return {"timestamp": "2024-12-21 10:00:00", "role": "user", "content": f"turn {index}"}
+
+
+class ConversationLogTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "history.jsonl")
+
+    def write(self, text):
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    def test_append_and_load(self):
+        log = ConversationLog(self.path)
+        log.append(turn(0), turn(1))
+        log.append(turn(2))
+        self.assertEqual(ConversationLog(self.path).load(), [turn(0), turn(1), turn(2)])
+
+    def test_torn_tail_is_skipped_and_kept_off_the_next_append(self):
+        self.write(json.dumps(turn(0)) + "\n" + json.dumps(turn(1))[:10])
+        log = ConversationLog(self.path)
+        self.assertEqual(log.load(), [turn(0)])
+        self.assertTrue(log.torn_tail)
+        self.assertTrue(log.needs_compaction())
+        log.append(turn(2))
+        self.assertEqual(ConversationLog(self.path).load(), [turn(0), turn(2)])
+
+    def test_compaction_drops_corrupt_lines(self):
+        self.write(json.dumps(turn(0)) + "\nnot json\n" + json.dumps(turn(1)) + "\n")
+        log = ConversationLog(self.path)
+        self.assertEqual(log.load(), [turn(0), turn(1)])
+        self.assertEqual(log.corrupt_lines, 1)
+        log.compact()
+        reloaded = ConversationLog(self.path)
+        self.assertEqual(reloaded.load(), [turn(0), turn(1)])
+        self.assertEqual(reloaded.corrupt_lines, 0)
+        self.assertFalse(reloaded.needs_compaction())
+
+    def test_compaction_trims_to_max_entries(self):
+        log = ConversationLog(self.path, compact_every=4, max_entries=3)
+        for index in range(5):
+            log.append(turn(index))  # The fourth append compacts
+        self.assertEqual(ConversationLog(self.path).load(), [turn(1), turn(2), turn(3), turn(4)])
+        self.assertEqual(log.entry_count, 4)
+
+    def test_generation_is_bumped_by_compaction_and_kept_on_disk(self):
+        log = ConversationLog(self.path, max_entries=2)
+        log.append(turn(0), turn(1), turn(2))
+        self.assertEqual(log.generation, 0)
+        log.compact()
+        log.compact()
+        reloaded = ConversationLog(self.path)
+        self.assertEqual(reloaded.load(), [turn(1), turn(2)])
+        self.assertEqual(reloaded.generation, 2)
+
+    def test_migrates_legacy_json_array(self):
+        legacy_path = os.path.join(os.path.dirname(self.path), "history.json")
+        with open(legacy_path, "w", encoding="utf-8") as file:
+            json.dump([turn(0), turn(1)], file, indent=4)
+        self.assertTrue(migrate_legacy_history(legacy_path, self.path))
+        self.assertFalse(migrate_legacy_history(legacy_path, self.path))
+        self.assertEqual(ConversationLog(self.path).load(), [turn(0), turn(1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from conversation_store import ConversationLog
+from history_index import HistoryIndex, parse_day_range
+
+TODAY = date(2024, 12, 21)  # A Saturday
+
+
+def turn(day, content):
+    return {"timestamp": f"{day} 10:00:00", "role": "user", "content": content}
+
+
+class HistoryIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = ConversationLog(os.path.join(directory.name, "history.jsonl"), max_entries=2)
+        self.index_path = os.path.join(directory.name, "history.index.json")
+
+    def test_search_by_words_and_day(self):
+        entries = [turn("2024-12-16", "I like pizza"), turn("2024-12-20", "pizza with olives"),
+                   turn("2024-12-20", "the weather is nice")]
+        index = HistoryIndex(self.index_path)
+        index.sync(entries)
+        self.assertEqual(index.search(entries, "pizza", today=TODAY), entries[:2])
+        self.assertEqual(index.search(entries, "pizza", "monday", today=TODAY), entries[:1])
+        self.assertEqual(index.search(entries, "pizza", "yesterday", today=TODAY), entries[1:2])
+        self.assertEqual(index.search(entries, "pizza with", today=TODAY), entries[1:2])
+        self.assertEqual(index.search(entries, "pasta", today=TODAY), [])
+
+    def test_persisted_index_picks_up_new_turns(self):
+        entries = [turn("2024-12-20", "first pizza")]
+        index = HistoryIndex(self.index_path)
+        index.sync(entries)
+        index.save()
+        entries.append(turn("2024-12-21", "second pizza"))
+        reloaded = HistoryIndex(self.index_path)
+        reloaded.load(entries)
+        self.assertEqual(reloaded.search(entries, "pizza", today=TODAY), entries)
+
+    def test_rebuilt_after_compaction_even_when_the_log_grew_back(self):
+        self.log.append(turn("2024-12-20", "old pizza"), turn("2024-12-20", "old weather"),
+                        turn("2024-12-20", "old music"))
+        entries = self.log.load()
+        index = HistoryIndex(self.index_path)
+        index.load(entries, self.log.generation)
+        index.save()
+        self.log.compact()  # Keeps the last two turns
+        self.log.append(turn("2024-12-21", "new pizza"), turn("2024-12-21", "new weather"))
+        entries = self.log.load()
+        self.assertGreater(len(entries), index.entry_count)  # Same length check alone would keep the stale index
+        reloaded = HistoryIndex(self.index_path)
+        reloaded.load(entries, self.log.generation)
+        self.assertEqual(reloaded.search(entries, "pizza", today=TODAY), [turn("2024-12-21", "new pizza")])
+        self.assertEqual(reloaded.generation, self.log.generation)
+
+
+class ParseDayRangeTest(unittest.TestCase):
+
+    def test_phrases(self):
+        self.assertEqual(parse_day_range("Monday", TODAY), "monday")
+        self.assertEqual(parse_day_range("last week", TODAY), (date(2024, 12, 9), date(2024, 12, 15)))
+        self.assertEqual(parse_day_range("2024-12-01 to 2024-12-05", TODAY), (date(2024, 12, 1), date(2024, 12, 5)))
+        self.assertIsNone(parse_day_range("someday", TODAY))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from intent_router import Intent, IntentRouter
+
+
+class IntentRouterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.router = IntentRouter([
+            Intent("search_history", ["search history"], requires=["friday"]),
+            Intent("exit", ["exit", "quit", "goodbye"]),
+            Intent("wake", ["friday"]),
+            Intent("google", ["google", "search the web for"]),
+            Intent("help", ["help", "what can you do"]),
+            Intent("resume", ["unpause", "resume"]),
+            Intent("pause", ["pause", "stop"]),
+            Intent("travel", ["new york city", "york", "new"]),
+        ])
+
+    def test_earlier_rows_win(self):
+        self.assertEqual(self.router.route("friday exit").intent, "exit")
+        self.assertEqual(self.router.route("unpause").intent, "resume")  # Not "pause": whole words only
+        self.assertEqual(self.router.route("friday google cats").intent, "wake")
+
+    def test_multi_word_phrase_and_requires(self):
+        match = self.router.route("Friday search history pizza on Monday")
+        self.assertEqual(match.intent, "search_history")
+        self.assertEqual(match.query, "pizza on monday")
+        self.assertEqual(self.router.route("search history pizza").intent, "conversation")  # Missing "friday"
+
+    def test_phrase_inside_a_longer_partial_match(self):
+        # "search the" starts the multi-word phrase and breaks off; "google" must still be found
+        match = self.router.route("search the google for cats")
+        self.assertEqual(match.intent, "google")
+        self.assertEqual(match.query, "search the for cats")
+        self.assertEqual(self.router.route("please search the web for cats").query, "please cats")
+
+    def test_overlapping_phrases_are_all_cut_from_the_query(self):
+        match = self.router.route("new york city tours")
+        self.assertEqual(match.intent, "travel")
+        self.assertEqual(sorted(match.keywords), ["new", "new york city", "york"])
+        self.assertEqual(match.query, "tours")
+        match = self.router.route("new yorkshire pudding")
+        self.assertEqual(match.keywords, ["new"])
+        self.assertEqual(match.query, "yorkshire pudding")
+
+    def test_repeated_keyword_is_cut_everywhere(self):
+        self.assertEqual(self.router.route("google cats google dogs").query, "cats dogs")
+
+    def test_words_not_substrings(self):
+        self.assertEqual(self.router.route("is this helpful").intent, "conversation")
+        self.assertEqual(self.router.route("start the stopwatch").intent, "conversation")
+
+    def test_query_keeps_punctuation_inside_it(self):
+        self.assertEqual(self.router.route("Google flights on 2024-12-21, please").query, "flights on 2024-12-21, please")
+        self.assertEqual(self.router.route("google don't panic").query, "don't panic")
+
+    def test_fallback_keeps_the_whole_command(self):
+        match = self.router.route("What's the weather in Mumbai?")
+        self.assertEqual(match.intent, "conversation")
+        self.assertEqual(match.query, "what's the weather in mumbai")
+        self.assertEqual(self.router.route("").query, "")
+
+    def test_entities_only_for_intents_that_ask(self):
+        calls = []
+        router = IntentRouter([Intent("google", ["google"], entities=True), Intent("help", ["help"])],
+                              entity_extractor=lambda command: calls.append(command) or [("Mumbai", "GPE")])
+        self.assertEqual(router.route("google Mumbai").entities, [("Mumbai", "GPE")])
+        self.assertEqual(router.route("help").entities, [])
+        self.assertEqual(calls, ["google Mumbai"])
+
+
+if __name__ == "__main__":
+    unittest.main()
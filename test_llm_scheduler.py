@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+import unittest
+from llm_scheduler import (LLMScheduler, PRIORITY_INDEXING, PRIORITY_INTERACTIVE, PRIORITY_SUMMARY,
+                           RequestCancelled)
+
+TIMEOUT = 5
+
+
+def messages(content):
+    return [{"role": "user", "content": content}]
+
+
+def wait_until(predicate):
+    deadline = time.monotonic() + TIMEOUT
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+class GatedLLM:
+    """Stands in for ManagedOllama: records what was sent, and replies once the gate opens."""
+
+    def __init__(self):
+        self.sent = []
+        self.gate = threading.Event()
+        self.aio = GatedAsyncLLM(self)
+
+    def chat(self, model=None, messages=None, stream=False, **kwargs):
+        content = messages[0]["content"]
+        self.sent.append(content)
+        self.gate.wait(TIMEOUT)
+        return iter([content, content]) if stream else content
+
+
+class GatedAsyncLLM:
+    def __init__(self, llm):
+        self.llm = llm
+
+    async def chat(self, model=None, messages=None, stream=False, **kwargs):
+        self.llm.sent.append(messages[0]["content"])
+
+        async def chunks():
+            yield messages[0]["content"]
+        return chunks() if stream else messages[0]["content"]
+
+
+class LLMSchedulerTest(unittest.TestCase):
+    """One slot, with a request holding it until the test opens the gate."""
+
+    def setUp(self):
+        self.llm = GatedLLM()
+        self.scheduler = LLMScheduler(lambda: self.llm, max_concurrent=1)
+        self.results = {}
+        self.threads = []
+
+    def tearDown(self):
+        self.llm.gate.set()
+        for thread in self.threads:
+            thread.join(TIMEOUT)
+
+    def ask(self, content, priority=PRIORITY_INTERACTIVE, group=None, supersede=False, queued=True):
+        """Send content from a new thread; waits until the scheduler has taken it."""
+        client = self.scheduler.client(priority, group, supersede)
+        before = self.enqueued()
+
+        def run():
+            try:
+                self.results.setdefault(content, []).append(client.chat(messages=messages(content)))
+            except RequestCancelled:
+                self.results.setdefault(content, []).append("cancelled")
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        if queued:
+            wait_until(lambda: self.enqueued() > before)
+        return thread
+
+    def enqueued(self):
+        return sum(counts["submitted"] + counts["coalesced"] for counts in self.scheduler.counts.values())
+
+    def finish(self):
+        self.llm.gate.set()
+        for thread in self.threads:
+            thread.join(TIMEOUT)
+
+    def test_interactive_goes_ahead_of_queued_background_work(self):
+        self.ask("busy", PRIORITY_INDEXING)
+        self.ask("index", PRIORITY_INDEXING)
+        self.ask("summary", PRIORITY_SUMMARY)
+        self.ask("turn")
+        self.finish()
+        self.assertEqual(self.llm.sent, ["busy", "turn", "summary", "index"])
+
+    def test_identical_requests_are_sent_once(self):
+        self.ask("busy")
+        self.ask("summary", PRIORITY_SUMMARY)
+        self.ask("summary", PRIORITY_SUMMARY)
+        self.finish()
+        self.assertEqual(self.llm.sent, ["busy", "summary"])
+        self.assertEqual(self.results["summary"], ["summary", "summary"])
+
+    def test_interactive_duplicate_moves_a_queued_request_up(self):
+        self.ask("busy", PRIORITY_INDEXING)
+        self.ask("index", PRIORITY_INDEXING)
+        self.ask("other summary", PRIORITY_SUMMARY)
+        self.ask("summary", PRIORITY_SUMMARY)
+        self.ask("summary", PRIORITY_INTERACTIVE)
+        self.finish()
+        self.assertEqual(self.llm.sent, ["busy", "summary", "other summary", "index"])
+        self.assertEqual(self.scheduler.counts[PRIORITY_INTERACTIVE]["coalesced"], 1)
+        self.assertEqual(self.scheduler.counts[PRIORITY_SUMMARY]["coalesced"], 0)
+
+    def test_cancel_drops_queued_requests_of_the_group(self):
+        self.ask("busy")
+        self.ask("speculation", group="speculation")
+        self.ask("summary", PRIORITY_SUMMARY)
+        self.assertEqual(self.scheduler.cancel("speculation"), 1)
+        self.finish()
+        self.assertEqual(self.results["speculation"], ["cancelled"])
+        self.assertEqual(self.llm.sent, ["busy", "summary"])
+
+    def test_supersede_cancels_the_older_request(self):
+        self.ask("busy", PRIORITY_SUMMARY)
+        self.ask("first question", group="turn", supersede=True)
+        self.ask("second question", group="turn", supersede=True)
+        self.finish()
+        self.assertEqual(self.results["first question"], ["cancelled"])
+        self.assertEqual(self.llm.sent, ["busy", "second question"])
+
+    def test_dropping_an_unread_stream_frees_its_slot(self):
+        self.llm.gate.set()
+        stream = self.scheduler.client().chat(messages=messages("streamed"), stream=True)
+        self.assertEqual(self.scheduler.running, 1)
+        del stream
+        self.assertEqual(self.scheduler.running, 0)
+        thread = self.ask("next", queued=False)
+        thread.join(TIMEOUT)
+        self.assertEqual(self.results["next"], ["next"])
+
+    def test_closing_a_stream_frees_its_slot(self):
+        self.llm.gate.set()
+        stream = self.scheduler.client().chat(messages=messages("streamed"), stream=True)
+        self.assertEqual(next(stream), "streamed")
+        stream.close()
+        self.assertEqual(self.scheduler.running, 0)
+        self.assertEqual(list(self.scheduler.client().chat(messages=messages("again"), stream=True)), ["again"] * 2)
+        self.assertEqual(self.scheduler.running, 0)
+
+    def test_dropping_an_unread_async_stream_frees_its_slot(self):
+        async def drop_stream():
+            stream = await self.scheduler.client().aio.chat(messages=messages("streamed"), stream=True)
+            self.assertEqual(self.scheduler.running, 1)
+            del stream
+            return await asyncio.wait_for(self.scheduler.client().aio.chat(messages=messages("next")), TIMEOUT)
+        self.assertEqual(asyncio.run(drop_stream()), "next")
+        self.assertEqual(self.scheduler.running, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
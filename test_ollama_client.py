@@ -0,0 +1,61 @@
+import time
+import unittest
+from ollama_client import ManagedOllama, start_stub_server
+
+LOAD_SECONDS = 0.5
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def timed_chat(llm):
+    start = time.perf_counter()
+    llm.chat(messages=MESSAGES)
+    return time.perf_counter() - start
+
+
+class ManagedOllamaTest(unittest.TestCase):
+    """Against the stub server, which sleeps LOAD_SECONDS whenever the model has to be (re)loaded."""
+
+    def setUp(self):
+        self.server, self.host = start_stub_server(load_seconds=LOAD_SECONDS, reply_seconds=0.01)
+        self.addCleanup(self.server.shutdown)
+
+    def test_cold_first_reply_pays_the_load(self):
+        llm = ManagedOllama(host=self.host)
+        self.assertGreaterEqual(timed_chat(llm), LOAD_SECONDS)
+        self.assertEqual(self.server.state["loads"], 1)
+
+    def test_warm_up_removes_the_load_from_the_first_reply(self):
+        llm = ManagedOllama(host=self.host)
+        self.assertGreaterEqual(llm.warm_up(), LOAD_SECONDS)
+        self.assertLess(timed_chat(llm), LOAD_SECONDS / 2)
+        self.assertEqual(self.server.state["loads"], 1)
+
+    def test_model_is_reloaded_after_keep_alive_without_pings(self):
+        llm = ManagedOllama(host=self.host, keep_alive="0.3s")
+        llm.warm_up()
+        time.sleep(0.6)
+        self.assertGreaterEqual(timed_chat(llm), LOAD_SECONDS)
+        self.assertEqual(self.server.state["loads"], 2)
+
+    def test_keep_warm_pings_prevent_the_reload_after_idling(self):
+        llm = ManagedOllama(host=self.host, keep_alive="0.6s", ping_interval=0.2)
+        self.addCleanup(llm.stop)
+        llm.warm_up()
+        llm.start_keep_warm()
+        time.sleep(1.5)  # Well past keep_alive
+        self.assertLess(timed_chat(llm), LOAD_SECONDS / 2)
+        self.assertGreater(llm.pings, 0)
+        self.assertEqual(self.server.state["loads"], 1)
+
+    def test_keep_warm_stops_pinging_once_idle(self):
+        llm = ManagedOllama(host=self.host, keep_alive="0.3s", ping_interval=0.1, idle_timeout=0.0)
+        self.addCleanup(llm.stop)
+        llm.warm_up()
+        llm.start_keep_warm()
+        time.sleep(0.6)
+        self.assertEqual(llm.pings, 0)
+        self.assertGreaterEqual(timed_chat(llm), LOAD_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from response_cache import ResponseCache, is_question, last_reply, normalize_prompt
+
+CONTEXT = ("llama3.2:3b", "", "")
+NOW = 1_700_000_000.0
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.json")
+        clock = mock.patch("response_cache.time.time", return_value=NOW)
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_hit_for_trivial_variations_in_the_same_context(self):
+        cache = ResponseCache(self.path)
+        cache.put("What is my name?", "Chirag.", CONTEXT)
+        self.assertEqual(cache.get("what is my name", CONTEXT), "Chirag.")
+        self.assertIsNone(cache.get("what is my name", ("llama3.2:3b", "", "An earlier reply.")))
+        self.assertIsNone(cache.get("what is my name", CONTEXT, use_cache=False))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = ResponseCache(self.path, ttl=60)
+        cache.put("what time is it", "Noon.", CONTEXT)
+        self.clock.return_value = NOW + 60
+        self.assertEqual(cache.get("what time is it", CONTEXT), "Noon.")
+        self.clock.return_value = NOW + 61
+        self.assertIsNone(cache.get("what time is it", CONTEXT))
+        self.assertEqual(cache.expired, 1)
+        self.assertEqual(len(cache.entries), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResponseCache(self.path, max_entries=2)
+        cache.put("first", "1", CONTEXT)
+        cache.put("second", "2", CONTEXT)
+        cache.get("first", CONTEXT)  # Now "second" is the least recently used
+        cache.put("third", "3", CONTEXT)
+        self.assertEqual(cache.get("first", CONTEXT), "1")
+        self.assertIsNone(cache.get("second", CONTEXT))
+        self.assertEqual(cache.get("third", CONTEXT), "3")
+
+    def test_invalidate_drops_everything(self):
+        cache = ResponseCache(self.path)
+        cache.put("what is my name", "Chirag.", CONTEXT)
+        cache.invalidate()
+        self.assertIsNone(cache.get("what is my name", CONTEXT))
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_saved_entries_reload_without_the_expired_ones(self):
+        cache = ResponseCache(self.path, ttl=60)
+        cache.put("old question", "Old.", CONTEXT)
+        self.clock.return_value = NOW + 30
+        cache.put("new question", "New.", CONTEXT)
+        cache.save()
+        self.clock.return_value = NOW + 75
+        reloaded = ResponseCache(self.path, ttl=60)
+        reloaded.load()
+        self.assertIsNone(reloaded.get("old question", CONTEXT))
+        self.assertEqual(reloaded.get("new question", CONTEXT), "New.")
+
+    def test_saved_every_few_puts(self):
+        cache = ResponseCache(self.path, save_every=2)
+        cache.put("first", "1", CONTEXT)
+        self.assertFalse(os.path.exists(self.path))
+        cache.put("second", "2", CONTEXT)
+        self.assertTrue(os.path.exists(self.path))
+
+
+class HelpersTest(unittest.TestCase):
+
+    def test_helpers(self):
+        self.assertEqual(normalize_prompt("  What's   the TIME?! "), "what's the time")
+        self.assertTrue(is_question("why?"))
+        self.assertTrue(is_question("Tell me a joke"))
+        self.assertFalse(is_question("My name is Chirag."))
+        history = [{"role": "assistant", "content": "Hello."}, {"role": "user", "content": "Hi"}]
+        self.assertEqual(last_reply(history), "Hello.")
+        self.assertEqual(last_reply([]), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
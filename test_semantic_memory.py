@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+from semantic_memory import HashingEmbedder, SemanticMemory
+
+
+def turns(*contents):
+    return [{"role": "user", "content": content} for content in contents]
+
+
+class SemanticMemoryTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "history.vectors")
+
+    def memory(self, dim=512):
+        return SemanticMemory(HashingEmbedder(dim), self.path, initial_capacity=2)
+
+    def test_finds_the_most_similar_turn(self):
+        entries = turns("my name is chirag", "the weather in mumbai is hot", "play some music")
+        memory = self.memory()
+        memory.sync(entries)
+        self.assertEqual(memory.search("what is the weather in mumbai", k=1)[0][0], 1)
+        self.assertEqual(memory.count, 3)  # Grew past initial_capacity
+
+    def test_limit_only_searches_the_first_rows(self):
+        entries = turns("the weather in mumbai", "other things", "the weather in mumbai today")
+        memory = self.memory()
+        memory.sync(entries)
+        self.assertEqual([entry_id for entry_id, _ in memory.search("weather in mumbai", limit=2)], [0])
+
+    def test_reopened_store_adds_only_new_turns(self):
+        entries = turns("my name is chirag", "play some music")
+        memory = self.memory()
+        memory.sync(entries)
+        entries += turns("the weather in mumbai")
+        reopened = self.memory()
+        reopened.sync(entries)
+        self.assertEqual(reopened.count, 3)
+        self.assertEqual(reopened.search("weather in mumbai", k=1)[0][0], 2)
+
+    def test_rebuilt_after_compaction_even_when_the_log_grew_back(self):
+        memory = self.memory()
+        memory.sync(turns("pizza with olives", "play some music"), generation=0)
+        entries = turns("play some music", "the weather in mumbai", "what is my name")  # Trimmed, then grew back
+        reopened = self.memory()
+        reopened.sync(entries, generation=1)
+        self.assertEqual(reopened.search("weather in mumbai", k=1)[0][0], 1)
+        self.assertEqual(reopened.search("pizza with olives"), [])
+
+    def test_rebuilt_when_the_embedder_changes(self):
+        entries = turns("my name is chirag", "play some music")
+        self.memory().sync(entries)
+        other = self.memory(dim=256)
+        other.sync(entries)
+        self.assertEqual(other.count, 2)
+        self.assertEqual(other.search("play music", k=1)[0][0], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
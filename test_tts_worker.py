@@ -0,0 +1,68 @@
+import unittest
+from tts_worker import TTSWorker
+
+TIMEOUT = 3
+
+
+class InstantEngine:
+    """Stands in for a pyttsx3 engine driven with startLoop(False): each utterance finishes on the next iterate()."""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.pending = []
+        self.spoken = []
+
+    def connect(self, topic, callback):
+        self.callbacks[topic] = callback
+
+    def say(self, text):
+        self.pending.append(text)
+
+    def startLoop(self, use_driver_loop=True):
+        pass
+
+    def endLoop(self):
+        pass
+
+    def stop(self):
+        self.pending = []
+
+    def iterate(self):
+        if self.pending:
+            text = self.pending.pop(0)
+            self.callbacks["started-utterance"](text)
+            self.spoken.append(text)
+            self.callbacks["finished-utterance"](text, True)
+
+
+def no_audio_driver():
+    raise RuntimeError("no audio driver")
+
+
+class TTSWorkerTest(unittest.TestCase):
+
+    def test_says_queued_text(self):
+        engine = InstantEngine()
+        worker = TTSWorker(lambda: engine)
+        worker.start()
+        self.addCleanup(worker.stop)
+        utterance = worker.say("Hello there.")
+        self.assertTrue(utterance.wait(TIMEOUT))
+        self.assertEqual(engine.spoken, ["Hello there."])
+        self.assertIsNone(utterance.error)
+
+    def test_engine_failure_finishes_queued_and_later_utterances(self):
+        worker = TTSWorker(no_audio_driver)
+        queued = worker.say("Queued before the engine loaded.")
+        worker.start()
+        self.addCleanup(worker.stop)
+        self.assertTrue(queued.wait(TIMEOUT))
+        self.assertIsInstance(queued.error, RuntimeError)
+        later = worker.say("Said after the failure.")
+        self.assertTrue(later.wait(0))
+        self.assertTrue(later.cancelled)
+        self.assertIsInstance(later.error, RuntimeError)
+
+
+if __name__ == "__main__":
+    unittest.main()
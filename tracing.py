@@ -0,0 +1,237 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds (0.1 ms to 30 s)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus plus the most recent samples for exact quantiles."""
+
+    def __init__(self, buckets, keep):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=keep)
+
+    def add(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+
+    def quantile(self, fraction):
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(fraction * len(values)))] if values else None
+
+
+class TurnTrace:
+    """The spans of one voice turn, as (stage, offset from the turn start, duration) in seconds."""
+
+    def __init__(self, turn_id, started_at):
+        self.turn_id = turn_id
+        self.started_at = started_at
+        self.spans = []
+        self.ended = False
+
+    def to_dict(self):
+        return {"turn": self.turn_id, "time": time.time(),
+                "spans": [{"stage": stage, "offset_ms": round(offset * 1000, 2), "duration_ms": round(duration * 1000, 2)}
+                          for stage, offset, duration in self.spans]}
+
+
+class Span:
+    def __init__(self, tracer, stage, turn):
+        self.tracer = tracer
+        self.stage = stage
+        self.turn = turn
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.stage, time.perf_counter() - self.start, self.turn, self.start)
+        return False
+
+
+class Tracer:
+    """Latency histograms per pipeline stage, and span traces of each voice turn.
+
+    record() only appends to a deque (atomic under the GIL, no lock, no
+    allocation beyond the tuple), so it is safe to call from the audio
+    callback; samples are folded into the histograms when metrics are read
+    or by the start_exporter() thread.
+    A turn runs from the user's command being recognized to speech starting;
+    its spans are appended as JSON lines to trace_file when it ends.
+    Histograms are exported as Prometheus text with write() (e.g. for the
+    node_exporter textfile collector) or served on /metrics with serve().
+    """
+
+    def __init__(self, trace_file=None, buckets=DEFAULT_BUCKETS, keep=10000):
+        self.trace_file = trace_file
+        self.buckets = buckets
+        self.keep = keep
+        self.pending = deque()
+        self.histograms = {}
+        self.turn_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.server = None
+
+    def record(self, stage, seconds, turn=None, start=None):
+        self.pending.append((stage, seconds))
+        if turn is not None:
+            turn.spans.append((stage, (start if start is not None else time.perf_counter() - seconds) - turn.started_at, seconds))
+
+    def span(self, stage, turn=None):
+        """Time a block: with tracer.span("ollama.chat", turn): ..."""
+        return Span(self, stage, turn)
+
+    def timed_callback(self, stage, callback):
+        """Wrap a sounddevice callback so each call is recorded under stage."""
+        pending = self.pending
+        clock = time.perf_counter
+
+        def timed(indata, frames, time_info, status):
+            start = clock()
+            callback(indata, frames, time_info, status)
+            pending.append((stage, clock() - start))
+        return timed
+
+    def begin_turn(self, started_at=None):
+        return TurnTrace(next(self.turn_ids), started_at if started_at is not None else time.perf_counter())
+
+    def end_turn(self, turn, ended_at=None):
+        """Close a turn (only the first call counts): records its total time and writes its trace."""
+        if turn is None or turn.ended:
+            return
+        turn.ended = True
+        self.record("turn", (ended_at if ended_at is not None else time.perf_counter()) - turn.started_at)
+        if self.trace_file:
+            try:
+                with self.lock, open(self.trace_file, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(turn.to_dict()) + "\n")
+            except Exception as e:
+                print(f"Error writing trace: {e}")
+
+    def collect(self):
+        with self.lock:
+            while self.pending:
+                stage, seconds = self.pending.popleft()
+                histogram = self.histograms.get(stage)
+                if histogram is None:
+                    histogram = self.histograms[stage] = Histogram(self.buckets, self.keep)
+                histogram.add(seconds)
+            return dict(self.histograms)
+
+    def summary(self):
+        lines = []
+        for stage, histogram in sorted(self.collect().items()):
+            quantiles = ", ".join(f"p{int(q * 100)} {histogram.quantile(q) * 1000:9.3f} ms" for q in QUANTILES)
+            lines.append(f"{stage:14s} {histogram.count:7d} samples | {quantiles}")
+        return "\n".join(lines) or "No spans recorded."
+
+    def prometheus(self):
+        lines = ["# HELP voice_stage_seconds Latency of each voice pipeline stage.",
+                 "# TYPE voice_stage_seconds histogram"]
+        histograms = self.collect()
+        for stage, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'voice_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'voice_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'voice_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'voice_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines += ["# HELP voice_stage_seconds_recent Quantiles over the most recent samples of each stage.",
+                  "# TYPE voice_stage_seconds_recent gauge"]
+        for stage, histogram in sorted(histograms.items()):
+            for q in QUANTILES:
+                lines.append(f'voice_stage_seconds_recent{{stage="{stage}",quantile="{q}"}} {histogram.quantile(q):.6f}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path="voice_metrics.prom"):
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(self.prometheus())
+        os.replace(temp_path, path)
+
+    def start_exporter(self, path="voice_metrics.prom", interval=10.0):
+        """Fold pending samples (and rewrite path, if given) every interval seconds on a daemon thread."""
+        def export():
+            while True:
+                time.sleep(interval)
+                try:
+                    if path:
+                        self.write(path)
+                    else:
+                        self.collect()
+                except Exception as e:
+                    print(f"Error exporting metrics: {e}")
+        threading.Thread(target=export, daemon=True).start()
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """Serve the histograms as Prometheus text on http://host:port/metrics."""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                payload = tracer.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+
+# Benchmark: cost the tracer adds to each audio callback
+def benchmark(calls=200_000):
+    import numpy as np
+    from audio_buffer import AudioRingBuffer, new_callback_stats, ring_buffer_callback
+    block = np.zeros((512, 1), dtype=np.int16)
+    tracer = Tracer()
+    timings = {}
+    for name in ("plain", "traced"):
+        ring = AudioRingBuffer(16000 * 4)
+        callback = ring_buffer_callback(ring, new_callback_stats())
+        if name == "traced":
+            callback = tracer.timed_callback("capture", callback)
+        start = time.perf_counter()
+        for _ in range(calls):
+            callback(block, 512, None, None)
+            ring.read(512)
+        timings[name] = (time.perf_counter() - start) / calls
+        if name == "traced":
+            collect_start = time.perf_counter()
+            tracer.collect()
+            collect = time.perf_counter() - collect_start
+    overhead = timings["traced"] - timings["plain"]
+    print(f"Callback: plain {timings['plain'] * 1e6:.2f} us, traced {timings['traced'] * 1e6:.2f} us "
+          f"(+{overhead * 1e6:.2f} us, {overhead / (512 / 16000) * 100:.4f}% of the 32 ms block budget)")
+    print(f"Folding {calls} samples into the histograms off the audio thread took {collect * 1000:.0f} ms")
+    print(tracer.summary())
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import numpy as np
+
+tts_cache_directory = "tts_cache"
+
+
+class Clip:
+    """Synthesized speech memory-mapped from a cached WAV file."""
+
+    def __init__(self, path, samples, sample_rate):
+        self.path = path
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+
+def read_wav_layout(path):
+    """Return (channels, sample_rate, data offset, data size) of a 16-bit PCM WAV file."""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        header = file.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"{path} is not a WAV file")
+        channels = sample_rate = None
+        while True:
+            chunk = file.read(8)
+            if len(chunk) < 8:
+                raise ValueError(f"{path} has no data chunk")
+            chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", file.read(16))
+                if audio_format not in (1, 0xFFFE) or bits != 16:
+                    raise ValueError(f"{path} is not 16-bit PCM")
+                file.seek(size - 16 + size % 2, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if channels is None:
+                    raise ValueError(f"{path} has no format chunk")
+                offset = file.tell()
+                # Streaming writers may leave the size unset; the data then runs to the end of the file
+                size = min(size, file_size - offset)
+                return channels, sample_rate, offset, size - size % (2 * channels)
+            else:
+                file.seek(size + size % 2, os.SEEK_CUR)
+
+
+class TTSCache:
+    """Rendered audio of fixed assistant phrases, so they play without running the TTS engine.
+
+    Phrases are rendered once with the engine's save_to_file() into
+    directory/<hash>.wav, keyed on the text, voice and rate, so changing the
+    voice or rate renders them again rather than playing the old recording.
+    Cached clips are memory-mapped rather than read into memory, and are
+    played with sounddevice; without it, can_play() is False and callers
+    fall back to the engine. configure() must be called with the engine
+    before use. Time-to-audio is recorded for cached and synthesized speech
+    by whoever plays them, from the start of an utterance to its audio first
+    going to the output device: play()'s on_start for a cached clip, the
+    engine's started-utterance callback for synthesized speech.
+    """
+
+    def __init__(self, directory=tts_cache_directory):
+        self.directory = directory
+        self.voice = None
+        self.rate = None
+        self.clips = {}
+        self.lock = threading.Lock()
+        self.rendered = 0
+        self.time_to_audio = {"cached": [], "synthesized": []}
+        self.playback = None
+        self.stream = None
+        os.makedirs(directory, exist_ok=True)
+
+    def configure(self, engine):
+        self.voice = engine.getProperty("voice")
+        self.rate = engine.getProperty("rate")
+
+    def key(self, text):
+        data = json.dumps([self.voice, self.rate, " ".join(text.split())], ensure_ascii=False).encode("utf-8")
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def path(self, text):
+        return os.path.join(self.directory, self.key(text) + ".wav")
+
+    def temp_path(self, text):
+        return os.path.join(self.directory, self.key(text) + ".tmp.wav")
+
+    def get(self, text):
+        """The Clip for text, or None if it has not been rendered."""
+        key = self.key(text)
+        with self.lock:
+            clip = self.clips.get(key)
+        if clip is not None:
+            return clip
+        path = os.path.join(self.directory, key + ".wav")
+        if not os.path.exists(path):
+            return None
+        try:
+            clip = self.load(path)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring cached speech {path}: {e}")
+            return None
+        with self.lock:
+            self.clips[key] = clip
+        return clip
+
+    def load(self, path):
+        channels, sample_rate, offset, size = read_wav_layout(path)
+        if not size:
+            raise ValueError("no audio")
+        samples = np.memmap(path, dtype=np.int16, mode="r", offset=offset, shape=(size // (2 * channels), channels))
+        return Clip(path, samples, sample_rate)
+
+    def add(self, text, temp_path):
+        """Move a finished rendering of text (written to temp_path) into the cache."""
+        path = self.path(text)
+        os.replace(temp_path, path)
+        self.rendered += 1
+        return self.get(text)
+
+    def render(self, engine, phrases):
+        """Render the phrases that are not cached yet with a blocking engine (runAndWait)."""
+        for text in phrases:
+            if self.get(text) is not None:
+                continue
+            temp_path = self.temp_path(text)
+            engine.save_to_file(text, temp_path)
+            engine.runAndWait()
+            try:
+                self.add(text, temp_path)
+            except OSError as e:
+                print(f"Error caching speech for {text!r}: {e}")
+
+    def can_play(self):
+        """Whether clips can be played (sounddevice imports); checked once."""
+        if self.playback is None:
+            try:
+                import sounddevice
+                self.playback = True
+            except (ImportError, OSError) as e:  # OSError: sounddevice is installed but PortAudio is not
+                print(f"Playing speech with the TTS engine, cached clips need sounddevice: {e}")
+                self.playback = False
+        return self.playback
+
+    # Plays clip on its own output stream; on_start is called from the audio thread as the first block goes out
+    def play(self, clip, wait=False, on_start=None):
+        import sounddevice as sd
+        self.stop()
+        samples = clip.samples
+        position = 0
+        finished = threading.Event()
+
+        def callback(outdata, frames, time_info, status):
+            nonlocal position
+            if position == 0 and on_start is not None:
+                on_start()
+            block = samples[position:position + frames]
+            outdata[:len(block)] = block
+            outdata[len(block):] = 0
+            position += frames
+            if position >= len(samples):
+                raise sd.CallbackStop()
+        self.stream = sd.OutputStream(samplerate=clip.sample_rate, channels=samples.shape[1], dtype="int16",
+                                      callback=callback, finished_callback=finished.set)
+        self.stream.start()
+        if wait:
+            finished.wait()
+
+    def stop(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+    def record(self, kind, seconds):
+        self.time_to_audio[kind].append(seconds)
+
+    def report(self):
+        lines = [f"TTS cache: {len(self.clips)} clips loaded, {self.rendered} rendered this run"]
+        for kind, samples in self.time_to_audio.items():
+            if samples:
+                samples = sorted(samples)
+                lines.append(f"Time to audio, {kind}: {len(samples)} utterances, "
+                             f"p50 {samples[len(samples) // 2] * 1000:.1f} ms, "
+                             f"p95 {samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+# Benchmark: time to first audio for a synthesized phrase versus its cached clip
+def benchmark(phrases=("Yes, how can I assist you?", "Conversation paused.", "Window minimized."), repeats=3):
+    from model_registry import load_tts
+    engine = load_tts()
+    cache = TTSCache("tts_cache_benchmark")
+    cache.configure(engine)
+    start = time.perf_counter()
+    cache.render(engine, phrases)
+    print(f"Rendered {len(phrases)} phrases in {time.perf_counter() - start:.2f} s")
+    said_at = [0.0]
+    engine.connect("started-utterance", lambda name: cache.record("synthesized", time.perf_counter() - said_at[0]))
+    for _ in range(repeats):
+        for text in phrases:
+            said_at[0] = time.perf_counter()
+            engine.say(text)
+            engine.runAndWait()
+            start = time.perf_counter()
+            cache.play(cache.get(text), wait=True, on_start=lambda: cache.record("cached", time.perf_counter() - start))
+    cache.stop()
+    print(cache.report())
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,225 @@
+import itertools
+import queue
+import threading
+import time
+
+# Utterance priorities, lower is spoken first; rendering phrases for the cache only happens when nothing else is queued
+PRIORITY_URGENT, PRIORITY_NORMAL, PRIORITY_LOW, PRIORITY_RENDER = 0, 1, 2, 3
+
+
+class Utterance:
+    """One queued piece of speech, with timing and a done event to wait on.
+
+    error is set when it was dropped because the TTS engine failed.
+    """
+
+    def __init__(self, text, priority, interruptible, turn_started_at, trace=None, render=False):
+        self.text = text
+        self.priority = priority
+        self.interruptible = interruptible
+        self.turn_started_at = turn_started_at
+        self.trace = trace
+        self.render = render  # Only save the speech to the cache, do not play it
+        self.clip = None
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = False
+        self.error = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class TTSWorker:
+    """Speaks from a priority queue on its own thread so listening never stops.
+
+    The pyttsx3 engine is created and driven entirely on the worker thread
+    (startLoop(False) + iterate()), which lets the worker stop an utterance in
+    the middle when barge_in() is called, e.g. when the VAD hears the user.
+    barge_in() also drops queued interruptible speech, since the rest of an
+    interrupted reply is stale. Urgent, non-interruptible utterances (like
+    "Goodbye") are never cut off.
+
+    Without a headset the microphone also hears the assistant, so the VAD in
+    front of barge_in() should be given is_speaking=worker.is_speaking, which
+    raises its threshold above the speaker level while the assistant talks.
+
+    With a tracer, time waiting in the queue and speaking are recorded as
+    "tts_queue" and "tts", and a traced turn ends when its first utterance
+    starts playing.
+
+    With a TTSCache, text that has been rendered is played from its cached
+    clip instead of being synthesized; prerender() queues phrases to be
+    rendered when nothing else is waiting to be said. If the cache cannot
+    play clips (no sounddevice), everything is said by the engine and
+    nothing is rendered.
+
+    If the engine cannot be loaded (no audio driver) or stops working, the
+    worker fails: error is set, and every queued and later utterance is
+    finished at once with it, so callers waiting on speech do not hang.
+    """
+
+    def __init__(self, load_engine, tracer=None, cache=None):
+        self.load_engine = load_engine
+        self.tracer = tracer
+        self.cache = cache
+        self.utterances = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.current = None
+        self.clip_ends_at = 0.0
+        self.interrupt = threading.Event()
+        self.running = False
+        self.thread = None
+        self.error = None
+        self.turn_latencies = []  # Seconds from the end of the user's turn to the start of speech
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def say(self, text, priority=PRIORITY_NORMAL, interruptible=True, turn_started_at=None, trace=None):
+        """Queue text and return immediately with its Utterance."""
+        utterance = Utterance(text, priority, interruptible, turn_started_at, trace)
+        self.utterances.put((priority, next(self.order), utterance))
+        if self.error is not None:
+            self.cancel_pending()  # Checked after queueing, so fail() cannot miss it
+        return utterance
+
+    def prerender(self, phrases):
+        """Queue phrases to be rendered into the cache in the background."""
+        for text in phrases:
+            self.utterances.put((PRIORITY_RENDER, next(self.order), Utterance(text, PRIORITY_RENDER, False, None, render=True)))
+
+    def is_speaking(self):
+        current = self.current
+        return current is not None and not current.render
+
+    def barge_in(self):
+        """Stop the current utterance and drop pending ones, unless they are not interruptible."""
+        if self.current is not None and self.current.interruptible:
+            self.interrupt.set()
+        self.cancel_pending(only_interruptible=True)
+
+    def cancel_pending(self, only_interruptible=False):
+        kept = []
+        while True:
+            try:
+                item = self.utterances.get_nowait()
+            except queue.Empty:
+                break
+            if only_interruptible and not item[2].interruptible:
+                kept.append(item)
+            else:
+                self.finish(item[2], cancelled=True)
+        for item in kept:
+            self.utterances.put(item)
+
+    def finish(self, utterance, cancelled=False):
+        utterance.cancelled = cancelled
+        utterance.error = self.error if cancelled else None
+        utterance.finished_at = time.perf_counter()
+        if self.tracer is not None and utterance.started_at is not None and not utterance.render:
+            self.tracer.record("tts", utterance.finished_at - utterance.started_at, utterance.trace, utterance.started_at)
+        utterance.done.set()
+
+    def on_started(self, name):
+        current = self.current
+        if self.cache is not None and current is not None and not current.render and current.clip is None:
+            self.cache.record("synthesized", time.perf_counter() - current.started_at)
+
+    def on_finished(self, name, completed):
+        current = self.current
+        if current is not None and current.clip is None:
+            if current.render:
+                try:
+                    self.cache.add(current.text, self.cache.temp_path(current.text))
+                except OSError as e:
+                    print(f"Error caching speech for {current.text!r}: {e}")
+            self.finish(current)
+            self.current = None
+
+    def start_utterance(self, engine, utterance):
+        utterance.started_at = time.perf_counter()
+        if utterance.render:
+            self.current = utterance
+            engine.save_to_file(utterance.text, self.cache.temp_path(utterance.text))
+            return
+        if utterance.turn_started_at is not None:
+            self.turn_latencies.append(utterance.started_at - utterance.turn_started_at)
+        if self.tracer is not None:
+            self.tracer.record("tts_queue", utterance.started_at - utterance.queued_at, utterance.trace, utterance.queued_at)
+            self.tracer.end_turn(utterance.trace, utterance.started_at)
+        self.current = utterance
+        utterance.clip = self.cache.get(utterance.text) if self.cache is not None and self.cache.can_play() else None
+        if utterance.clip is not None:
+            started_at = utterance.started_at
+            self.cache.play(utterance.clip, on_start=lambda: self.cache.record("cached", time.perf_counter() - started_at))
+            self.clip_ends_at = time.perf_counter() + utterance.clip.duration
+        else:
+            engine.say(utterance.text)
+
+    def fail(self, error):
+        print(f"Speech output failed, replies will only be printed: {error}")
+        self.error = error
+        current, self.current = self.current, None
+        if current is not None:
+            self.finish(current, cancelled=True)
+        self.cancel_pending()
+
+    def run(self):
+        try:
+            engine = self.load_engine()
+            engine.connect("started-utterance", self.on_started)
+            engine.connect("finished-utterance", self.on_finished)
+            if self.cache is not None:
+                self.cache.configure(engine)
+            engine.startLoop(False)
+        except Exception as e:
+            self.fail(e)
+            return
+        try:
+            while self.running:
+                if self.current is None:
+                    try:
+                        _, _, utterance = self.utterances.get(timeout=0.02)
+                    except queue.Empty:
+                        continue
+                    if utterance.render and (self.cache is None or not self.cache.can_play() or
+                                             self.cache.get(utterance.text) is not None):
+                        continue  # Already cached, or could not be played anyway
+                    self.interrupt.clear()
+                    self.start_utterance(engine, utterance)
+                if self.interrupt.is_set() and self.current is not None:
+                    if self.current.clip is not None:
+                        self.cache.stop()
+                    else:
+                        engine.stop()
+                    self.finish(self.current, cancelled=True)
+                    self.current = None
+                    self.interrupt.clear()
+                elif self.current is not None and self.current.clip is not None and time.perf_counter() >= self.clip_ends_at:
+                    self.finish(self.current)
+                    self.current = None
+                engine.iterate()
+                time.sleep(0.01)
+        except Exception as e:
+            self.fail(e)
+        finally:
+            engine.endLoop()
+
+    def latency_report(self):
+        """Summary of end-to-end turn latency (user stops talking to assistant starts)."""
+        if not self.turn_latencies:
+            return "No turns measured."
+        latencies = sorted(self.turn_latencies)
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return f"Turn latency over {len(latencies)} turns: p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms"
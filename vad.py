@@ -0,0 +1,135 @@
+import collections
+import time
+import numpy as np
+
+
+class VoiceActivityGate:
+    """Energy and spectral voice activity detector placed in front of the recognizer.
+
+    A block counts as speech when its RMS is well above the tracked noise floor
+    and most of its energy sits in the speech band. Blocks from before the
+    speech started are kept in a short pre-roll so the first syllable is not
+    cut, and the gate stays open for a hangover period after the last speech
+    block so pauses between words do not split an utterance.
+
+    Without a headset the microphone also hears the assistant. While
+    is_speaking() (e.g. TTSWorker.is_speaking) is true, a block needs an RMS
+    of speaking_min_rms instead of min_rms, so only someone talking into the
+    microphone over the speaker opens the gate (and barges in), and the
+    noise floor is not adapted to the assistant's voice.
+    """
+
+    def __init__(self, sample_rate=16000, threshold_ratio=3.0, min_rms=200.0, speech_band=(300, 3400),
+                 band_ratio=0.4, hangover_ms=400, preroll_ms=300, adapt_rate=0.05, on_speech_start=None,
+                 is_speaking=None, speaking_min_rms=1500.0):
+        self.sample_rate = sample_rate
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.is_speaking = is_speaking
+        self.speaking_min_rms = speaking_min_rms
+        self.speech_band = speech_band
+        self.band_ratio = band_ratio
+        self.hangover_samples = sample_rate * hangover_ms // 1000
+        self.preroll_samples = sample_rate * preroll_ms // 1000
+        self.adapt_rate = adapt_rate
+        self.on_speech_start = on_speech_start  # Called when an utterance starts, e.g. for barge-in
+        self.noise_floor = None
+        self.preroll = collections.deque()
+        self.preroll_length = 0
+        self.in_speech = False
+        self.silence_samples = 0
+        self.blocks_seen = 0
+        self.blocks_forwarded = 0
+
+    def is_speech(self, samples):
+        samples = samples.astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+        if self.noise_floor is None:
+            self.noise_floor = rms
+        speaking = self.is_speaking is not None and self.is_speaking()
+        min_rms = self.speaking_min_rms if speaking else self.min_rms
+        loud = rms > min_rms and rms > self.noise_floor * self.threshold_ratio
+        if loud:
+            power = np.abs(np.fft.rfft(samples)) ** 2
+            frequencies = np.fft.rfftfreq(len(samples), 1.0 / self.sample_rate)
+            band = (frequencies >= self.speech_band[0]) & (frequencies <= self.speech_band[1])
+            loud = power[band].sum() >= self.band_ratio * max(power.sum(), 1e-9)
+        if not loud and not speaking:
+            self.noise_floor += self.adapt_rate * (rms - self.noise_floor)
+        return loud
+
+    def process(self, data):
+        """Take one block of int16 audio (bytes), return (blocks to recognize, utterance_ended)."""
+        samples = np.frombuffer(data, dtype=np.int16)
+        self.blocks_seen += 1
+        speech = self.is_speech(samples)
+        if self.in_speech:
+            self.silence_samples = 0 if speech else self.silence_samples + len(samples)
+            self.blocks_forwarded += 1
+            if self.silence_samples >= self.hangover_samples:
+                self.in_speech = False
+                return [data], True
+            return [data], False
+        if speech:
+            self.in_speech = True
+            self.silence_samples = 0
+            if self.on_speech_start is not None:
+                self.on_speech_start()
+            blocks = list(self.preroll) + [data]
+            self.preroll.clear()
+            self.preroll_length = 0
+            self.blocks_forwarded += len(blocks)
+            return blocks, False
+        self.preroll.append(data)
+        self.preroll_length += len(samples)
+        while self.preroll and self.preroll_length - len(self.preroll[0]) // 2 >= self.preroll_samples:
+            self.preroll_length -= len(self.preroll.popleft()) // 2
+        return [], False
+
+    def end_utterance(self):
+        """Close the gate now (e.g. an utterance was cut at its maximum length); speech after this starts a new one."""
+        self.in_speech = False
+        self.silence_samples = 0
+
+
+# Feed one block through the gate into a KaldiRecognizer
+def accept_gated(rec, gate, data):
+    """Return the final results (JSON strings) produced by this block; the recognizer is reset after each utterance."""
+    results = []
+    blocks, utterance_ended = gate.process(data)
+    for block in blocks:
+        if rec.AcceptWaveform(block):
+            results.append(rec.Result())
+    if utterance_ended:
+        results.append(rec.FinalResult())
+        rec.Reset()
+    return results
+
+
+# Benchmark: recognizer CPU time on mostly idle audio, with and without the gate
+def benchmark(model_path, seconds=60, sample_rate=16000, blocksize=512):
+    import vosk
+    model = vosk.Model(model_path)
+    rng = np.random.default_rng(0)
+    audio = rng.normal(0, 60, seconds * sample_rate).astype(np.int16)  # Quiet room noise
+    blocks = [audio[i:i + blocksize].tobytes() for i in range(0, len(audio), blocksize)]
+
+    rec = vosk.KaldiRecognizer(model, sample_rate)
+    start = time.process_time()
+    for block in blocks:
+        rec.AcceptWaveform(block)
+    ungated = time.process_time() - start
+
+    rec = vosk.KaldiRecognizer(model, sample_rate)
+    gate = VoiceActivityGate(sample_rate)
+    start = time.process_time()
+    for block in blocks:
+        accept_gated(rec, gate, block)
+    gated = time.process_time() - start
+    print(f"{seconds}s of idle audio | CPU without VAD {ungated:.2f}s ({ungated / seconds:.0%} of a core) | "
+          f"with VAD {gated:.2f}s ({gated / seconds:.0%}) | forwarded {gate.blocks_forwarded}/{gate.blocks_seen} blocks")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "vosk-model-en-in-0.5")
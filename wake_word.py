@@ -0,0 +1,101 @@
+import json
+import time
+import vosk
+from vad import VoiceActivityGate
+
+
+class WakeWordListener:
+    """Listens for the wake word with a grammar-restricted recognizer before running full ASR.
+
+    While idle only a KaldiRecognizer limited to the wake words and "[unk]" is
+    fed, which is far cheaper than full-vocabulary decoding and cannot produce
+    near-miss transcripts that happen to contain "friday". The audio of the
+    current utterance is kept, so when the wake word is spotted the full
+    recognizer decodes the whole utterance ("friday open google" still works).
+    The full recognizer stays active for active_seconds after the last command
+    so follow-ups do not need the wake word again. on_partial, if given, gets
+    the full recognizer's partial transcript after each block of an utterance
+    (e.g. for a SpeculativeResponder). accept_speech() takes audio that
+    has already been through a VAD gate elsewhere (e.g. a CaptureService).
+
+    Grammars need a model with a dynamic graph (e.g. vosk-model-small-*); large
+    models ignore the grammar and simply decode the full vocabulary.
+    """
+
+    def __init__(self, model, wake_words=("friday",), sample_rate=16000, active_seconds=8.0, gate=None, on_partial=None):
+        self.wake_words = wake_words
+        self.spotter = vosk.KaldiRecognizer(model, sample_rate, json.dumps(list(wake_words) + ["[unk]"]))
+        self.full = vosk.KaldiRecognizer(model, sample_rate)
+        self.active_seconds = active_seconds
+        self.gate = gate if gate is not None else VoiceActivityGate(sample_rate)
+        self.on_partial = on_partial
+        self.utterance = []
+        self.in_utterance = False  # Only tracked for accept_speech(), accept() asks the gate
+        self.active = False
+        self.active_until = 0.0
+        self.activations = 0
+
+    def is_active(self, in_speech=None):
+        """Drop back to wake word spotting once the follow-up window has passed between utterances."""
+        if in_speech is None:
+            in_speech = self.gate.in_speech
+        if self.active and time.monotonic() >= self.active_until and not in_speech:
+            self.active = False
+            self.full.Reset()
+        return self.active
+
+    def heard_wake_word(self, raw_result, key):
+        words = json.loads(raw_result).get(key, "").split()
+        return any(word in words for word in self.wake_words)
+
+    def activate(self):
+        self.active = True
+        self.activations += 1
+        self.active_until = time.monotonic() + self.active_seconds
+        self.spotter.Reset()
+        for block in self.utterance:  # Let the full recognizer hear the wake word and what followed it
+            self.full.AcceptWaveform(block)
+        self.utterance = []
+
+    def accept(self, data):
+        """Feed one block of int16 audio; returns the commands recognized after activation."""
+        active = self.is_active()
+        blocks, utterance_ended = self.gate.process(data)
+        return self.recognize(blocks, utterance_ended, active)
+
+    def accept_speech(self, blocks, utterance_ended):
+        """Feed the output of an external VAD gate (blocks, utterance_ended); returns commands like accept()."""
+        active = self.is_active(in_speech=self.in_utterance)
+        self.in_utterance = not utterance_ended
+        return self.recognize(blocks, utterance_ended, active)
+
+    def recognize(self, blocks, utterance_ended, active):
+        if not active:
+            for index, block in enumerate(blocks):
+                self.utterance.append(block)
+                if self.spotter.AcceptWaveform(block):
+                    spotted = self.heard_wake_word(self.spotter.Result(), "text")
+                else:
+                    spotted = self.heard_wake_word(self.spotter.PartialResult(), "partial")
+                if spotted:
+                    self.activate()
+                    blocks = blocks[index + 1:]
+                    break
+            else:
+                if utterance_ended:
+                    self.spotter.Reset()
+                    self.utterance = []
+                return []
+        commands = []
+        for block in blocks:
+            if self.full.AcceptWaveform(block):
+                commands.append(json.loads(self.full.Result()).get("text", "").strip())
+        if utterance_ended:
+            commands.append(json.loads(self.full.FinalResult()).get("text", "").strip())
+            self.full.Reset()
+        elif blocks and self.on_partial is not None:
+            self.on_partial(json.loads(self.full.PartialResult()).get("partial", ""))
+        commands = [command for command in commands if command]
+        if commands:
+            self.active_until = time.monotonic() + self.active_seconds
+        return commands